@@ -1,3 +1,4 @@
+import os
 import json
 import random
 
@@ -14,8 +15,42 @@ class ScheduleTaskSet(TaskSet):
 
         self.client.get("/rooms/{}/slots".format(room['id']))
 
+# hashes are read from JUDGE_HASHES (one per line, see `judge.create_load_judges`);
+# every simulated judge takes one of them, so run at most as many locusts as there are hashes
+JUDGE_HASHES_FILE = os.environ.get('JUDGE_HASHES', 'judges.txt')
+JUDGE_HASHES = [ line.strip() for line in open(JUDGE_HASHES_FILE) if line.strip() ] if os.path.exists(JUDGE_HASHES_FILE) else []
+
+class JudgeTaskSet(TaskSet):
+    def on_start(self):
+        self.hash_code = JUDGE_HASHES.pop() if JUDGE_HASHES else None
+
+    @task
+    def judge_next_match(self):
+        if not self.hash_code: return
+
+        with self.client.get("/judges/{}/match".format(self.hash_code), name="/judges/[hash]/match", catch_response=True) as response:
+            if response.status_code != 200:
+                # running out of votes or matches is the expected end of a judge's session
+                response.success()
+                self.hash_code = None
+                return
+            match = json.loads(response.content)['resource']
+
+        vote = json.dumps({ "hash": self.hash_code, "vote": random.choice(["player1", "player2", "tie"]) })
+        with self.client.post("/matches/{}/vote".format(match['id']), data=vote, name="/matches/[id]/vote",
+                              headers={ "Content-Type": "application/json" }, catch_response=True) as response:
+            # a 400 here means two judges were handed the same match
+            if response.status_code != 200:
+                response.failure("match {} was claimed twice: {}".format(match['id'], response.content))
+
 class MyLocust(HttpLocust):
     host = "http://localhost/api"
     task_set = ScheduleTaskSet
     min_wait = 1000
     max_wait = 3500
+
+class JudgeLocust(HttpLocust):
+    host = "http://localhost/api"
+    task_set = JudgeTaskSet
+    min_wait = 100
+    max_wait = 1000
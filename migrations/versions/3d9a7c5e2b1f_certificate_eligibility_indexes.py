@@ -0,0 +1,28 @@
+"""indexes behind the set-based certificate eligibility queries
+
+Revision ID: 3d9a7c5e2b1f
+Revises: 8c2f4e1a9b3d
+Create Date: 2026-10-18 14:03:27.518034
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3d9a7c5e2b1f'
+down_revision = '8c2f4e1a9b3d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_index('ix_certificate_account_ticket', 'certificate', ['account_id', 'ticket_id'])
+    op.create_index('ix_certificate_sc_talk_id', 'certificate', ['sc_talk_id'])
+    op.create_index('ix_purchase_customer_id', 'purchase', ['customer_id'])
+    op.create_index('ix_slot_talk_id', 'slot', ['talk_id'])
+
+
+def downgrade():
+    op.drop_index('ix_slot_talk_id', 'slot')
+    op.drop_index('ix_purchase_customer_id', 'purchase')
+    op.drop_index('ix_certificate_sc_talk_id', 'certificate')
+    op.drop_index('ix_certificate_account_ticket', 'certificate')
@@ -0,0 +1,49 @@
+"""materialized standings for judge tournaments
+
+Revision ID: 5b8e1f3c7a2d
+Revises: 3d9a7c5e2b1f
+Create Date: 2026-10-18 15:21:09.402117
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1f3c7a2d'
+down_revision = '3d9a7c5e2b1f'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('standing',
+        sa.Column('tournament_id', sa.Integer(), nullable=False),
+        sa.Column('proposal_id', sa.Integer(), nullable=False),
+        sa.Column('victories', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('ties', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('defeats', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['tournament_id'], ['tournament.id'], ),
+        sa.ForeignKeyConstraint(['proposal_id'], ['proposal.id'], ),
+        sa.PrimaryKeyConstraint('tournament_id', 'proposal_id')
+    )
+
+    op.execute("""
+        INSERT INTO standing (tournament_id, proposal_id, victories, ties, defeats)
+        SELECT tournament_id, proposal_id, SUM(victories), SUM(ties), SUM(defeats) FROM (
+            SELECT tournament_id, player1_id AS proposal_id,
+                   CASE WHEN result = 'player1' THEN 1 ELSE 0 END AS victories,
+                   CASE WHEN result = 'tie'     THEN 1 ELSE 0 END AS ties,
+                   CASE WHEN result = 'player2' THEN 1 ELSE 0 END AS defeats
+              FROM "match" WHERE result IS NOT NULL
+            UNION ALL
+            SELECT tournament_id, player2_id AS proposal_id,
+                   CASE WHEN result = 'player2' THEN 1 ELSE 0 END AS victories,
+                   CASE WHEN result = 'tie'     THEN 1 ELSE 0 END AS ties,
+                   CASE WHEN result = 'player1' THEN 1 ELSE 0 END AS defeats
+              FROM "match" WHERE result IS NOT NULL AND player2_id IS NOT NULL
+        ) AS outcomes
+        GROUP BY tournament_id, proposal_id
+    """)
+
+
+def downgrade():
+    op.drop_table('standing')
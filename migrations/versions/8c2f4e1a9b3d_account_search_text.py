@@ -0,0 +1,35 @@
+"""account search text with trigram index
+
+Revision ID: 8c2f4e1a9b3d
+Revises: 47ef68d22e47
+Create Date: 2026-10-18 10:12:41.318220
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8c2f4e1a9b3d'
+down_revision = '47ef68d22e47'
+
+from alembic import op
+import sqlalchemy as sa
+
+from segue.search import normalize
+
+BATCH_SIZE = 5000
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('account', sa.Column('search_text', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text('SELECT id, name, badge_name, email, document FROM account')).fetchall()
+    update = sa.text('UPDATE account SET search_text = :search_text WHERE id = :id')
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [ dict(id=row[0], search_text=normalize(*row[1:])) for row in rows[start:start+BATCH_SIZE] ])
+
+    op.execute('CREATE INDEX ix_account_search_text_trgm ON account USING gin (search_text gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX ix_account_search_text_trgm')
+    op.drop_column('account', 'search_text')
@@ -2,7 +2,7 @@ import flask
 from flask import request, url_for, redirect
 from flask.ext.jwt import current_user
 
-from segue.core import db, config
+from segue.core import db, config, container
 from segue.factory import Factory
 from segue.decorators import jsoned, jwt_only
 from segue.responses import Response
@@ -17,7 +17,7 @@ from responses import AccountResponse, EmployeesListResponse
 
 class AccountController(object):
     def __init__(self, service=None):
-        self.service = service or AccountService()
+        self.service = service or container.shared(AccountService)
         self.current_user = current_user
 
     @jwt_only
@@ -0,0 +1,42 @@
+from datetime import datetime
+from collections import namedtuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import joinedload
+
+from segue.core import db
+from segue.purchase.models import Purchase
+
+Identifier = namedtuple('Identifier', [ 'purchase', 'has_valid_purchases' ])
+
+class IdentifierResolver(object):
+    SATISFIED_STATUSES = ('paid', 'confirmed')
+    UNPAYABLE_STATUSES = ('stale', 'reimbursed', 'cancelled', 'paid')
+    NOTHING = Identifier(None, False)
+
+    # the same rules as Account.identifier_purchase and has_valid_purchases (the last satisfied purchase,
+    # else the last payable one, else the last one), ranked by a window over each account's purchases
+    def resolve(self, accounts):
+        account_ids = [ account.id for account in accounts ]
+        if not account_ids: return {}
+
+        satisfied = Purchase.status.in_(self.SATISFIED_STATUSES)
+        payable = and_(or_(Purchase.status == None, ~Purchase.status.in_(self.UNPAYABLE_STATUSES)),
+                       Purchase.due_date > datetime.now().date())
+        rank = case([ (satisfied, 0), (payable, 1) ], else_=2)
+
+        ranked = db.session.query(
+            Purchase.id.label('purchase_id'),
+            func.row_number().over(partition_by=Purchase.customer_id, order_by=(rank, Purchase.id.desc())).label('position'),
+            func.max(case([ (satisfied, 1) ], else_=0)).over(partition_by=Purchase.customer_id).label('any_valid')
+        ).filter(Purchase.customer_id.in_(account_ids)).subquery()
+
+        query = db.session.query(Purchase, ranked.c.any_valid) \
+                          .join(ranked, ranked.c.purchase_id == Purchase.id) \
+                          .filter(ranked.c.position == 1) \
+                          .options(joinedload('product'))
+
+        result = dict.fromkeys(account_ids, self.NOTHING)
+        for purchase, any_valid in query:
+            result[purchase.customer_id] = Identifier(purchase, bool(any_valid))
+        return result
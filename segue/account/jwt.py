@@ -1,4 +1,4 @@
-from ..core import jwt
+from ..core import jwt, container
 from flask import current_app
 from werkzeug.local import LocalProxy
 from schema import AccountTokenSchema
@@ -9,7 +9,7 @@ local_jwt = LocalProxy(lambda: current_app.extensions['jwt'])
 def load_user(payload):
     from services import AccountService
     if payload["id"]:
-        return AccountService().get_one(payload["id"], check_ownership=False)
+        return container.shared(AccountService).get_one(payload["id"], check_ownership=False)
 
 class Signer(object):
     def __init__(self, jwt=local_jwt, serializer=None):
@@ -1,18 +1,20 @@
 import re
 import datetime
 
+from sqlalchemy import event
 from sqlalchemy_utils.types.password import PasswordType
 from sqlalchemy.sql import functions as func
 
 from ..json import JsonSerializable, SQLAlchemyJsonSerializer
 from ..core import db
+from ..search import normalize
 
 import schema
 
 class AccountJsonSerializer(SQLAlchemyJsonSerializer):
     _serializer_name = 'normal'
     def hide_field(self, child):
-        return child in [ 'password', 'certificates', 'account_roles' ]
+        return child in [ 'password', 'certificates', 'account_roles', 'search_text' ]
 
     def serialize_child(self, child):
         return False
@@ -20,7 +22,7 @@ class AccountJsonSerializer(SQLAlchemyJsonSerializer):
 class SafeAccountJsonSerializer(AccountJsonSerializer):
     _serializer_name = 'safe'
     def hide_field(self, child):
-        return child in [ 'password','email', 'role', 'phone', 'city', 'document', 'certificates', 'account_roles' ]
+        return child in [ 'password','email', 'role', 'phone', 'city', 'document', 'certificates', 'account_roles', 'search_text' ]
 
 roles_account = db.Table('roles_accounts',
         db.Column('account_id', db.Integer(), db.ForeignKey('account.id')),
@@ -28,6 +30,7 @@ roles_account = db.Table('roles_accounts',
 
 class Account(JsonSerializable, db.Model):
     _serializers = [AccountJsonSerializer, SafeAccountJsonSerializer]
+    SEARCHABLE_FIELDS = ('name', 'badge_name', 'email', 'document')
 
     id               = db.Column(db.Integer, primary_key=True)
     email            = db.Column(db.Text, unique=True)
@@ -70,6 +73,7 @@ class Account(JsonSerializable, db.Model):
     organization     = db.Column(db.Text)
     resume           = db.Column(db.Text)
     certificate_name = db.Column(db.Text)
+    search_text      = db.Column(db.Text)
 
     caravan_invite  = db.relationship('CaravanInvite', uselist=True)
 
@@ -270,6 +274,11 @@ class Account(JsonSerializable, db.Model):
         return None
 
 
+@event.listens_for(Account, 'before_insert')
+@event.listens_for(Account, 'before_update')
+def refresh_search_text(mapper, connection, account):
+    account.search_text = normalize(*[ getattr(account, field) for field in Account.SEARCHABLE_FIELDS ])
+
 class ResetPassword(JsonSerializable, db.Model):
     id           = db.Column(db.Integer, primary_key=True)
     hash         = db.Column(db.String(64))
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
+from sqlalchemy.orm import joinedload, subqueryload
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_,and_
 
-from ..core import logger
+from ..core import logger, container
 from ..core import db
 from ..hasher import Hasher
 
@@ -27,7 +28,7 @@ import schema
 class AccountService(object):
     def __init__(self, db_impl=None, signer=None, mailer=None, hasher=None):
         self.db     = db_impl or db
-        self.mailer = mailer or MailerService()
+        self.mailer = mailer or container.shared(MailerService)
         self.signer = signer or Signer()
         self.hasher = hasher or Hasher()
         self.filters = AccountFilterStrategies()
@@ -109,16 +110,24 @@ class AccountService(object):
         return self._create_or_update(account)
 
     def lookup(self, criteria=None, by=None, limit=0):
-        #TODO: IMPROVE THIS FUNCTION
-        base = self.filters.joins_for(Account.query, **criteria)
-        filters = self.filters.given_criteria(**criteria)
-        queryset = base.filter(and_(*filters))
+        queryset = self.lookup_query(criteria)
 
         if limit:
             queryset = queryset.limit(limit)
 
         return queryset.all()
 
+    def lookup_query(self, criteria=None):
+        #TODO: IMPROVE THIS FUNCTION
+        criteria = criteria or {}
+        base = self.filters.joins_for(Account.query, **criteria)
+        filters = self.filters.given_criteria(**criteria)
+        return base.filter(and_(*filters)).order_by(Account.id)
+
+    def lookup_page(self, criteria=None, cursor=None, per_page=25, total=None):
+        queryset = self.lookup_query(criteria).options(joinedload('corporate'), subqueryload('caravan_invite'))
+        return self.filters.keyset(queryset, Account.id, cursor, per_page, total)
+
     def check_ownership(self, account, alleged):
         if isinstance(account, int): account = self._get_account(id)
         return account and account.can_be_acessed_by(alleged)
@@ -4,9 +4,10 @@ from flask import request, url_for, abort
 from flask.ext.jwt import current_user
 
 from segue.errors import NotAuthorized
-from segue.core import config, logger, cache
+from segue.core import config, logger, cache, container
 from segue.json import SimpleJson
 from segue.decorators import jsoned, admin_only, jwt_only
+from segue.responses import Response
 
 from segue.account.services import AccountService
 from segue.proposal.services import ProposalService
@@ -31,8 +32,8 @@ from promocode import AdminPromoCodeController
 
 class AdminController(object):
     def __init__(self, purchases=None, payments=None, tournaments=None, rankings=None, notifications=None):
-        self.purchases = purchases or PurchaseService()
-        self.payments = payments or PaymentService()
+        self.purchases = purchases or container.shared(PurchaseService)
+        self.payments = payments or container.shared(PaymentService)
         self.tournaments = tournaments or TournamentService()
         self.rankings = rankings or RankingService()
         self.notifications = notifications or NotificationService()
@@ -43,6 +44,10 @@ class AdminController(object):
     @jsoned
     def list_purchases(self):
         parms = request.args.to_dict()
+        if 'cursor' in parms or 'per_page' in parms:
+            paging = { key: parms.pop(key) for key in ('cursor', 'per_page', 'total') if key in parms }
+            result = self.purchases.query_page(as_user=self.current_user, **dict(parms, **paging))
+            return Response.keyset_envelope(result, PurchaseDetailResponse.create(result.items)), 200
         result = self.purchases.query(as_user=self.current_user, **parms)
         return PurchaseDetailResponse.create(result), 200
 
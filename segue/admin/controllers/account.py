@@ -6,21 +6,25 @@ from flask.ext.jwt import current_user
 from segue.decorators import jwt_only, admin_only, jsoned
 from segue.account.services import AccountService
 from segue.purchase.services import PurchaseService
+from segue.account.identifiers import IdentifierResolver
 
 from ..responses import AccountDetailResponse, ProposalDetailResponse
 
-from segue.responses import Response
+from segue.responses import Response, StreamingResponse
 from schemas import AccountDetail
 from segue.schema import Field
+from segue.helpers import keyset_args
 
 
 from flask import request
 from webargs.flaskparser import parser
+from segue.core import container
 
 class AdminAccountController(object):
-    def __init__(self, accounts=None, purchases=None):
-        self.accounts     = accounts or AccountService()
-        self.purchases    = purchases or PurchaseService()
+    def __init__(self, accounts=None, purchases=None, identifiers=None):
+        self.accounts     = accounts or container.shared(AccountService)
+        self.purchases    = purchases or container.shared(PurchaseService)
+        self.identifiers  = identifiers or IdentifierResolver()
         self.current_user = current_user
 
     @jwt_only
@@ -53,8 +57,15 @@ class AdminAccountController(object):
             },
             request
         )
-        result = self.accounts.lookup(criteria=args, limit=20)
-        return Response(result, AccountDetail).create(), 200
+        stream = StreamingResponse.requested_format()
+        if stream:
+            context_for = lambda accounts: dict(identifiers=self.identifiers.resolve(accounts))
+            return StreamingResponse(self.accounts.lookup_query(args), AccountDetail, stream, context_for=context_for).create()
+
+        paging = parser.parse(keyset_args, request)
+        result = self.accounts.lookup_page(criteria=args, **paging)
+        identifiers = self.identifiers.resolve(result.items)
+        return Response(result, AccountDetail, context=dict(identifiers=identifiers)).create(), 200
 
     @jsoned
     @jwt_only
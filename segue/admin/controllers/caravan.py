@@ -3,7 +3,7 @@ from flask.ext.jwt import current_user
 from webargs.flaskparser import parser, use_args
 
 from segue.helpers import search_args
-from segue.responses import Response
+from segue.responses import Response, StreamingResponse
 from segue.schema import Field
 from segue.decorators import jsoned, admin_only, jwt_only
 
@@ -12,13 +12,14 @@ from segue.account.services import AccountService
 from segue.caravan.responses import CaravanResponse, CaravanListResponse, CaravanInviteResponse
 from segue.caravan.services import CaravanService, CaravanInviteService
 from segue.caravan.models import Caravan
+from segue.core import container
 
 
 class AdminCaravanController(object):
 
     def __init__(self, caravans=None, accounts=None):
-        self.caravans = caravans or CaravanService()
-        self.accounts = accounts or AccountService()
+        self.caravans = caravans or container.shared(CaravanService)
+        self.accounts = accounts or container.shared(AccountService)
         self.current_user = current_user
 
     @jsoned
@@ -30,8 +31,16 @@ class AdminCaravanController(object):
             'caravan_name': Field.str(),
             'owner_name': Field.str()
         }, request)
-        
-        result = self.caravans.lookup(criteria, page=args['page'], per_page=args['per_page'])
+
+        stream = StreamingResponse.requested_format()
+        if stream:
+            return StreamingResponse(self.caravans.lookup_query(criteria), CaravanListResponse, stream).create()
+
+        # offset pages stay the default; a ?cursor= (empty for the first page) opts into keyset pages
+        if 'cursor' in args:
+            result = self.caravans.lookup_page(criteria, args.get('cursor'), args['per_page'], args.get('total'))
+        else:
+            result = self.caravans.lookup(criteria, page=args['page'], per_page=args['per_page'])
 
         return Response(result, CaravanListResponse).create(), 200
 
@@ -1,6 +1,5 @@
 from flask.ext.jwt import current_user
 
-from segue.core import cache
 from segue.decorators import jsoned, jwt_only, admin_only
 
 from segue.judge.services import TournamentService, RankingService
@@ -25,12 +24,12 @@ class AdminJudgeController(object):
     @jsoned
     def get_tournament(self, tournament_id):
         result = self.tournaments.get_one(tournament_id)
-        return TournamentDetailResponse.create(result), 200
+        progress = self.tournaments.get_progress(tournament_id)
+        return TournamentDetailResponse.create(result, progress), 200
 
     @jwt_only
     @admin_only
     @jsoned
-    @cache.cached(timeout=60 * 60)
     def get_standings(self, tournament_id):
         result = self.tournaments.get_standings(tournament_id)
         return StandingsResponse.create(result), 200
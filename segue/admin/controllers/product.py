@@ -6,11 +6,12 @@ from flask.ext.jwt import current_user
 from segue.decorators import jwt_only, admin_only, jsoned
 from segue.product.services import ProductService
 from segue.json import JsonFor
+from segue.core import container
 
 
 class AdminProductController(object):
     def __init__(self, products=None):
-        self.products    = products or ProductService()
+        self.products    = products or container.shared(ProductService)
         self.current_user = current_user
 
     @jsoned
@@ -5,9 +5,9 @@ from webargs.flaskparser import parser, use_args
 
 
 from segue.helpers import search_args
-from segue.responses import Response
+from segue.responses import Response, StreamingResponse
 from segue.schema import Field
-from segue.core import cache
+from segue.core import cache, container
 from segue.decorators import jsoned, jwt_only, admin_only
 
 from segue.purchase.promocode import PromoCodeService
@@ -21,8 +21,8 @@ from babel.util import missing
 class AdminPromoCodeController(object):
     def __init__(self, promocodes=None, products=None):
         self.current_user = current_user
-        self.promocodes   = promocodes or PromoCodeService()
-        self.products     = products   or ProductService()
+        self.promocodes   = promocodes or container.shared(PromoCodeService)
+        self.products     = products   or container.shared(ProductService)
 
     @jwt_only
     @admin_only
@@ -34,7 +34,15 @@ class AdminPromoCodeController(object):
             'description': Field.str()
         }, request)
 
-        result = self.promocodes.lookup(criteria=criteria, page=args['page'], per_page=args['per_page'])
+        stream = StreamingResponse.requested_format()
+        if stream:
+            return StreamingResponse(self.promocodes.lookup_query(criteria), PromoCodeListResponse, stream).create()
+
+        # offset pages stay the default; a ?cursor= (empty for the first page) opts into keyset pages
+        if 'cursor' in args:
+            result = self.promocodes.lookup_page(criteria, args.get('cursor'), args['per_page'], args.get('total'))
+        else:
+            result = self.promocodes.lookup(criteria=criteria, page=args['page'], per_page=args['per_page'])
         return Response(result, PromoCodeListResponse).create(), 200
 
     @jwt_only
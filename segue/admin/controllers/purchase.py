@@ -8,16 +8,18 @@ from segue.decorators import jwt_only, admin_only, jsoned
 from segue.purchase.services import PurchaseService, PaymentService, AdempiereService
 from segue.purchase.models import Purchase
 
-from segue.responses import Response
+from segue.responses import Response, StreamingResponse
 from segue.schema import Field
+from segue.helpers import keyset_args
 from schemas import PurchaseDetail
+from segue.core import container
 
 
 
 class AdminPurchaseController(object):
     def __init__(self, purchases=None, payments=None, adempiere=None):
-        self.purchases    = purchases or PurchaseService()
-        self.payments     = payments or PaymentService()
+        self.purchases    = purchases or container.shared(PurchaseService)
+        self.payments     = payments or container.shared(PaymentService)
         self.adempiere = AdempiereService()
         self.current_user = current_user
 
@@ -35,7 +37,12 @@ class AdminPurchaseController(object):
             request
         )
 
-        result = self.purchases.lookup(criteria=args)
+        stream = StreamingResponse.requested_format()
+        if stream:
+            return StreamingResponse(self.purchases.lookup_query(args), PurchaseDetail, stream).create()
+
+        paging = parser.parse(keyset_args, request)
+        result = self.purchases.lookup_page(criteria=args, **paging)
         return Response(result, PurchaseDetail).create(), 200
 
     @jsoned
@@ -13,8 +13,9 @@ class PurchasePersonIdentifier(BaseSchema):
 
 class AccountDetail(AccountSchema):
 
-    has_valid_purchases = Field.bool()
-    identifier = fields.Nested(PurchasePersonIdentifier, attribute='identifier_purchase')
+    # listings pass the identifiers of the whole page, resolved in one query, as context['identifiers']
+    has_valid_purchases = fields.Method('get_has_valid_purchases')
+    identifier = fields.Method('get_identifier')
 
     links = Field.links({
         'proposals': {
@@ -34,6 +35,15 @@ class AccountDetail(AccountSchema):
     class Meta:
         exclude = ('password',)
 
+    def get_has_valid_purchases(self, account):
+        resolved = self.context.get('identifiers', {}).get(account.id)
+        return resolved.has_valid_purchases if resolved else account.has_valid_purchases
+
+    def get_identifier(self, account):
+        resolved = self.context.get('identifiers', {}).get(account.id)
+        purchase = resolved.purchase if resolved else account.identifier_purchase
+        if purchase: return PurchasePersonIdentifier().dump(purchase).data
+
 #TODO: REVIEW
 class PurchaseDetail(BaseSchema):
     id = Field.int()
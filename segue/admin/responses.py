@@ -24,9 +24,11 @@ class TournamentShortResponse(BaseResponse):
         self.round     = tournament.current_round
 
 class TournamentDetailResponse(TournamentShortResponse):
-    def __init__(self, tournament, links=False):
+    def __init__(self, tournament, progress=None, links=False):
         super(TournamentDetailResponse, self).__init__(tournament)
-        self.rounds = [ tournament.status_of_round(i) for i in range(1, tournament.current_round+1) ]
+        progress = progress or tournament.progress()
+        self.rounds = progress['rounds']
+        self.judges = progress['judges']
 
 class PromoCodeListResponse(BaseSchema):
     id = Field.int()
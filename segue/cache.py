@@ -0,0 +1,229 @@
+import time
+import threading
+import cPickle as pickle
+from collections import OrderedDict, Counter, defaultdict
+
+import flask
+from redis import RedisError
+from werkzeug.contrib.cache import BaseCache
+
+from segue.core import logger, redis_connection
+
+# hits and misses are counted per endpoint in memory, and pushed to a redis hash every
+# few seconds so `manage.py cache_stats` can sum them over every worker
+class HitCounter(object):
+    KEY = 'cache:stats'
+    FLUSH_INTERVAL = 10
+
+    def __init__(self, redis_conn=None):
+        self.redis   = redis_conn
+        self.counts  = Counter()
+        self.flushed = time.time()
+        self._lock   = threading.Lock()
+
+    def count(self, hit):
+        endpoint = flask.request.endpoint if flask.has_request_context() else None
+        with self._lock:
+            self.counts['{}:{}'.format(endpoint or 'offline', 'hits' if hit else 'misses')] += 1
+        if self.redis and time.time() - self.flushed >= self.FLUSH_INTERVAL: self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self.counts, self.flushed = self.counts, Counter(), time.time()
+        if not counts or not self.redis: return
+        try:
+            with self.redis.pipeline(transaction=False) as pipeline:
+                for field, value in counts.items():
+                    pipeline.hincrby(self.KEY, field, value)
+                pipeline.execute()
+        except RedisError, e:
+            logger.warning("could not flush cache counters: %s", e)
+
+    def stats(self):
+        totals = Counter()
+        if self.redis:
+            self.flush()
+            totals.update({ field: int(value) for field, value in self.redis.hgetall(self.KEY).items() })
+        else:
+            totals.update(self.counts)
+
+        result = defaultdict(lambda: dict(hits=0, misses=0))
+        for field, value in totals.items():
+            endpoint, kind = field.rsplit(':', 1)
+            result[endpoint][kind] = value
+        for entry in result.values():
+            lookups = entry['hits'] + entry['misses']
+            entry['hit_rate'] = float(entry['hits']) / lookups if lookups else 0.0
+        return dict(result)
+
+class LocalCache(BaseCache):
+    def __init__(self, max_entries=500, default_timeout=300, counter=None):
+        super(LocalCache, self).__init__(default_timeout)
+        self.max_entries = max_entries
+        self.counter     = counter
+        self._entries    = OrderedDict()
+        self._tags       = defaultdict(set)
+        self._lock       = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry and entry[0] > time.time():
+                self._entries[key] = entry
+            elif entry:
+                self._untag(key, entry)
+                entry = None
+        if self.counter: self.counter.count(entry is not None)
+        return entry[1] if entry else None
+
+    def set(self, key, value, timeout=None, tags=()):
+        expires = time.time() + (self.default_timeout if timeout is None else timeout)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (expires, value, tuple(tags))
+            for tag in tags: self._tags[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+        return True
+
+    def add(self, key, value, timeout=None, tags=()):
+        if self.has(key): return False
+        return self.set(key, value, timeout, tags)
+
+    def has(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return bool(entry and entry[0] > time.time())
+
+    def delete(self, key):
+        with self._lock:
+            return self._discard(key) is not None
+
+    def invalidate_tag(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+        return True
+
+    # callers hold the lock; a key leaves the sets of its tags with it, so they do not outgrow the entries
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry: self._untag(key, entry)
+        return entry
+
+    def _untag(self, key, entry):
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is None: continue
+            keys.discard(key)
+            if not keys: del self._tags[tag]
+
+# a small local LRU in front of redis: remote writes and invalidations reach the other workers
+# right away, and their local copies at most local_timeout seconds later
+class TieredCache(BaseCache):
+    def __init__(self, redis_conn, local, key_prefix='cache:', default_timeout=300, counter=None):
+        super(TieredCache, self).__init__(default_timeout)
+        self.redis      = redis_conn
+        self.local      = local
+        self.key_prefix = key_prefix
+        self.counter    = counter
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            try:
+                raw = self.redis.get(self.key_prefix + key)
+            except RedisError, e:
+                logger.warning("cache backend unavailable: %s", e)
+                raw = None
+            if raw is not None:
+                value = pickle.loads(raw)
+                self.local.set(key, value)
+        if self.counter: self.counter.count(value is not None)
+        return value
+
+    def set(self, key, value, timeout=None, tags=()):
+        timeout = self.default_timeout if timeout is None else timeout
+        self.local.set(key, value, min(timeout, self.local.default_timeout) if timeout else self.local.default_timeout, tags)
+        try:
+            extended = self._tags_to_extend(tags, timeout)
+            with self.redis.pipeline() as pipeline:
+                if timeout: pipeline.setex(self.key_prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), timeout)
+                else:       pipeline.set(self.key_prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                for tag in tags:
+                    pipeline.sadd(self._tag_key(tag), key)
+                    if not timeout:      pipeline.persist(self._tag_key(tag))
+                    elif tag in extended: pipeline.expire(self._tag_key(tag), timeout)
+                pipeline.execute()
+        except RedisError, e:
+            logger.warning("cache backend unavailable: %s", e)
+            return False
+        return True
+
+    def add(self, key, value, timeout=None, tags=()):
+        if self.has(key): return False
+        return self.set(key, value, timeout, tags)
+
+    def has(self, key):
+        try:
+            return self.local.has(key) or bool(self.redis.exists(self.key_prefix + key))
+        except RedisError:
+            return False
+
+    def delete(self, key):
+        self.local.delete(key)
+        try:
+            return bool(self.redis.delete(self.key_prefix + key))
+        except RedisError, e:
+            logger.warning("could not delete %s from the cache: %s", key, e)
+            return False
+
+    def invalidate_tag(self, *tags):
+        self.local.invalidate_tag(*tags)
+        try:
+            keys = self.redis.sunion(*[ self._tag_key(tag) for tag in tags ]) if tags else []
+            for key in keys: self.local.delete(key)
+            stale = [ self.key_prefix + key for key in keys ] + [ self._tag_key(tag) for tag in tags ]
+            if stale: self.redis.delete(*stale)
+        except RedisError, e:
+            logger.warning("could not invalidate cache tags %s: %s", tags, e)
+
+    def clear(self):
+        self.local.clear()
+        try:
+            keys = list(self.redis.scan_iter(self.key_prefix + '*'))
+            if keys: self.redis.delete(*keys)
+        except RedisError, e:
+            logger.warning("could not clear the cache: %s", e)
+            return False
+        return True
+
+    def _tag_key(self, tag):
+        return '{}tag:{}'.format(self.key_prefix, tag)
+
+    # a tag set has to outlive every entry under it, so its ttl is only ever extended; ttl() is None
+    # both for a missing set and for one that never expires, hence the exists()
+    def _tags_to_extend(self, tags, timeout):
+        if not tags or not timeout: return set()
+        with self.redis.pipeline(transaction=False) as pipeline:
+            for tag in tags:
+                pipeline.exists(self._tag_key(tag))
+                pipeline.ttl(self._tag_key(tag))
+            replies = pipeline.execute()
+        return set(tag for tag, exists, ttl in zip(tags, replies[::2], replies[1::2])
+                   if not exists or (ttl is not None and ttl < timeout))
+
+# factories for CACHE_TYPE = 'segue.cache.local' or 'segue.cache.tiered'
+def local(app, config, args, kwargs):
+    return LocalCache(max_entries=config['CACHE_THRESHOLD'], counter=HitCounter(), **kwargs)
+
+def tiered(app, config, args, kwargs):
+    redis_conn = redis_connection(config.get('CACHE_REDIS_HOST'), config.get('CACHE_REDIS_PASSWORD'))
+    front = LocalCache(max_entries=config['CACHE_THRESHOLD'], default_timeout=config.get('CACHE_LOCAL_TIMEOUT') or 5)
+    return TieredCache(redis_conn, front, key_prefix=config['CACHE_KEY_PREFIX'], counter=HitCounter(redis_conn), **kwargs)
@@ -2,7 +2,7 @@ import flask
 from flask import request
 from flask.ext.jwt import current_user, verify_jwt, JWTError
 
-from segue.core import config
+from segue.core import config, container
 from segue.json import JsonFor
 from segue.decorators import jsoned, jwt_only, accepts_html
 
@@ -12,7 +12,7 @@ from services import CaravanService, CaravanInviteService
 
 class CaravanController(object):
     def __init__(self, service=None):
-        self.service = service or CaravanService()
+        self.service = service or container.shared(CaravanService)
         self.current_user = current_user
 
     @jwt_only
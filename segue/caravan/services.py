@@ -2,7 +2,7 @@
 import flask
 import schema
 
-from segue.core import db
+from segue.core import db, container
 from segue.hasher import Hasher
 from segue.mailer import MailerService
 from segue.errors import NotAuthorized
@@ -56,10 +56,16 @@ class CaravanService(object):
         return caravan
 
     def lookup(self, criteria, page=None, per_page=None):
-        query = Caravan.query
+        return self.lookup_query(criteria).paginate(page=page, per_page=per_page)
+
+    def lookup_query(self, criteria=None):
+        criteria = criteria or {}
         query = self.filters.joins_for(Caravan.query, **criteria)
         filter_list = self.filters.given_criteria(**criteria)
-        return query.filter(*filter_list).paginate(page=page, per_page=per_page)
+        return query.filter(*filter_list).order_by(Caravan.id)
+
+    def lookup_page(self, criteria=None, cursor=None, per_page=25, total=None):
+        return self.filters.keyset(self.lookup_query(criteria), Caravan.id, cursor, per_page, total)
 
     def modify(self, caravan_id, data, owner, by=None):
         caravan = self.get_one(caravan_id, by)
@@ -122,10 +128,10 @@ class CaravanService(object):
 
 class CaravanInviteService(object):
     def __init__(self, caravans=None, hasher=None, accounts = None, mailer=None):
-        self.caravans  = caravans  or CaravanService()
+        self.caravans  = caravans  or container.shared(CaravanService)
         self.hasher    = hasher    or Hasher()
-        self.mailer    = mailer    or MailerService()
-        self.accounts  = accounts  or AccountService()
+        self.mailer    = mailer    or container.shared(MailerService)
+        self.accounts  = accounts  or container.shared(AccountService)
 
     def list(self, caravan_id, by=None):
         return self.caravans.get_one(caravan_id, by).invites
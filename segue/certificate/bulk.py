@@ -0,0 +1,129 @@
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from segue.core import db, config, logger
+from segue.hasher import Hasher
+from segue.account.models import Account
+from segue.proposal.models import Proposal
+from segue.document.services import DocumentService
+
+from eligibility import CertificateEligibility
+from models import AttendantCertificate, VolunteerCertificate, PressCertificate, SpeakerCertificate
+
+class IssuingCheckpoint(object):
+    def __init__(self, path=None):
+        self.path = path or config.CERTIFICATE_CHECKPOINT or os.path.join(config.STORAGE_DIR, 'certificates.checkpoint')
+
+    def load(self):
+        if not os.path.exists(self.path): return None
+        with open(self.path) as source:
+            value = source.read().strip()
+        return int(value) if value else None
+
+    def save(self, account_id):
+        with open(self.path + '.tmp', 'w') as target:
+            target.write(str(account_id))
+        os.rename(self.path + '.tmp', self.path)
+
+    def clear(self):
+        if os.path.exists(self.path): os.unlink(self.path)
+
+class BulkCertificateIssuer(object):
+    DEFAULT_CHUNK_SIZE = 500
+
+    MODELS = dict(
+        attendant = AttendantCertificate,
+        volunteer = VolunteerCertificate,
+        press     = PressCertificate,
+        speaker   = SpeakerCertificate,
+    )
+
+    def __init__(self, eligibility=None, documents=None, checkpoint=None, hasher=None, chunk_size=None):
+        self.eligibility = eligibility or CertificateEligibility()
+        self.documents   = documents   or DocumentService()
+        self.checkpoint  = checkpoint  or IssuingCheckpoint()
+        self.hasher      = hasher      or Hasher(10)
+        self.chunk_size  = int(chunk_size or config.CERTIFICATE_CHUNK_SIZE or self.DEFAULT_CHUNK_SIZE)
+
+    # chunks hold chunk_size existing accounts each, so sparse id ranges do not produce empty batches
+    def chunks(self, start, end):
+        low = start
+        while low <= end:
+            accounts = db.session.query(Account.id).filter(Account.id.between(low, end))
+            high = accounts.order_by(Account.id).offset(self.chunk_size - 1).limit(1).scalar()
+            high = high or accounts.with_entities(func.max(Account.id)).scalar()
+            if high is None: break
+            yield low, high
+            low = high + 1
+
+    def run(self, start, end, on_chunk=None):
+        result = dict(candidates=0, issued=0, skipped=0, failed=[], chunks=0, checkpoint=None)
+        started = time.time()
+
+        for low, high in self.chunks(start, end):
+            chunk = self.issue_range(low, high)
+            self.checkpoint.save(high)
+
+            result['chunks']    += 1
+            result['candidates'] += chunk['candidates']
+            result['issued']    += chunk['issued']
+            result['skipped']   += chunk['skipped']
+            result['failed'].extend(chunk['failed'])
+            result['checkpoint'] = high
+            logger.info('issued %d certificates for accounts %d-%d in %.3fs', chunk['issued'], low, high, chunk['elapsed'])
+            if on_chunk: on_chunk(chunk, result)
+
+        result['elapsed'] = time.time() - started
+        return result
+
+    def issue_range(self, low, high):
+        started = time.time()
+        candidates = self.eligibility.issuable(low, high)
+        accounts = self._by_id(Account, set(x.account_id for x in candidates))
+        talks    = self._by_id(Proposal, set(x.talk_id for x in candidates if x.talk_id))
+
+        pending, documents, skipped = [], [], 0
+        for candidate in candidates:
+            account = accounts[candidate.account_id]
+            if not account.certificate_name:
+                skipped += 1
+                continue
+            certificate, variables = self.build(candidate, account, talks.get(candidate.talk_id))
+            pending.append((candidate, certificate))
+            documents.append((certificate.template_file, 'certificate', certificate.hash_code, variables))
+
+        # rendering happens before the insert, so a certificate row never points to a missing pdf
+        issued, failed = [], []
+        for (candidate, certificate), (output_path, file_name, error) in zip(pending, self.documents.svgs_to_pdf(documents)):
+            if error: failed.append((candidate, error))
+            else:     issued.append(certificate)
+
+        db.session.bulk_save_objects(issued)
+        db.session.commit()
+
+        elapsed = time.time() - started
+        return dict(start=low, end=high, candidates=len(candidates), issued=len(issued), skipped=skipped,
+                    failed=failed, elapsed=elapsed, rate=len(issued) / elapsed if elapsed else 0.0)
+
+    def build(self, candidate, account, talk=None):
+        certificate = self.MODELS[candidate.kind](
+            account_id = candidate.account_id,
+            ticket_id  = candidate.ticket_id,
+            name       = account.certificate_name,
+            language   = account.guessed_language,
+            hash_code  = self.hasher.generate(),
+            issue_date = datetime.now()
+        )
+        # the talk backref would cascade the certificate into the session; only bulk_save_objects inserts it
+        if talk:
+            certificate.talk_id = talk.id
+            certificate.talk    = talk
+            if certificate in db.session: db.session.expunge(certificate)
+        return certificate, certificate.template_vars
+
+    def _by_id(self, model, ids):
+        if not ids: return {}
+        return { entity.id: entity for entity in model.query.filter(model.id.in_(ids)) }
@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+from sqlalchemy import and_, case, exists, func, select, union
+
+from segue.core import db
+from segue.product.models import Product
+from segue.purchase.models import Purchase
+from segue.proposal.models import Proposal, ProposalInvite
+from segue.schedule.models import Slot
+
+from models import Certificate, SpeakerCertificate
+
+Candidate = namedtuple('Candidate', [ 'account_id', 'kind', 'ticket_id', 'talk_id' ])
+
+class CertificateEligibility(object):
+    SATISFIED_STATUSES = ('paid', 'confirmed')
+
+    VALID_CATEGORIES = (
+        'normal',
+        'student',
+        'promocode',
+        'foreigner',
+        'gov-promocode',
+        'corporate-promocode',
+        'caravan',
+        'caravan-leader',
+        'corporate-promocode',
+        'proponent',
+        'proponent-student'
+    )
+
+    VOLUNTEER_CATEGORY = 'volunteer'
+    PRESS_CATEGORY     = 'press'
+    SPEAKER_CATEGORY   = 'speaker'
+
+    # candidates for every account in [start, end], ordered by account, speakers first; the rules are the
+    # same as Account.satisfied_purchases/presented_talks, but each kind is a single query for the whole range
+    def issuable(self, start, end, exclude_issued=True):
+        candidates = self.ticket_candidates(start, end, exclude_issued) + self.speaker_candidates(start, end, exclude_issued)
+        return sorted(candidates, key=lambda x: (x.account_id, x.kind != 'speaker', x.talk_id or x.ticket_id))
+
+    def ticket_candidates(self, start, end, exclude_issued=True):
+        kind = case([
+            (Product.category == self.VOLUNTEER_CATEGORY, 'volunteer'),
+            (Product.category == self.PRESS_CATEGORY,     'press'),
+        ], else_='attendant')
+
+        query = db.session.query(Purchase.customer_id, kind, Purchase.id) \
+                          .join(Product, Purchase.product_id == Product.id) \
+                          .filter(Purchase.customer_id.between(start, end)) \
+                          .filter(Purchase.status.in_(self.SATISFIED_STATUSES)) \
+                          .filter(Product.category.in_(self.VALID_CATEGORIES + (self.VOLUNTEER_CATEGORY, self.PRESS_CATEGORY)))
+
+        if exclude_issued:
+            query = query.filter(~exists().where(and_(
+                Certificate.account_id == Purchase.customer_id,
+                Certificate.ticket_id  == Purchase.id,
+                Certificate.kind       == kind
+            )))
+
+        return [ Candidate(account_id, kind, ticket_id, None) for account_id, kind, ticket_id in query ]
+
+    def speaker_candidates(self, start, end, exclude_issued=True):
+        owned = select([ Proposal.owner_id.label('account_id'), Proposal.id.label('talk_id') ]) \
+                    .where(Proposal.owner_id.between(start, end))
+        coauthored = select([ ProposalInvite.account_id.label('account_id'), ProposalInvite.proposal_id.label('talk_id') ]) \
+                    .where(ProposalInvite.status == 'accepted') \
+                    .where(ProposalInvite.account_id.between(start, end))
+        talks = union(owned, coauthored).alias('talks')
+
+        speaker_ticket = db.session.query(func.min(Purchase.id)) \
+                                   .join(Product, Purchase.product_id == Product.id) \
+                                   .filter(Purchase.customer_id == talks.c.account_id) \
+                                   .filter(Purchase.status.in_(self.SATISFIED_STATUSES)) \
+                                   .filter(Product.category == self.SPEAKER_CATEGORY) \
+                                   .correlate(talks).as_scalar()
+
+        query = db.session.query(talks.c.account_id, talks.c.talk_id, speaker_ticket) \
+                          .filter(exists().where(and_(Slot.talk_id == talks.c.talk_id, Slot.status == 'confirmed'))) \
+                          .filter(exists().where(and_(Purchase.customer_id == talks.c.account_id, Purchase.status.in_(self.SATISFIED_STATUSES))))
+
+        if exclude_issued:
+            query = query.filter(~exists().where(and_(
+                SpeakerCertificate.account_id == talks.c.account_id,
+                SpeakerCertificate.talk_id    == talks.c.talk_id,
+                SpeakerCertificate.kind       == 'speaker'
+            )))
+
+        return [ Candidate(account_id, 'speaker', ticket_id, talk_id) for account_id, talk_id, ticket_id in query ]
+
+    # speaker certificates are unique per talk, the others per ticket
+    def was_issued(self, account_id, kind, ticket_id=None, talk_id=None):
+        query = Certificate.query.filter(Certificate.account_id == account_id, Certificate.kind == kind)
+        if kind == 'speaker': query = query.filter(SpeakerCertificate.talk_id == talk_id)
+        else:                 query = query.filter(Certificate.ticket_id == ticket_id)
+        return db.session.query(query.exists()).scalar()
@@ -40,6 +40,7 @@ class Certificate(db.Model):
     ticket   = db.relationship('Purchase', backref=db.backref('certificates', uselist=True, lazy='dynamic'))
 
     __tablename__ = 'certificate'
+    __table_args__ = ( db.Index('ix_certificate_account_ticket', 'account_id', 'ticket_id'), )
     __mapper_args__ = { 'polymorphic_on': kind, 'polymorphic_identity': 'certificate' }
 
     def is_like(self, prototype):
@@ -84,7 +85,7 @@ class PressCertificate(Certificate):
 class SpeakerCertificate(Certificate):
     __mapper_args__ = { 'polymorphic_identity': 'speaker' }
 
-    talk_id = db.Column(db.Integer, db.ForeignKey('proposal.id'), name='sc_talk_id')
+    talk_id = db.Column(db.Integer, db.ForeignKey('proposal.id'), name='sc_talk_id', index=True)
     talk    = db.relationship('Proposal', backref=db.backref('certificates', lazy='dynamic'))
 
     def is_like(self, prototype):
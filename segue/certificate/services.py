@@ -1,33 +1,26 @@
+import collections
+
 from segue.core import db
 from segue.hasher import Hasher
 from segue.document.services import DocumentService
+from segue.account.models import Account
+from segue.purchase.models import Purchase
+from segue.proposal.models import Proposal
 
 from factories import SpeakerCertificateFactory, AttendantCertificateFactory, VolunteerCertificateFactory, PressCertificateFactory
 from models import Certificate, AttendantCertificate, SpeakerCertificate, Prototype, PressCertificate
 from errors import CertificateCannotBeIssued, CertificateAlreadyIssued
+from eligibility import CertificateEligibility
 
 class CertificateService(object):
 
-    VALID_CATEGORIES = (
-        'normal',
-        'student',
-        'promocode',
-        'foreigner',
-        'gov-promocode',
-        'corporate-promocode',
-        'caravan',
-        'caravan-leader',
-        'corporate-promocode',
-        'proponent',
-        'proponent-student'
-    )
-
-    VOLUNTEER_CATEGORY = 'volunteer'
-    PRESS_CATEGORY = 'press'
-
-
-    def __init__(self, documents=None):
-        self.documents = documents or DocumentService()
+    VALID_CATEGORIES   = CertificateEligibility.VALID_CATEGORIES
+    VOLUNTEER_CATEGORY = CertificateEligibility.VOLUNTEER_CATEGORY
+    PRESS_CATEGORY     = CertificateEligibility.PRESS_CATEGORY
+
+    def __init__(self, documents=None, eligibility=None):
+        self.documents   = documents or DocumentService()
+        self.eligibility = eligibility or CertificateEligibility()
         self.factories = dict(
             speaker   = SpeakerCertificateFactory(),
             attendant = AttendantCertificateFactory(),
@@ -36,45 +29,26 @@ class CertificateService(object):
         )
 
     def issuable_certificates_for(self, account, exclude_issued=True):
-        candidates = []
-        tickets = account.satisfied_purchases
-        if not tickets: return []
-
-        speaker_ticket = self.speaker_ticket(tickets)
-        if account.presented_talks:
-            for talk in account.presented_talks:
-                candidates.append(Prototype(kind='speaker', account=account, ticket=speaker_ticket, talk=talk))
-
-
-        for ticket in tickets:
-            if ticket.category == CertificateService.VOLUNTEER_CATEGORY:
-                candidates.append(Prototype(kind='volunteer', account=account, ticket=ticket))
-            if ticket.category == CertificateService.PRESS_CATEGORY:
-                candidates.append(Prototype(kind='press', account=account, ticket=ticket))
-            if ticket.category in CertificateService.VALID_CATEGORIES:
-                candidates.append(Prototype(kind='attendant', account=account, ticket=ticket))
+        candidates = self.eligibility.issuable(account.id, account.id, exclude_issued=exclude_issued)
+        return self._prototypes(candidates, accounts={ account.id: account })
 
-        issued_certs = self.issued_certificates_for(account)
-
-        if exclude_issued:
-            return filter(lambda x: not self._is_like_any(x, issued_certs), candidates)
-        else:
-            return candidates
+    def issuable_certificates_between(self, start, end, exclude_issued=True):
+        result = collections.OrderedDict()
+        for prototype in self._prototypes(self.eligibility.issuable(start, end, exclude_issued=exclude_issued)):
+            result.setdefault(prototype.account.id, []).append(prototype)
+        return result
 
     def issue_certificate(self, account, ticket_id, kind, **payload):
         if not account: raise ValueError()
 
         db.session.flush()
 
-        issued_certs   = self.issued_certificates_for(account)
-        issuable_certs = self.issuable_certificates_for(account, exclude_issued=False)
+        talk_id = payload['talk'].id if payload.get('talk') else None
+        if self.eligibility.was_issued(account.id, kind, ticket_id, talk_id): raise CertificateAlreadyIssued()
 
         ticket = self._get_ticket(ticket_id)
         new_cert = self.factories[kind].create(account=account, ticket=ticket, **payload)
 
-        if self._is_like_any(new_cert, issued_certs): raise CertificateAlreadyIssued()
-        #if not self._is_like_any(new_cert, issuable_certs): raise CertificateCannotBeIssued()
-
         self.documents.svg_to_pdf(new_cert.template_file, 'certificate', new_cert.hash_code, new_cert.template_vars)
 
         db.session.add(new_cert)
@@ -82,18 +56,25 @@ class CertificateService(object):
 
         return new_cert
 
-    def speaker_ticket(self, tickets):
-        for ticket in tickets:
-            if ticket.category == 'speaker':
-                return ticket
-        return None
-
     def issued_certificates_for(self, account):
         return Certificate.query.filter(Certificate.account == account).all()
 
-    def _is_like_any(self, candidate, issued_certs):
-        return any([ issued.is_like(candidate) for issued in issued_certs ])
+    # accounts, tickets and talks behind a batch of candidates are loaded with one query each
+    def _prototypes(self, candidates, accounts=None):
+        accounts = accounts or self._by_id(Account, [ x.account_id for x in candidates ])
+        tickets  = self._by_id(Purchase, [ x.ticket_id for x in candidates if x.ticket_id ])
+        talks    = self._by_id(Proposal, [ x.talk_id for x in candidates if x.talk_id ])
+
+        result = []
+        for candidate in candidates:
+            prototype = Prototype(kind=candidate.kind, account=accounts[candidate.account_id], ticket=tickets.get(candidate.ticket_id))
+            if candidate.talk_id: prototype.talk = talks[candidate.talk_id]
+            result.append(prototype)
+        return result
+
+    def _by_id(self, model, ids):
+        if not ids: return {}
+        return { entity.id: entity for entity in model.query.filter(model.id.in_(set(ids))) }
 
     def _get_ticket(self, ticket_id):
-        from segue.purchase.models import Purchase
         return Purchase.query.filter(Purchase.id==ticket_id).first() or abort(404)
@@ -1,3 +1,7 @@
+import threading
+
+import redis
+import flask
 import flask_sqlalchemy
 import flask_jwt
 import flask_mail
@@ -37,16 +41,69 @@ class Logger():
     def __getattr__(self, name):
         return getattr(self._logger, name)
 
+class SegueCache(Cache):
+    def init_app(self, app, config=None):
+        app.config.setdefault('CACHE_TYPE', 'segue.cache.local')
+        app.config.setdefault('CACHE_KEY_PREFIX', 'cache:')
+        super(SegueCache, self).init_app(app, config)
+
+    # drops every entry stored with any of the given tags
+    def invalidate(self, *tags):
+        self.cache.invalidate_tag(*tags)
+
+    def stats(self):
+        counter = getattr(self.cache, 'counter', None)
+        return counter.stats() if counter else {}
+
+class Container():
+    def __init__(self):
+        self._shared = {}
+        self._lock = threading.RLock()
+
+    def shared(self, factory):
+        instance = self._shared.get(factory)
+        if instance is not None: return instance
+
+        # reentrant: building one service builds its dependencies through the container too
+        with self._lock:
+            if factory not in self._shared:
+                self._shared[factory] = factory()
+            return self._shared[factory]
+
+    def scoped(self, factory):
+        if not flask.has_app_context(): return factory()
+        scope = getattr(flask.g, '_scoped_services', None)
+        if scope is None:
+            scope = flask.g._scoped_services = {}
+        if factory not in scope:
+            scope[factory] = factory()
+        return scope[factory]
+
+    def reset(self):
+        with self._lock:
+            self._shared.clear()
+
 db = flask_sqlalchemy.SQLAlchemy()
 jwt = flask_jwt.JWT()
 mailer = flask_mail.Mail()
-cache = Cache(config={'CACHE_TYPE': 'simple'})
+cache = SegueCache()
 config = Config()
 logger = Logger()
+container = Container()
 babel = Babel(default_locale='pt', configure_jinja=False)
 ma = Marshmallow()
 
 jwt_required = flask_jwt.jwt_required
 
+_redis_pools = {}
+
+def redis_connection(host=None, password=None):
+    host     = host     or config.QUEUE_HOST
+    password = password or config.QUEUE_PASSWORD
+    key = (host, password)
+    if key not in _redis_pools:
+        _redis_pools[key] = redis.ConnectionPool(host=host, password=password)
+    return redis.Redis(connection_pool=_redis_pools[key])
+
 def u(value):
     return (value or '').encode("utf-8")
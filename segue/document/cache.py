@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import fcntl
+import errno
+import shutil
+import hashlib
+import threading
+
+from contextlib import contextmanager
+
+from segue.core import config, logger
+
+class RenderCache(object):
+    DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+    EVICT_TO          = 0.9
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root      = root      or os.path.join(config.STORAGE_DIR, 'render-cache')
+        self.max_bytes = max_bytes or config.RENDER_CACHE_MAX_BYTES or self.DEFAULT_MAX_BYTES
+        self._lock     = threading.Lock()
+        self._digests  = {}
+
+    def template_digest(self, template_path):
+        mtime = os.path.getmtime(template_path)
+        cached = self._digests.get(template_path)
+        if cached and cached[0] == mtime: return cached[1]
+        with open(template_path, 'rb') as template:
+            digest = hashlib.sha1(template.read()).hexdigest()
+        self._digests[template_path] = (mtime, digest)
+        return digest
+
+    def key_for(self, template_path, variables):
+        normalized = dict((unicode(key), unicode(value)) for key, value in (variables or {}).items())
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha1(self.template_digest(template_path) + payload).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + '.pdf')
+
+    def fetch(self, key, output_path):
+        artifact = self.path_for(key)
+        if not os.path.isfile(artifact):
+            self._count('misses')
+            return False
+
+        # another worker may evict the entry meanwhile, which is a miss to render again
+        try:
+            if not (os.path.exists(output_path) and os.path.samefile(artifact, output_path)):
+                if os.path.exists(output_path): os.unlink(output_path)
+                self._link(artifact, output_path)
+            os.utime(artifact, None)
+        except OSError, e:
+            if e.errno != errno.ENOENT: raise
+            self._count('misses')
+            return False
+        self._count('hits')
+        return True
+
+    # each entry keeps its own metadata next to the artifact and the totals are kept as running
+    # integers, so storing costs the same however large the cache has grown
+    def store(self, key, output_path, template=None):
+        artifact = self.path_for(key)
+        if not os.path.isdir(os.path.dirname(artifact)): os.makedirs(os.path.dirname(artifact))
+        with self._totals() as totals:
+            try:
+                self._link(output_path, artifact)
+            except OSError, e:
+                if e.errno != errno.EEXIST: raise
+                return
+
+            size = os.path.getsize(artifact)
+            with open(self._meta_path(key), 'w') as meta:
+                json.dump(dict(size=size, template=template, stored=time.time()), meta)
+            totals['entries'] += 1
+            totals['size']    += size
+            if totals['size'] > self.max_bytes: self._evict(totals)
+
+    def stats(self):
+        with self._totals(write=False) as totals:
+            hits, misses = totals['hits'], totals['misses']
+            entries, size = totals['entries'], totals['size']
+        lookups = hits + misses
+        return dict(hits=hits, misses=misses, hit_rate=float(hits) / lookups if lookups else 0.0,
+                    entries=entries, size=size, max_bytes=self.max_bytes)
+
+    # entries are only listed once the cache outgrows its budget, and it is then trimmed below
+    # the budget so that the next listing is many stores away
+    def _evict(self, totals):
+        target = self.max_bytes * self.EVICT_TO
+        for last_used, key, size in sorted(self._entries()):
+            if totals['size'] <= target: break
+            for path in [ self.path_for(key), self._meta_path(key) ]:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            totals['entries'] -= 1
+            totals['size']    -= size
+            logger.info("evicted render cache entry %s", key)
+
+    def _entries(self):
+        for top in os.listdir(self.root):
+            directory = os.path.join(self.root, top)
+            if not os.path.isdir(directory): continue
+            for name in os.listdir(directory):
+                if not name.endswith('.pdf'): continue
+                try:
+                    status = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                yield status.st_mtime, name[:-len('.pdf')], status.st_size
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    def _link(self, source, destination):
+        try:
+            os.link(source, destination)
+        except OSError, e:
+            if e.errno != errno.EXDEV: raise
+            shutil.copyfile(source, destination)
+
+    def _count(self, name):
+        with self._totals() as totals:
+            totals[name] += 1
+
+    # hits, misses, entries and size, kept as integers in one small file; a cache without it
+    # (or left by an older version) has its totals rebuilt from the entries once
+    @contextmanager
+    def _totals(self, write=True):
+        if not os.path.isdir(self.root): os.makedirs(self.root)
+        path = os.path.join(self.root, 'totals.json')
+        with self._lock, open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(path):
+                totals = json.load(open(path))
+            else:
+                entries = list(self._entries())
+                totals = dict(hits=0, misses=0, entries=len(entries), size=sum(size for when, key, size in entries))
+            yield totals
+            if not write: return
+            with open(path + '.tmp', 'w') as target:
+                json.dump(totals, target)
+            os.rename(path + '.tmp', path)
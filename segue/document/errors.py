@@ -23,3 +23,9 @@ class DocumentSaveFailed(SegueError):
     code = 500
     def to_json(self):
         return {'message': _l('Document could not be saved.')}
+
+class DocumentGenerationTimedOut(DocumentGenerationFailed):
+    def to_json(self):
+        return {'message': _l('Document generation timed out.')}
+
+class RendererNotAvailable(DocumentGenerationFailed): pass
@@ -0,0 +1,180 @@
+import os
+import time
+import select
+import threading
+import multiprocessing
+import Queue
+
+from collections import deque
+from subprocess import Popen, PIPE
+
+from segue.core import config, logger
+from segue.document.errors import DocumentGenerationFailed, DocumentGenerationTimedOut, RendererNotAvailable
+
+try:
+    from svglib.svglib import svg2rlg
+    from reportlab.graphics import renderPDF
+except ImportError:
+    svg2rlg = None
+
+class InkscapeRenderer(object):
+    PROMPT          = '>'
+    STARTUP_TIMEOUT = 30
+    MAX_RENDERS     = 200
+
+    def __init__(self, binary=None):
+        self.binary  = binary or config.INKSCAPE_PATH or '/usr/bin/inkscape'
+        self.process = None
+        self.renders = 0
+
+    def start(self):
+        with open(os.devnull, 'w') as devnull:
+            self.process = Popen([ self.binary, '--shell' ], stdin=PIPE, stdout=PIPE, stderr=devnull)
+        logger.info("started inkscape shell with pid %d", self.process.pid)
+        self.renders = 0
+        self._wait_for_prompt(self.STARTUP_TIMEOUT)
+
+    def stop(self):
+        if not self.process: return
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def render(self, svg_path, pdf_path, timeout):
+        # inkscape leaks memory over long sessions, so each shell is recycled after a while
+        if not self.process or self.process.poll() is not None or self.renders >= self.MAX_RENDERS:
+            self.stop()
+            self.start()
+        try:
+            self.process.stdin.write("{} -A {}\n".format(svg_path, pdf_path))
+            self.process.stdin.flush()
+            self._wait_for_prompt(timeout)
+        except (IOError, DocumentGenerationFailed):
+            self.stop()
+            raise
+        self.renders += 1
+
+    def _wait_for_prompt(self, timeout):
+        deadline = time.time() + timeout
+        output = ''
+        descriptor = self.process.stdout.fileno()
+        while not output.rstrip().endswith(self.PROMPT):
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([ descriptor ], [], [], remaining)[0]:
+                raise DocumentGenerationTimedOut()
+            chunk = os.read(descriptor, 4096)
+            if not chunk: raise DocumentGenerationFailed()
+            output += chunk
+        return output
+
+class ReportlabRenderer(object):
+    def __init__(self):
+        if svg2rlg is None: raise RendererNotAvailable()
+
+    def render(self, svg_path, pdf_path, timeout):
+        drawing = svg2rlg(svg_path)
+        if drawing is None: raise DocumentGenerationFailed()
+        renderPDF.drawToFile(drawing, pdf_path)
+
+    def stop(self):
+        pass
+
+RENDERERS = dict(inkscape=InkscapeRenderer, reportlab=ReportlabRenderer)
+
+class RenderJob(object):
+    def __init__(self, svg_path, pdf_path):
+        self.svg_path = svg_path
+        self.pdf_path = pdf_path
+        self.error    = None
+        self.started  = None
+        self.elapsed  = None
+        self.done     = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout): raise DocumentGenerationTimedOut()
+        if self.error: raise self.error
+        return self.pdf_path
+
+class RendererPool(object):
+    DEFAULT_TIMEOUT = 60
+
+    def __init__(self, backend=None, size=None, timeout=None):
+        backend = backend or config.RENDER_BACKEND or 'inkscape'
+        self.backend   = RENDERERS[backend] if isinstance(backend, basestring) else backend
+        self.size      = int(size or config.RENDER_POOL_SIZE or multiprocessing.cpu_count())
+        self.timeout   = float(timeout or config.RENDER_TIMEOUT or self.DEFAULT_TIMEOUT)
+        self.jobs      = Queue.Queue()
+        self.workers   = []
+        self.latencies = deque(maxlen=1000)
+        self.counts    = dict(rendered=0, failed=0, timeouts=0)
+        self._lock     = threading.Lock()
+        self.pid       = os.getpid()
+
+    def start(self):
+        # a forked child inherits the pool but none of its threads, so it starts over with its own queue
+        if self.pid != os.getpid():
+            self.jobs, self.workers, self._lock, self.pid = Queue.Queue(), [], threading.Lock(), os.getpid()
+        with self._lock:
+            self.workers = [ worker for worker in self.workers if worker.is_alive() ]
+            while len(self.workers) < self.size:
+                worker = threading.Thread(target=self._work, name='renderer-{}'.format(len(self.workers)))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self.workers: self.jobs.put(None)
+            for worker in self.workers: worker.join()
+            self.workers = []
+
+    def submit(self, svg_path, pdf_path):
+        self.start()
+        job = RenderJob(svg_path, pdf_path)
+        self.jobs.put(job)
+        return job
+
+    # the timeout runs from when a worker picks the job up, as it may sit behind a long queue; meanwhile
+    # dead workers are replaced, so a queued job is never left without anyone to render it
+    def wait(self, job):
+        while not job.done.wait(self.timeout):
+            self.start()
+            if job.started and time.time() - job.started > self.timeout: break
+        return job.wait(0)
+
+    def render(self, svg_path, pdf_path):
+        return self.wait(self.submit(svg_path, pdf_path))
+
+    def _work(self):
+        renderer = None
+        while True:
+            job = self.jobs.get()
+            if job is None: break
+            job.started = time.time()
+            try:
+                renderer = renderer or self.backend()
+                renderer.render(job.svg_path, job.pdf_path, self.timeout)
+            except DocumentGenerationFailed, e:
+                job.error = e
+            except Exception, e:
+                logger.error("renderer failed on %s: %s", job.svg_path, e)
+                job.error = DocumentGenerationFailed()
+            job.elapsed = time.time() - job.started
+            self._record(job)
+            job.done.set()
+        if renderer: renderer.stop()
+
+    def _record(self, job):
+        with self._lock:
+            self.latencies.append(job.elapsed)
+            if isinstance(job.error, DocumentGenerationTimedOut): self.counts['timeouts'] += 1
+            if job.error: self.counts['failed'] += 1
+            else:         self.counts['rendered'] += 1
+
+    def metrics(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+            counts  = dict(self.counts)
+        percentile = lambda ratio: ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] if ordered else None
+        return dict(counts, p50=percentile(0.5), p99=percentile(0.99), queued=self.jobs.qsize(), workers=len(self.workers))
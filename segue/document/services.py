@@ -4,21 +4,28 @@ import os.path
 import magic
 import base64
 
-from subprocess import Popen, PIPE
 from xml.sax.saxutils import escape
 
-from segue.core import config, logger
+from segue.core import config, logger, container
 from segue.document.errors import *
+from segue.document.renderers import RendererPool
+from segue.document.cache import RenderCache
 
 class DocumentService(object):
 
     EXPECTED_BASE64_HEADER = '^data:.*base64,'
 
-    def __init__(self, override_root=None, template_root=None, magic_impl=None, tmp_dir=None):
+    def __init__(self, override_root=None, template_root=None, magic_impl=None, tmp_dir=None, renderer=None, cache=None):
         self.template_root = template_root or os.path.join(config.APP_PATH, 'segue')
         self.override_root = override_root
         self.magic         = magic_impl or magic
         self.tmp_dir       = tmp_dir or '/tmp'
+        self.renderer      = renderer or container.shared(RendererPool)
+        self.cache         = cache    or self._cache_for(override_root)
+
+    def _cache_for(self, override_root):
+        if override_root: return RenderCache(root=os.path.join(override_root, 'render-cache'))
+        return container.shared(RenderCache)
 
     def get_by_hash(self, kind, document_hash):
         root = self.override_root or config.STORAGE_DIR
@@ -73,6 +80,51 @@ class DocumentService(object):
         return output_path, file_name
 
     def svg_to_pdf(self, template, kind, hash_code, variables=dict()):
+        key, output_path, file_name = self._locate(template, kind, hash_code, variables)
+        if self.cache.fetch(key, output_path): return output_path, file_name
+
+        temp_path = self._prepare(template, kind, hash_code, variables, output_path)
+        try:
+            self.renderer.render(temp_path, output_path)
+        finally:
+            self._discard(temp_path)
+        self.cache.store(key, self._check(output_path), template)
+        return output_path, file_name
+
+    # renders (template, kind, hash_code, variables) tuples across the pool and returns
+    # (output_path, file_name, error) in the same order, so one bad document does not sink the batch
+    def svgs_to_pdf(self, documents):
+        pending = []
+        for template, kind, hash_code, variables in documents:
+            key, output_path, file_name = self._locate(template, kind, hash_code, variables)
+            if self.cache.fetch(key, output_path):
+                pending.append((None, key, template, output_path, file_name))
+                continue
+            temp_path = self._prepare(template, kind, hash_code, variables, output_path)
+            pending.append((self.renderer.submit(temp_path, output_path), key, template, output_path, file_name))
+
+        result = []
+        for job, key, template, output_path, file_name in pending:
+            try:
+                if job:
+                    try:
+                        self.renderer.wait(job)
+                    finally:
+                        self._discard(job.svg_path)
+                    self.cache.store(key, self._check(output_path), template)
+                result.append((output_path, file_name, None))
+            except DocumentGenerationFailed, e:
+                result.append((None, file_name, e))
+        return result
+
+    def _locate(self, template, kind, hash_code, variables):
+        file_name = "{}-{}.pdf".format(kind, hash_code)
+        output_root = self.override_root or config.STORAGE_DIR
+        output_path = self.path_for_filename(output_root, file_name, ensure_viable=True)
+        key = self.cache.key_for(os.path.join(self.template_root, template), variables)
+        return key, output_path, file_name
+
+    def _prepare(self, template, kind, hash_code, variables, output_path):
         template_path = os.path.join(self.template_root, template)
 
         with codecs.open(template_path, "rb", "utf8") as template_file:
@@ -80,27 +132,26 @@ class DocumentService(object):
             for key, value in variables.items():
                 content = content.replace("%%{}%%".format(key), escape(value))
 
-        file_name = "{}-{}.pdf".format(kind, hash_code)
-        temp_path = os.path.join(self.tmp_dir, file_name)
+        temp_path = os.path.join(self.tmp_dir, "{}-{}.svg".format(kind, hash_code))
         with codecs.open(temp_path, "wb", "utf8") as temp_file:
             temp_file.write(content)
 
         logger.info("created %s with length of %d ", temp_path, len(content))
 
-        output_root = self.override_root or config.STORAGE_DIR
-        output_path = self.path_for_filename(output_root, file_name, ensure_viable=True)
+        # a previous output may be a hard link into the render cache; never render over it in place
+        if os.path.exists(output_path): os.unlink(output_path)
 
-        logger.info("attempting to convert %s to %s", temp_path, output_path)
+        logger.info("queueing conversion of %s to %s", temp_path, output_path)
+        return temp_path
 
-        command = [ "/usr/bin/inkscape", "-z", "-f", temp_path, "-A", output_path ]
-        process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-        logger.info("invoked inscape with command %s pid %d", " ".join(command), process.pid)
+    def _discard(self, temp_path):
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
 
-        process.wait()
+    def _check(self, output_path):
         if not os.path.isfile(output_path):
-            logger.info("output does not look like a file! dumping stderr and stdout next")
-            logger.info(process.stderr.read())
-            logger.info(process.stdout.read())
+            logger.info("output %s does not look like a file!", output_path)
             raise DocumentGenerationFailed()
-
-        return output_path, file_name
+        return output_path
@@ -94,6 +94,9 @@ class NotAuthorized(SegueError):
     def to_json(self):
         return { 'message': 'user is not authorized for this action' }
 
+class InvalidCursor(SegueGenericError):
+    MESSAGE = 'invalid pagination cursor'
+
 class SegueFieldError(SegueError):
     code = 422
 
@@ -1,19 +1,45 @@
+import base64
+import binascii
+
+from flask import json
 from sqlalchemy import or_
 
+from segue.errors import InvalidCursor
+
+_STRATEGIES = {}
+
+class KeysetPage(object):
+    def __init__(self, items, per_page, cursor=None, next_cursor=None, total=None):
+        self.items       = items
+        self.per_page    = per_page
+        self.cursor      = cursor
+        self.next_cursor = next_cursor
+        self.total       = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
 class FilterStrategies(object):
+    @classmethod
+    def strategies(cls, prefix):
+        key = (cls, prefix)
+        if key not in _STRATEGIES:
+            _STRATEGIES[key] = [ name for name in dir(cls) if name.startswith(prefix) ]
+        return _STRATEGIES[key]
+
     def needle(self, needle, as_user=None, **kw):
         if not needle and len(kw) == 0: return []
         universe = self.given(**kw)
 
         filters = []
         joins = []
-        for method_name in dir(self):
-            if not method_name.startswith("by_"): continue
-            if not needle: continue
-            method = getattr(self, method_name)
-            criterium = method(needle)
-            if criterium is None: continue
-            filters.append(criterium)
+        if needle:
+            for method_name in self.strategies("by_"):
+                method = getattr(self, method_name)
+                criterium = method(needle)
+                if criterium is None: continue
+                filters.append(criterium)
 
         if as_user and as_user.role != 'admin':
             universe.append(self.enforce_user(as_user))
@@ -22,6 +48,9 @@ class FilterStrategies(object):
 
         return universe
 
+    def ranking(self, needle):
+        return []
+
     def given(self, as_user=None, **criteria):
         result = []
         for key, value in criteria.items():
@@ -47,10 +76,58 @@ class FilterStrategies(object):
             result = method(result)
         return result
 
+    # seek pagination: the cursor carries the last key of the previous page, so every page is a
+    # `key > last ORDER BY key LIMIT n` no matter how deep; total is None, 'exact' or 'approximate'
+    def keyset(self, queryset, key, cursor=None, per_page=25, total=None):
+        per_page = max(1, int(per_page or 25))
+        queryset = queryset.order_by(None)
+
+        page = queryset.order_by(key)
+        after = self.decode_cursor(cursor, key.type.python_type)
+        if after is not None: page = page.filter(key > after)
+
+        items = page.limit(per_page + 1).all()
+        next_cursor = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            next_cursor = self.encode_cursor(getattr(items[-1], key.key))
+
+        if total == 'exact':         total = queryset.count()
+        elif total == 'approximate': total = self.estimated_count(queryset)
+        else:                        total = None
+
+        return KeysetPage(items, per_page, cursor, next_cursor, total)
+
+    # the planner's row estimate costs nothing next to a COUNT(*); other databases get the exact count
+    def estimated_count(self, queryset):
+        connection = queryset.session.connection()
+        if connection.dialect.name != 'postgresql': return queryset.order_by(None).count()
+
+        compiled = queryset.order_by(None).statement.compile(dialect=connection.dialect)
+        plan = connection.execute('EXPLAIN (FORMAT JSON) ' + unicode(compiled), compiled.params).scalar()
+        if isinstance(plan, basestring): plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @staticmethod
+    def encode_cursor(value):
+        return base64.urlsafe_b64encode(json.dumps([ value ])).rstrip('=')
+
+    # the value is compared to the key as it is, so it must also have the key's type
+    @staticmethod
+    def decode_cursor(cursor, kind=None):
+        if not cursor: return None
+        try:
+            cursor = str(cursor)
+            value = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))[0]
+        except (TypeError, ValueError, IndexError, KeyError, UnicodeError, binascii.Error):
+            raise InvalidCursor()
+        accepted = { int: (int, long), long: (int, long), str: basestring, unicode: basestring }.get(kind, kind)
+        if accepted and (isinstance(value, bool) or not isinstance(value, accepted)): raise InvalidCursor()
+        return value
+
     def all_joins(self, queryset, needle=None):
         result = queryset
-        for method_name in dir(self):
-            if not method_name.startswith("join_for_"): continue
+        for method_name in self.strategies("join_for_"):
             method = getattr(self, method_name)
             result = method(result, needle)
         return result
@@ -1,5 +1,5 @@
 from datetime import datetime
-from segue.core import config, db
+from segue.core import config, db, container
 
 from flask import request, abort, redirect
 from flask.ext.jwt import current_user
@@ -34,7 +34,7 @@ class PrinterController(object):
 
 class ReceptionController(object):
     def __init__(self, people=None):
-        self.people = people or PeopleService()
+        self.people = people or container.shared(PeopleService)
 
     @jsoned
     @accepts_html
@@ -48,8 +48,8 @@ class ReceptionController(object):
 
 class PersonController(object):
     def __init__(self, people=None, badges=None):
-        self.people = people or PeopleService()
-        self.badges = badges or BadgeService()
+        self.people = people or container.shared(PeopleService)
+        self.badges = badges or container.shared(BadgeService)
         self.current_user = current_user
 
     @jwt_only
@@ -266,7 +266,7 @@ class PersonController(object):
 
 class SpeakerController(object):
     def __init__(self, badges=None, speakers=None):
-        self.badges = badges or BadgeService()
+        self.badges = badges or container.shared(BadgeService)
         self.speakers = speakers or SpeakerService()
         self.current_user = current_user
 
@@ -284,7 +284,7 @@ class SpeakerController(object):
 
 class BadgeController(object):
     def __init__(self, badges=None):
-        self.badges       = badges or BadgeService()
+        self.badges       = badges or container.shared(BadgeService)
         self.current_user = current_user
 
     @jwt_only
@@ -1,20 +1,22 @@
 from segue.filters import FilterStrategies
+from segue.search import TextSearch
 from segue.purchase.models import Purchase
 from segue.account.models import Account
 
 class FrontDeskFilterStrategies(FilterStrategies):
+    search = TextSearch(Account.search_text)
+
     def by_customer_id(self, value, as_user=None):
         if isinstance(value, basestring) and not value.isdigit(): return
         return Purchase.id == value
 
     def by_customer_name(self, value, as_user=None):
-        if isinstance(value, basestring) and value.isdigit(): return
-        value = value.replace(" ","%")
-        return Account.name.ilike('%'+value+'%')
+        if isinstance(value, basestring) and (value.isdigit() or "@" in value): return
+        return self.search.matches(value)
 
     def by_customer_email(self, value, as_user=None):
         if isinstance(value, basestring) and "@" in value:
-            return Account.email.ilike('%'+value+'%')
+            return self.search.matches(value)
 
     def by_customer_document(self, value, as_user=None):
         if isinstance(value, basestring):
@@ -31,3 +33,7 @@ class FrontDeskFilterStrategies(FilterStrategies):
             return queryset.join('customer')
         else:
             return queryset
+
+    def ranking(self, needle):
+        if isinstance(needle, basestring) and needle.isdigit(): return []
+        return self.search.ranking(needle)
@@ -140,7 +140,8 @@ class Visitor(db.Model):
 
 
 class Person(object):
-    def __init__(self, purchase, links=False):
+    def __init__(self, purchase, links=False, preloaded=None):
+        self._preloaded   = preloaded or {}
         self.id           = purchase.id
 
         self.customer_id   = purchase.customer.id
@@ -162,7 +163,10 @@ class Person(object):
         self.address_extra        = purchase.customer.address_extra
         self.address_zipcode      = purchase.customer.address_zipcode
 
-        self.has_promocode   = purchase.customer.has_promocode
+        if 'has_promocode' in self._preloaded:
+            self.has_promocode = self._preloaded['has_promocode']
+        else:
+            self.has_promocode = purchase.customer.has_promocode
 
         self.product_description = purchase.product.description
         self.category            = purchase.product.category
@@ -183,6 +187,7 @@ class Person(object):
     @property
     def donation_promocodes(self):
         from segue.models import PromoCode
+        if 'donation_promocodes' in self._preloaded: return self._preloaded['donation_promocodes']
 
         donation_products = db.session.query(Product.promocode_product_id).filter(Product.category == 'donation').subquery()
         return PromoCode.query\
@@ -199,6 +204,11 @@ class Person(object):
     def product(self):
         return self.purchase.product
 
+    @property
+    def valid_payments(self):
+        if 'valid_payments' in self._preloaded: return self._preloaded['valid_payments']
+        return self.purchase.valid_payments.all()
+
     @property
     def kind(self):
         return self.purchase.product.kind
@@ -206,10 +216,15 @@ class Person(object):
     @property
     def outstanding_amount(self):
         if self.is_valid_ticket: return None
+        return self._purchase_outstanding_amount()
+
+    def _purchase_outstanding_amount(self):
+        if 'paid_amount' in self._preloaded: return self.purchase.total_amount - self._preloaded['paid_amount']
         return self.purchase.outstanding_amount
 
     @property
     def related_count(self):
+        if 'related_count' in self._preloaded: return self._preloaded['related_count']
         return len(self.purchase.customer.purchases) - 1
 
     @property
@@ -244,6 +259,7 @@ class Person(object):
 
     @property
     def last_badge(self):
+        if 'last_badge' in self._preloaded: return self._preloaded['last_badge']
         return self.purchase.badges.order_by(Badge.created.desc()).first()
 
     @property
@@ -261,7 +277,8 @@ class Person(object):
 
     @property
     def can_change_product(self):
-        return not (self.purchase.stale or self.purchase.satisfied or self.purchase.has_started_payment)
+        if self.purchase.stale or self.purchase.satisfied: return False
+        return not self._purchase_outstanding_amount() < self.purchase.amount
 
     @property
     def eligible_donation_products(self):
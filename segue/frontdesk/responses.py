@@ -44,7 +44,7 @@ class PersonResponse(BaseResponse):
         self.donation_promocodes = DonationPromocode.create(person.donation_promocodes)
 
         if embeds:
-            self.payments   = PaymentResponse.create(person.purchase.valid_payments.all())
+            self.payments   = PaymentResponse.create(person.valid_payments)
             self.product    = ProductResponse.create(person.purchase.product)
             self.last_badge = BadgeResponse.create(person.last_badge)
 
@@ -1,20 +1,24 @@
 import jsonschema
 from datetime import datetime
-from redis import Redis
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload
 from rq import Queue
+from rq.job import Job, JobStatus
+from rq.utils import utcnow
 
-from segue.core import db, config, logger
+from segue.core import db, config, logger, container, redis_connection
 from segue.filters import FilterStrategies
 from segue.errors import SegueValidationError, SchemaValidationError
 from segue.hasher import Hasher
 from segue.mailer import MailerService
 
-from segue.models import Purchase
+from segue.models import Purchase, Payment, Product, PromoCode
 from segue.account.services import AccountService
 from segue.purchase.services import PurchaseService, PaymentService
 from segue.purchase.errors import PurchaseAlreadySatisfied
 from segue.purchase.cash import CashPaymentService
 from segue.purchase.promocode import PromoCodePaymentService
+from segue.purchase.aggregates import PaymentAggregates
 from segue.purchase.factories import BuyerFactory
 from segue.product.errors import WrongBuyerForProduct
 from segue.product.services import ProductService
@@ -32,19 +36,32 @@ def _validate(schema_name, data):
         raise SegueValidationError(errors)
 
 class PrinterService(object):
-    def __init__(self, name='default', queue_host=None, queue_password=None):
-        host     = queue_host     or config.QUEUE_HOST
-        password = queue_password or config.QUEUE_PASSWORD
-        redis_conn = Redis(host=host, password=password)
-        self.queue = Queue(name, connection=redis_conn)
+    def __init__(self, name='default', queue_host=None, queue_password=None, redis_conn=None):
+        self.redis = redis_conn or redis_connection(queue_host, queue_password)
+        self.queue = Queue(name, connection=self.redis)
 
     def print_badge(self, badge):
         return self.queue.enqueue('worker.print_badge', badge.print_data())
 
+    def print_badges(self, badges):
+        # same bookkeeping as Queue.enqueue_job, but every job goes out in a single round-trip
+        jobs = []
+        with self.redis.pipeline() as pipeline:
+            pipeline.sadd(self.queue.redis_queues_keys, self.queue.key)
+            for badge in badges:
+                job = Job.create('worker.print_badge', args=(badge.print_data(),), connection=self.redis,
+                                 status=JobStatus.QUEUED, origin=self.queue.name, timeout=Queue.DEFAULT_TIMEOUT)
+                job.enqueued_at = utcnow()
+                job.save(pipeline=pipeline)
+                self.queue.push_job_id(job.id, pipeline=pipeline)
+                jobs.append(job)
+            pipeline.execute()
+        return jobs
+
 class BadgeService(object):
-    def __init__(self, override_config=None):
+    def __init__(self, override_config=None, printers=None):
         self.config = override_config or config
-        self.printers = { name: PrinterService(name) for name in config.PRINTERS }
+        self.printers = printers or { name: PrinterService(name) for name in config.PRINTERS }
 
     def latest_attempt_for_person(self, person_id):
         return Badge.query.filter(Badge.person_id == person_id).order_by(Badge.created.desc()).first()
@@ -66,22 +83,22 @@ class BadgeService(object):
         return True
 
     def report_failure(self, job_id):
-        badge = Badge.query.filter(Badge.job_id == job_id).first()
-        if not badge: return False
-        if badge.result == 'failed': return False
-        badge.result = 'failed'
-        db.session.add(badge)
-        db.session.commit()
-        return True
+        return self.report_results([ job_id ], 'failed') > 0
 
     def report_success(self, job_id):
-        badge = Badge.query.filter(Badge.job_id == job_id).first()
-        if not badge: return False
-        if badge.result == 'success': return False
-        badge.result = 'success'
-        db.session.add(badge)
+        return self.report_results([ job_id ], 'success') > 0
+
+    def report_results(self, job_ids, result, chunk_size=500):
+        job_ids = list(job_ids)
+        if not job_ids: return 0
+        updated = 0
+        for start in range(0, len(job_ids), chunk_size):
+            updated += Badge.query\
+                .filter(Badge.job_id.in_(job_ids[start:start + chunk_size]))\
+                .filter(or_(Badge.result == None, Badge.result != result))\
+                .update({ Badge.result: result }, synchronize_session=False)
         db.session.commit()
-        return True
+        return updated
 
     def make_badge(self, printer, visitor_or_person, organization=None, copies=1, by_user=None):
         if not visitor_or_person.can_print_badge: raise CannotPrintBadge()
@@ -95,6 +112,24 @@ class BadgeService(object):
         db.session.add(badge)
         db.session.commit()
 
+    def print_badges(self, printer, people, copies=1, by_user=None):
+        if printer not in self.printers: raise InvalidPrinter()
+        badges = []
+        for person in people:
+            if not person.can_print_badge: raise CannotPrintBadge()
+            badge = Badge.create(person)
+            badge.printer = printer
+            badge.issuer  = by_user
+            badge.copies  = copies
+            badges.append(badge)
+        if not badges: return badges
+
+        for badge, job in zip(badges, self.printers[printer].print_badges(badges)):
+            badge.job_id = job.id
+        db.session.add_all(badges)
+        db.session.commit()
+        return badges
+
     def give_badge(self, badge_id):
         badge = Badge.query.filter(Badge.id == badge_id).first()
         if not badge: return None
@@ -106,11 +141,11 @@ class BadgeService(object):
 
 class SpeakerService(object):
     def __init__(self, purchases=None, accounts=None, badges=None):
-        self.badges = badges or BadgeService()
-        self.purchases = purchases or PurchaseService()
-        self.accounts = accounts or AccountService()
-        self.products = ProductService()
-        self.peoples = PeopleService()
+        self.badges = badges or container.shared(BadgeService)
+        self.purchases = purchases or container.shared(PurchaseService)
+        self.accounts = accounts or container.shared(AccountService)
+        self.products = container.shared(ProductService)
+        self.peoples = container.shared(PeopleService)
 
     def create(self, ticket=None, printer=None, by_user=None, **data):
         #TODO: FIX
@@ -130,7 +165,7 @@ class SpeakerService(object):
 
 class VisitorService(object):
     def __init__(self, badges=None):
-        self.badges = badges or BadgeService()
+        self.badges = badges or container.shared(BadgeService)
 
     def create(self, printer, by_user=None, **data):
 
@@ -146,6 +181,78 @@ class VisitorService(object):
         return visitor
 
 
+class PersonLoader(object):
+    def __init__(self, aggregates=None):
+        self.aggregates = aggregates or PaymentAggregates()
+
+    def load(self, queryset):
+        rows = queryset.options(joinedload('customer'), joinedload('product'), joinedload('buyer')) \
+                       .add_columns(self.aggregates.paid_amount_subquery()).all()
+        if not rows: return []
+
+        purchases    = [ purchase for purchase, paid_amount in rows ]
+        paid_amounts = { purchase.id: paid_amount for purchase, paid_amount in rows }
+
+        purchase_ids = [ purchase.id          for purchase in purchases ]
+        customer_ids = [ purchase.customer_id for purchase in purchases ]
+
+        promocode_counts    = self._promocode_counts(customer_ids)
+        donation_promocodes = self._donation_promocodes(customer_ids)
+        purchase_counts     = self._purchase_counts(customer_ids)
+        last_badges         = self._last_badges(purchase_ids)
+        valid_payments      = self._valid_payments(purchase_ids)
+
+        result = []
+        for purchase in purchases:
+            preloaded = dict(
+                has_promocode       = promocode_counts.get(purchase.customer_id, 0) > 0,
+                donation_promocodes = donation_promocodes.get(purchase.customer_id, []),
+                related_count       = purchase_counts.get(purchase.customer_id, 1) - 1,
+                last_badge          = last_badges.get(purchase.id),
+                paid_amount         = paid_amounts[purchase.id],
+                valid_payments      = valid_payments.get(purchase.id, [])
+            )
+            result.append(Person(purchase, preloaded=preloaded))
+        return result
+
+    def _promocode_counts(self, customer_ids):
+        query = db.session.query(PromoCode.creator_id, func.count(PromoCode.id)) \
+                          .filter(PromoCode.creator_id.in_(customer_ids)) \
+                          .group_by(PromoCode.creator_id)
+        return dict(query.all())
+
+    def _donation_promocodes(self, customer_ids):
+        donation_products = db.session.query(Product.promocode_product_id).filter(Product.category == 'donation').subquery()
+        promocodes = PromoCode.query \
+                              .filter(PromoCode.creator_id.in_(customer_ids)) \
+                              .filter(PromoCode.product_id.in_(donation_products)).all()
+        result = {}
+        for promocode in promocodes:
+            result.setdefault(promocode.creator_id, []).append(promocode)
+        return result
+
+    def _purchase_counts(self, customer_ids):
+        query = db.session.query(Purchase.customer_id, func.count(Purchase.id)) \
+                          .filter(Purchase.customer_id.in_(customer_ids)) \
+                          .group_by(Purchase.customer_id)
+        return dict(query.all())
+
+    def _valid_payments(self, purchase_ids):
+        payments = Payment.query.filter(Payment.purchase_id.in_(purchase_ids)) \
+                                .filter(Payment.status.in_(Payment.VALID_PAYMENT_STATUSES)) \
+                                .order_by(Payment.id)
+        result = {}
+        for payment in payments:
+            result.setdefault(payment.purchase_id, []).append(payment)
+        return result
+
+    def _last_badges(self, purchase_ids):
+        latest = db.session.query(Badge.person_id, func.max(Badge.created).label('created')) \
+                           .filter(Badge.person_id.in_(purchase_ids)) \
+                           .group_by(Badge.person_id).subquery()
+        badges = Badge.query.join(latest, and_(Badge.person_id == latest.c.person_id, Badge.created == latest.c.created))
+        return { badge.person_id: badge for badge in badges.all() }
+
 class ReportService(object):
     def __init__(self, payments=None):
         self.payments = payments or CashPaymentService()
@@ -155,15 +262,16 @@ class ReportService(object):
 
 class PeopleService(object):
     def __init__(self, purchases=None, filters=None, products=None, promocodes=None,
-                       accounts=None, hasher=None, mailer=None, cash=None):
-        self.products   = products   or ProductService()
-        self.purchases  = purchases  or PurchaseService()
-        self.accounts   = accounts   or AccountService()
+                       accounts=None, hasher=None, mailer=None, cash=None, loader=None):
+        self.products   = products   or container.shared(ProductService)
+        self.purchases  = purchases  or container.shared(PurchaseService)
+        self.accounts   = accounts   or container.shared(AccountService)
         self.filters    = filters    or FrontDeskFilterStrategies()
         self.hasher     = hasher     or Hasher()
-        self.mailer     = mailer     or MailerService()
-        self.cash       = cash       or PaymentService()
+        self.mailer     = mailer     or container.shared(MailerService)
+        self.cash       = cash       or container.shared(PaymentService)
         self.promocodes = promocodes or PromoCodePaymentService()
+        self.loader     = loader     or PersonLoader()
 
     def get_by_hash(self, hash_code):
         purchase = self.purchases.get_by_hash(hash_code, strict=True)
@@ -204,18 +312,19 @@ class PeopleService(object):
     def send_reception_mail(self, person_id):
         purchase = self.purchases.get_one(person_id, strict=True, check_ownership=False)
 
-        if not purchase.hash_code:
-            purchase.hash_code = self.hasher.generate()
-            db.session.add(purchase)
-            db.session.commit()
-
-        person = Person(purchase)
+        person = self.ensure_hash_code(Person(purchase))
         self.mailer.reception_mail(person)
         return person
 
+    def ensure_hash_code(self, person):
+        if not person.purchase.hash_code:
+            person.purchase.hash_code = self.hasher.generate()
+            db.session.add(person.purchase)
+            db.session.commit()
+        return person
+
     def by_range(self, start, end):
-        purchases = self.purchases.by_range(start, end).all()
-        return map(Person, purchases)
+        return self.loader.load(self.purchases.by_range(start, end))
 
     def get_one(self, person_id, by_user=None, check_ownership=True, strict=True):
         purchase = self.purchases.get_one(person_id, by=by_user, strict=True, check_ownership=check_ownership)
@@ -241,8 +350,9 @@ class PeopleService(object):
     def lookup(self, needle, by_user=None, limit=20):
         base    = self.filters.all_joins(Purchase.query)
         filters = self.filters.needle(needle)
-        query   = base.filter(*filters).order_by(Purchase.status, Purchase.id).limit(limit)
-        return map(Person, query.all())
+        ranking = self.filters.ranking(needle)
+        query   = base.filter(*filters).order_by(*(ranking + [ Purchase.status, Purchase.id ])).limit(limit)
+        return self.loader.load(query)
 
     def apply_promo(self, person_id, promo_hash, by_user=None):
         person  = self.get_one(person_id, by_user=by_user, strict=True)
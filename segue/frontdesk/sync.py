@@ -0,0 +1,99 @@
+import time
+from collections import deque
+
+from rq import Queue
+from rq.job import Job
+from rq.queue import get_failed_queue
+from rq.registry import FinishedJobRegistry
+from rq.worker import DEFAULT_RESULT_TTL
+
+from segue.core import config, container, redis_connection
+
+from services import BadgeService
+
+class BadgeStatusSync(object):
+    WATERMARK_KEY = 'badges:sync:watermark:{}'
+    METRICS_KEY   = 'badges:sync:metrics'
+    BATCH_SIZE    = 500
+    WINDOW        = 60
+
+    def __init__(self, redis_conn=None, badges=None, printers=None, result_ttl=None):
+        self.redis      = redis_conn or redis_connection()
+        self.badges     = badges     or container.shared(BadgeService)
+        self.printers   = printers   or config.PRINTERS
+        self.result_ttl = result_ttl or DEFAULT_RESULT_TTL
+        self.failed     = get_failed_queue(connection=self.redis)
+        self.watermarks = {}
+        self.history    = deque()
+        self.lag        = 0.0
+
+    def watermark(self, printer):
+        if printer not in self.watermarks:
+            score = self.redis.get(self.WATERMARK_KEY.format(printer))
+            self.watermarks[printer] = (float(score or 0), set())
+        return self.watermarks[printer]
+
+    def finished_since_watermark(self, printer):
+        # registry scores are finish time + result ttl, so they only grow; the ids sitting exactly
+        # on the watermark are remembered because several jobs may finish within the same second
+        key = FinishedJobRegistry(printer, connection=self.redis).key
+        score, seen = self.watermark(printer)
+        entries = self.redis.zrangebyscore(key, score, '+inf', withscores=True)
+        fresh = [ (job_id, when) for job_id, when in entries if not (when == score and job_id in seen) ]
+        if not fresh: return fresh, None
+        top = max(when for job_id, when in entries)
+        return fresh, (top, set(job_id for job_id, when in entries if when == top))
+
+    def advance_watermark(self, printer, mark):
+        self.redis.set(self.WATERMARK_KEY.format(printer), mark[0])
+        self.watermarks[printer] = mark
+
+    def pull_failures(self, timeout):
+        first = self.redis.blpop(self.failed.key, timeout)
+        if not first: return []
+
+        with self.redis.pipeline() as pipeline:
+            pipeline.lrange(self.failed.key, 0, self.BATCH_SIZE - 1)
+            pipeline.ltrim(self.failed.key, self.BATCH_SIZE, -1)
+            rest, _ = pipeline.execute()
+
+        return [ first[1] ] + rest
+
+    def sync(self, timeout=5):
+        failed = self.pull_failures(timeout)
+        try:
+            result = dict(failed=self.badges.report_results(failed, 'failed'), success=0)
+        except:
+            if failed: self.redis.rpush(self.failed.key, *failed)
+            raise
+        if failed: self.redis.delete(*[ Job.key_for(job_id) for job_id in failed ])
+
+        for printer in self.printers:
+            entries, mark = self.finished_since_watermark(printer)
+            if not entries: continue
+            result['success'] += self.badges.report_results([ job_id for job_id, when in entries ], 'success')
+            # only moved once the results are committed, so a failed commit is retried on the next sync
+            self.advance_watermark(printer, mark)
+            oldest_finish = min(when for job_id, when in entries) - self.result_ttl
+            self.lag = max(0.0, time.time() - oldest_finish)
+
+        self._record(len(failed) + result['success'])
+        return result
+
+    def _record(self, synced, now=None):
+        now = now or time.time()
+        self.history.append((now, synced))
+        while self.history and self.history[0][0] < now - self.WINDOW:
+            self.history.popleft()
+
+    def metrics(self):
+        elapsed = max(1.0, self.history[-1][0] - self.history[0][0]) if self.history else 1.0
+        result = dict(
+            throughput = sum(synced for when, synced in self.history) / elapsed,
+            lag        = self.lag,
+            failed     = self.failed.count,
+            backlog    = { printer: Queue(printer, connection=self.redis).count for printer in self.printers }
+        )
+        self.redis.hmset(self.METRICS_KEY, dict(throughput=result['throughput'], lag=result['lag'],
+                                                failed=result['failed'], backlog=sum(result['backlog'].values())))
+        return result
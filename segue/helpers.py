@@ -5,5 +5,13 @@ from segue.schema import Field
 search_args = {
     'sort': Field.str(),
     'page': Field.int(missing=1),
-    'per_page':  Field.int(missing=25)
+    'per_page':  Field.int(missing=25),
+    'cursor': Field.str(),
+    'total': Field.str()
+}
+
+keyset_args = {
+    'per_page': Field.int(missing=25),
+    'cursor': Field.str(),
+    'total': Field.str()
 }
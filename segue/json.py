@@ -81,11 +81,87 @@ def constantize(glossary, selected):
 
 class PropertyJsonSerializer(JsonSerializer):
     _serializer_name = 'properties'
+
+    # when off, every object is serialized by walking its fields from scratch (the bench compares both)
+    compiled = True
+
+    # true when get_field_names depends only on the class of the target, so its plan can be cached
+    _fields_by_class = False
+
+    _plans  = {}
+    _nested = {}
+
     def get_field_names(self, target):
         raise NotImplementedError()
 
     def emit_json_for(self, target, **overrides):
-        # WORST CODE EVER
+        if not PropertyJsonSerializer.compiled: return self.interpret_json_for(target, **overrides)
+
+        overrides.update(self.serializer_overrides)
+        result = {}
+        for key, recurse_with, selected, hidden in self.plan_for(target, overrides):
+            value = getattr(target, key, None)
+            if isinstance(value, list) and any([ isinstance(x, JsonSerializable) for x in value ]):
+                if not recurse_with: continue
+                serializer = self._nested_class(value[0].__class__, selected, value[0]._serializers)
+                result[key] = [ self._emit(serializer, item, overrides) for item in value ]
+            elif isinstance(value, JsonSerializable):
+                if not recurse_with: continue
+                result[key] = self._emit(self._nested_class(value.__class__, selected), value, overrides)
+            elif hasattr(value, "all"):
+                if not recurse_with: continue
+                result[key] = self._emit(self._nested_class(value.__class__, selected), value.all(), overrides)
+            elif value and not hidden:
+                result[key] = self._emit(self._nested_class(value.__class__, selected), value, overrides)
+            elif value == False:
+                result[key] = False
+        if self.debug_mode:
+            result['$type'] = ".".join([target.__class__.__name__,self._serializer_name])
+
+        return result
+
+    # (key, child serializer name or False, selected serializer name, hidden) for every field, which
+    # only depends on the serializer, the class of the target and the overrides
+    def plan_for(self, target, overrides):
+        if not self._fields_by_class: return self._compile(target, overrides)
+        try:
+            cache_key = (self.__class__, target.__class__, frozenset(overrides.items()))
+            plan = self._plans.get(cache_key)
+        except TypeError:
+            return self._compile(target, overrides)
+        if plan is None:
+            plan = self._plans[cache_key] = self._compile(target, overrides)
+        return plan
+
+    def _compile(self, target, overrides):
+        plan = []
+        for key, serializer in self.get_field_names(target):
+            recurse_with = self.serialize_child(key)
+            if not recurse_with and self.is_lazy_relationship(target, key): continue
+            selected     = overrides.get(key, None) or recurse_with or 'JsonSerializer'
+            plan.append((key, recurse_with, selected, self.hide_field(key)))
+        return tuple(plan)
+
+    # fields holding a query are only emitted when serialized as children, so the
+    # plan can leave them out without building the query
+    def is_lazy_relationship(self, target, key):
+        return False
+
+    # the serializer class picked for values of a class, or None for plain values
+    def _nested_class(self, value_class, selected, available=None):
+        cache_key = (value_class, selected)
+        if cache_key not in self._nested:
+            if available is None: available = getattr(value_class, '_serializers', [])
+            found = [ cls for cls in available if cls.__name__ == selected ]
+            self._nested[cache_key] = found[0] if found else None
+        return self._nested[cache_key]
+
+    def _emit(self, serializer_class, value, overrides):
+        if serializer_class: return serializer_class().emit_json_for(value, **overrides)
+        if hasattr(value, 'to_json'): return value.to_json()
+        return value
+
+    def interpret_json_for(self, target, **overrides):
         overrides.update(self.serializer_overrides)
         result = {}
         for key, serializer in self.get_field_names(target):
@@ -121,8 +197,12 @@ class PropertyJsonSerializer(JsonSerializer):
 
 class SQLAlchemyJsonSerializer(PropertyJsonSerializer):
     _serializer_name = 'db'
+    _fields_by_class = True
 
     def get_field_names(self, target):
         for p in target.__mapper__.iterate_properties:
             if p.key.endswith("_id"): continue
             yield [ p.key, None ]
+
+    def is_lazy_relationship(self, target, key):
+        return getattr(target.__mapper__.get_property(key), 'lazy', None) == 'dynamic'
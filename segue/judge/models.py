@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from sqlalchemy import and_, case
 from sqlalchemy.sql import functions as func
 
 from ..core import db
@@ -21,7 +22,7 @@ class Judge(db.Model):
 
     @property
     def remaining(self):
-        return self.votes - self.matches.filter(Match.result != None).count()
+        return self.votes - self.spent
 
 class Match(db.Model):
     id         = db.Column(db.Integer, primary_key=True)
@@ -36,18 +37,38 @@ class Match(db.Model):
     created      = db.Column(db.DateTime, default=func.now())
     last_updated = db.Column(db.DateTime, onupdate=datetime.now)
 
+    OUTCOMES = dict(player1=('victory', 'defeat'), player2=('defeat', 'victory'), tie=('tie', 'tie'))
+
     def result_for(self, proposal):
-        if not self.result: return None
-        if proposal == self.player1:
+        if not self.result or not proposal: return None
+        if proposal.id == self.player1_id:
             if self.result == 'player1': return 'victory'
             if self.result == 'tie':     return 'tie'
             return 'defeat'
-        elif proposal == self.player2:
+        elif proposal.id == self.player2_id:
             if self.result == 'player2': return 'victory'
             if self.result == 'tie':     return 'tie'
             return 'defeat'
         return None
 
+    # (proposal_id, result kind) for each side of a judged match
+    @property
+    def outcomes(self):
+        if not self.result: return []
+        first, second = self.OUTCOMES[self.result]
+        result = [ (self.player1_id, first) ]
+        if self.player2_id: result.append((self.player2_id, second))
+        return result
+
+class Standing(db.Model):
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), primary_key=True)
+    proposal_id   = db.Column(db.Integer, db.ForeignKey('proposal.id'),   primary_key=True)
+    victories     = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    ties          = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    defeats       = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    COLUMNS = dict(victory='victories', tie='ties', defeat='defeats')
+
 
 class Tournament(db.Model):
     id            = db.Column(db.Integer, primary_key=True)
@@ -61,18 +82,51 @@ class Tournament(db.Model):
 
     @property
     def proposals(self):
+        return self.proposal_query.all()
+
+    @property
+    def proposal_query(self):
         proposals = Proposal.query
         if self.selection != "*":
             proposals = proposals.filter(Proposal.tags.any(ProposalTag.name == self.selection))
-        return proposals.all()
+        return proposals
+
+    EMPTY_ROUND = dict(judged=0, in_progress=0, pending=0, stale=0)
 
     def status_of_round(self, round_number):
+        return self.round_statuses().get(round_number, dict(self.EMPTY_ROUND))
+
+    # the status of every round in one grouped query, counting each state conditionally
+    def round_statuses(self):
         expired_max_time = datetime.now() - timedelta(minutes=15)
-        matches = self.matches.filter(Match.round == round_number)
-
-        return dict(
-            judged      = matches.filter(Match.result.isnot(None)).count(),
-            in_progress = matches.filter(Match.result.is_(None), Match.judge_id.isnot(None)).count(),
-            pending     = matches.filter(Match.result.is_(None), Match.judge_id.is_(None)).count(),
-            stale       = matches.filter(Match.result.is_(None), Match.judge_id.isnot(None), Match.last_updated <= expired_max_time).count()
-        )
+        open_match = Match.result.is_(None)
+
+        def count_where(*criteria):
+            return func.count(case([ (and_(*criteria), Match.id) ]))
+
+        rows = db.session.query(Match.round,
+                                count_where(Match.result.isnot(None)),
+                                count_where(open_match, Match.judge_id.isnot(None)),
+                                count_where(open_match, Match.judge_id.is_(None)),
+                                count_where(open_match, Match.judge_id.isnot(None), Match.last_updated <= expired_max_time)) \
+                         .filter(Match.tournament_id == self.id) \
+                         .group_by(Match.round)
+
+        return { round_number: dict(judged=judged, in_progress=in_progress, pending=pending, stale=stale)
+                 for round_number, judged, in_progress, pending, stale in rows }
+
+    # votes spent by every judge of the tournament, in one query
+    def vote_usage(self):
+        rows = db.session.query(Judge, func.count(Match.id)) \
+                         .outerjoin(Match, and_(Match.judge_id == Judge.id, Match.result.isnot(None))) \
+                         .filter(Judge.tournament_id == self.id) \
+                         .group_by(Judge.id) \
+                         .order_by(Judge.id)
+
+        return [ dict(id=judge.id, email=judge.email, votes=judge.votes, spent=spent, remaining=judge.votes - spent)
+                 for judge, spent in rows ]
+
+    def progress(self):
+        statuses = self.round_statuses()
+        rounds = [ statuses.get(idx, dict(self.EMPTY_ROUND)) for idx in range(1, self.current_round+1) ]
+        return dict(rounds=rounds, judges=self.vote_usage())
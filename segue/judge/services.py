@@ -1,18 +1,73 @@
+import collections
 from datetime import datetime, timedelta
-from segue.core import db
+from sqlalchemy import and_, case, or_
+from sqlalchemy.orm import joinedload
+
+from segue.core import db, cache
 from segue.hasher import Hasher
 
-from models import Judge, Match, Tournament
+from models import Judge, Match, Tournament, Standing
 from errors import *
-from swiss import TrivialRoundGenerator, ClassicalRoundGenerator, StandingsCalculator
+from swiss import TrivialRoundGenerator, ClassicalRoundGenerator, StandingsCalculator, Player
+from segue.proposal.models import Proposal
 from segue.proposal.services import ProposalService
 
+class StandingsService(object):
+    def __init__(self, db_impl=None, calculator=None):
+        self.db = db_impl or db
+        self.calculator = calculator or StandingsCalculator()
+
+    # standings are kept per (tournament, proposal) and bumped as matches are judged,
+    # so reading them is a single outer join instead of replaying every match
+    def current(self, tournament):
+        rows = tournament.proposal_query \
+                         .outerjoin(Standing, and_(Standing.proposal_id == Proposal.id, Standing.tournament_id == tournament.id)) \
+                         .add_entity(Standing) \
+                         .options(joinedload('owner'), joinedload('track'))
+
+        players = []
+        for proposal, standing in rows:
+            if standing: players.append(Player(proposal, 0, standing.victories, standing.ties, standing.defeats))
+            else:        players.append(Player(proposal, 0))
+        return self.calculator.rank(players)
+
+    def seed(self, tournament, proposal_ids):
+        existing = db.session.query(Standing.proposal_id).filter(Standing.tournament_id == tournament.id)
+        for proposal_id in set(proposal_ids) - set(row.proposal_id for row in existing):
+            db.session.add(Standing(tournament_id=tournament.id, proposal_id=proposal_id))
+        db.session.flush()
+
+    def record(self, match):
+        for proposal_id, result_kind in match.outcomes:
+            column = Standing.COLUMNS[result_kind]
+            updated = Standing.query.filter(Standing.tournament_id == match.tournament_id, Standing.proposal_id == proposal_id) \
+                                    .update({ column: getattr(Standing, column) + 1 }, synchronize_session=False)
+            if not updated:
+                db.session.add(Standing(tournament_id=match.tournament_id, proposal_id=proposal_id, **{ column: 1 }))
+                db.session.flush()
+
+    def rebuild(self, tournament):
+        Standing.query.filter(Standing.tournament_id == tournament.id).delete(synchronize_session=False)
+
+        counts = collections.defaultdict(collections.Counter)
+        for match in tournament.matches.filter(Match.result != None):
+            for proposal_id, result_kind in match.outcomes:
+                counts[proposal_id][result_kind] += 1
+
+        for proposal_id, count in counts.items():
+            db.session.add(Standing(tournament_id=tournament.id, proposal_id=proposal_id,
+                                    victories=count['victory'], ties=count['tie'], defeats=count['defeat']))
+        db.session.commit()
+        return len(counts)
+
 class TournamentService(object):
+    PROGRESS_TIMEOUT = 30
+
     def __init__(self, db_impl=None, trivial=None, classical=None, standings=None):
         self.db = db_impl or db
         self.trivial = trivial or TrivialRoundGenerator()
         self.classical = classical or ClassicalRoundGenerator()
-        self.standings = standings or StandingsCalculator()
+        self.standings = standings or StandingsService()
 
     def create_tournament(self, selection="*"):
         tournament = Tournament(selection=selection)
@@ -21,12 +76,28 @@ class TournamentService(object):
         return tournament
 
     def get_standings(self, tournament_id):
-        tournament = Tournament.query.get(tournament_id)
-        return self.standings.calculate(tournament.proposals, tournament.matches)
+        tournament = self.get_one(tournament_id)
+        return self.standings.current(tournament)
+
+    # round statuses and vote usage are read on every refresh of the admin tournament page; they are
+    # cached briefly, tagged with the tournament, and dropped whenever a match is judged or a round is generated
+    def get_progress(self, tournament_id):
+        key = 'tournament-progress-{}'.format(tournament_id)
+        progress = cache.get(key)
+        if progress is None:
+            progress = self.get_one(tournament_id).progress()
+            cache.set(key, progress, timeout=self.PROGRESS_TIMEOUT, tags=[ self.cache_tag(tournament_id) ])
+        return progress
+
+    def invalidate_progress(self, tournament_id):
+        cache.invalidate(self.cache_tag(tournament_id))
+
+    def cache_tag(self, tournament_id):
+        return 'tournament:{}'.format(tournament_id)
 
     def generate_round(self, tournament_id):
         tournament = Tournament.query.get(tournament_id)
-        players = self.standings.calculate(tournament.proposals, tournament.matches)
+        players = self.standings.current(tournament)
 
         if tournament.current_round == 0:
             generator = self.trivial
@@ -37,9 +108,17 @@ class TournamentService(object):
         for match in new_matches:
             match.tournament = tournament
             db.session.add(match)
+        db.session.flush()
+
+        # byes are born judged, so they are the only results recorded here
+        self.standings.seed(tournament, [ player.id for player in players ])
+        for match in new_matches:
+            self.standings.record(match)
+
         tournament.current_round += 1
         db.session.add(tournament)
         db.session.commit()
+        self.invalidate_progress(tournament.id)
 
         return new_matches
 
@@ -89,10 +168,13 @@ class RankingService(object):
         return sorted(unsorted)
 
 class JudgeService(object):
-    def __init__(self, db_impl=None, hasher=None, tournaments=None):
+    CLAIM_ATTEMPTS = 5
+
+    def __init__(self, db_impl=None, hasher=None, tournaments=None, standings=None):
         self.db          = db_impl or db
         self.hasher      = hasher or Hasher()
         self.tournaments = tournaments or TournamentService()
+        self.standings   = standings or StandingsService()
 
     def create_token(self, email, votes, tournament_id):
         tournament = self.tournaments.get_one(tournament_id)
@@ -117,27 +199,37 @@ class JudgeService(object):
         judge = self.get_by_hash(hash_code)
         if judge.remaining <= 0: raise JudgeHasNoVotesLeft()
 
-        pending_matches = judge.tournament.matches.filter(Match.result == None)
+        for attempt in range(self.CLAIM_ATTEMPTS):
+            candidate = self._claimable(judge).scalar()
+            if not candidate: raise RoundIsOver()
+            if self._claim(judge, candidate):
+                db.session.commit()
+                return Match.query.get(candidate)
+            db.session.rollback()
+        raise RoundIsOver()
+
+    # one query picks the match for this judge: the one already assigned to it, then an unassigned one,
+    # then one abandoned by another judge; on postgres the row is locked and rows locked by concurrent
+    # judges are skipped, so they never queue up behind each other
+    def _claimable(self, judge):
+        priority = case([ (Match.judge_id == judge.id, 0), (Match.judge_id == None, 1) ], else_=2)
+
+        return db.session.query(Match.id) \
+                         .filter(Match.tournament_id == judge.tournament_id, self._open_to(judge)) \
+                         .order_by(priority, Match.id) \
+                         .limit(1) \
+                         .with_for_update(skip_locked=True)
+
+    # the assignment is a compare-and-set: it only lands if the match is still claimable, which is
+    # what keeps sqlite (where FOR UPDATE is a no-op) from handing one match to two judges
+    def _claim(self, judge, match_id):
+        return Match.query.filter(Match.id == match_id, self._open_to(judge)) \
+                          .update({ Match.judge_id: judge.id, Match.last_updated: datetime.now() }, synchronize_session=False)
+
+    def _open_to(self, judge):
         #TODO: REMOVE THE HARDCODING TIME
         expired_max_time = datetime.now() - timedelta(days=5)
-
-        was_assigned_to_me       = pending_matches.filter(Match.judge == judge).first()
-        non_assigned_match       = pending_matches.filter(Match.judge == None).first()
-        stale_but_assigned_match = pending_matches.filter(Match.judge != None, Match.last_updated < expired_max_time).first()
-
-        if was_assigned_to_me:
-            selected_match = was_assigned_to_me
-        elif non_assigned_match:
-            selected_match = non_assigned_match
-        elif stale_but_assigned_match:
-            selected_match = stale_but_assigned_match
-        else:
-            raise RoundIsOver()
-
-        selected_match.judge = judge
-        db.session.add(selected_match)
-        db.session.commit()
-        return selected_match
+        return and_(Match.result == None, or_(Match.judge_id == judge.id, Match.judge_id == None, Match.last_updated < expired_max_time))
 
     def judge_match(self, match_id, hash_code, vote):
         match = Match.query.get(match_id)
@@ -146,8 +238,10 @@ class JudgeService(object):
         elif match.judge.hash != hash_code:
             raise MatchAssignedToOtherJudge()
         match.result = vote
+        self.standings.record(match)
 
         db.session.add(match)
         db.session.commit()
+        self.tournaments.invalidate_progress(match.tournament_id)
 
         return match
@@ -1,3 +1,5 @@
+import itertools
+
 from models import Match
 from errors import RoundHasPendingMatches
 
@@ -19,63 +21,112 @@ class TrivialRoundGenerator(object):
         return matches
 
 class ClassicalRoundGenerator(object):
-    def _index_past(self, players, past_matches):
-        result = { None: {} }
-        for p1 in players:
-            result[p1.id] = {}
-            result[p1.id][None] = False
-            for p2 in players:
-                result[p1.id][p2.id] = False
+    MAX_BACKTRACKS = 10000
+    MAX_REOPENED   = 8
+
+    def __init__(self, max_backtracks=None):
+        self.max_backtracks = max_backtracks or self.MAX_BACKTRACKS
+
+    def _index_past(self, past_matches):
+        played, byes = set(), set()
 
         for match in past_matches:
             if match.result == None:
                 raise RoundHasPendingMatches()
-            result[match.player1_id][match.player2_id] = True
-            result[match.player2_id][match.player1_id] = True
-
-        return result
+            if match.player2_id is None:
+                byes.add(match.player1_id)
+            else:
+                played.add((match.player1_id, match.player2_id))
+                played.add((match.player2_id, match.player1_id))
 
+        return played, byes
 
     def generate(self, players, past_matches, round):
-        matches = []
-
-        indexed_past = self._index_past(players, past_matches)
-        matched_players = set()
+        played, byes = self._index_past(past_matches)
+        players = list(players)
+        pairs, unpaired = [], []
+
+        # with an odd field the bye goes to the lowest ranked player who has not had one yet
+        bye = None
+        if len(players) % 2:
+            bye = next((p for p in reversed(players) if p.id not in byes), players[-1])
+            players.remove(bye)
+
+        # players arrive ordered by standings; each score group is paired on its own, and whoever
+        # cannot be paired inside it floats down to the next group
+        floaters = []
+        for points, group in itertools.groupby(players, key=lambda p: p.points):
+            group = floaters + list(group)
+            floaters = [ group.pop() ] if len(group) % 2 else []
+            group_pairs, leftovers = self._pair(group, played)
+            pairs.extend(group_pairs)
+            floaters = leftovers + floaters
+
+        if floaters:
+            pairs, unpaired = self._settle(pairs, floaters, played)
+
+        matches = [ self._match(round, first, second) for first, second in pairs ]
+        for player in unpaired + ([ bye ] if bye else []):
+            matches.append(self._match(round, player))
+        return matches
 
-        for idx, player in enumerate(players):
-            print "start on idx={}, pid={}".format(idx, player.id)
-            if player in matched_players:
-                print "-- {} already matched for this round...".format(player.id)
+    # players stranded at the bottom reopen the lowest pairs already made, a few at a time,
+    # before anyone is handed an extra bye
+    def _settle(self, pairs, stranded, played):
+        for reopened in range(0, min(len(pairs), self.MAX_REOPENED) + 1):
+            kept = pairs[:len(pairs) - reopened]
+            pool = [ player for pair in pairs[len(kept):] for player in pair ] + stranded
+            settled, unpaired = self._pair(pool, played)
+            if not unpaired: break
+        return kept + settled, unpaired
+
+    def _match(self, round, player1, player2=None):
+        if not player2:
+            return Match(player1=player1.proposal, player1_id=player1.id, round=round, result='player1')
+        return Match(player1=player1.proposal, player1_id=player1.id, player2=player2.proposal, player2_id=player2.id, round=round)
+
+    # pairs the highest free player with the nearest one they have not met, backtracking when
+    # a choice leaves someone below without a partner; the search is iterative, so large
+    # groups cannot exhaust the stack, and it gives up on a greedy pass after max_backtracks
+    def _pair(self, group, played):
+        size = len(group)
+        used = [ False ] * size
+        chosen = []
+        first, tried, backtracks = 0, None, 0
+
+        while True:
+            while first < size and used[first]: first += 1
+            if first >= size:
+                return [ (group[a], group[b]) for a, b in chosen ], [ p for i, p in enumerate(group) if not used[i] ]
+
+            partner = (tried if tried is not None else first) + 1
+            while partner < size and (used[partner] or (group[first].id, group[partner].id) in played):
+                partner += 1
+
+            if partner < size:
+                used[first] = used[partner] = True
+                chosen.append((first, partner))
+                first, tried = first + 1, None
                 continue
 
-            other_idx = idx
-            while True:
-                other_idx += 1
-                if other_idx == len(players): # BYE case
-                    print "-- has no one else to pair with, so it gets a freebie"
-                    match = Match(player1 = player.proposal, round=round, result='player1')
-                    matches.append(match)
-                    matched_players.add(player)
-                    break;
-
-                other_player = players[other_idx]
-                print "-- trying to pair {} with {}...".format(player.id, other_player.id)
-                if other_player in matched_players:
-                    print "---- nope, p2 is alread matched for this round"
-                    continue
-
-                if indexed_past[player.id][other_player.id]:
-                    print "---- {} and {} already played before...".format(player.id, other_player.id)
-                    continue
-
-                print "---- pairing is good, creating match!"
-                match = Match(player1=player.proposal, player2=other_player.proposal, round=round)
-                matches.append(match)
-                matched_players.add(player)
-                matched_players.add(other_player)
-                break
+            backtracks += 1
+            if not chosen or backtracks > self.max_backtracks:
+                return self._greedy(group, played)
 
-        return matches
+            first, tried = chosen.pop()
+            used[first] = used[tried] = False
+
+    def _greedy(self, group, played):
+        pairs, leftovers, free = [], [], list(group)
+        while free:
+            player = free.pop(0)
+            partner = next((other for other in free if (player.id, other.id) not in played), None)
+            if partner is None:
+                leftovers.append(player)
+                continue
+            free.remove(partner)
+            pairs.append((player, partner))
+        return pairs, leftovers
 
 class Player(object):
     def __init__(self, proposal, points, victories=0, ties=0, defeats=0):
@@ -106,27 +157,22 @@ class Player(object):
             return -self.id.__cmp__(other.id)
 
 class StandingsCalculator(object):
-   def calculate(self, unordered_proposals, past_matches):
-        print 'started pointing...'
+    def calculate(self, unordered_proposals, past_matches):
         players = {}
 
         for proposal in unordered_proposals:
             players[proposal.id] = Player(proposal, 0)
 
         for match in past_matches:
-            players[match.player1.id].add_result(match.result_for(match.player1))
-            if match.player2:
-                players[match.player2.id].add_result(match.result_for(match.player2))
-        players = players.values()
+            for proposal_id, result_kind in match.outcomes:
+                players[proposal_id].add_result(result_kind)
 
-        print 'started sorting'
+        return self.rank(players.values())
+
+    def rank(self, players):
         players.sort(reverse=True)
-        print 'done sorting'
 
         for idx, player in enumerate(players):
             player.position = idx+1
 
         return players
-
-
-
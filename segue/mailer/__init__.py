@@ -1,12 +1,11 @@
-import yaml
-import os.path
-import glob
-import codecs
-
 from segue.errors import SegueError
-from segue.core import mailer, config
+from segue.core import config
 from flask_mail import Message, Attachment
 
+from delivery import delivery_for
+from bulk import BulkDispatch, TokenBucket
+from registry import templates
+
 class EmailIsNotValid(SegueError): pass
 
 class TemplatedMessage(object):
@@ -28,36 +27,30 @@ class TemplatedMessage(object):
             self.attachments.append(attachment)
 
     def build(self):
-        subject = unicode(self.template['subject']).format(**self.variables)
-        body    = unicode(self.template['body']).format(**self.variables)
-        bcc     = list(config.MAIL_BCC)
+        subject, body = self.template.render(self.variables)
+        bcc = list(config.MAIL_BCC)
 
         return Message(subject, body=body, recipients=self.recipients, bcc=bcc, attachments=self.attachments)
 
 class MessageFactory(object):
-    def __init__(self):
-        base = os.path.join(os.path.dirname(__file__), 'templates')
-        pattern = os.path.join(base, '**', '*.yml')
-
-        self._templates = {}
-        for template_path in glob.glob(pattern):
-            template_name = template_path.replace(base, '').replace('.yml','')[1:]
-            self._templates[template_name] = yaml.load(codecs.open(template_path))
+    def __init__(self, registry=None):
+        self.registry = registry or templates
 
     def from_template(self, template_name):
-        return TemplatedMessage(self._templates[template_name])
+        return TemplatedMessage(self.registry.get(template_name))
 
 
 class MailerService(object):
-    def __init__(self, templates=None, message_factory=None):
+    def __init__(self, templates=None, message_factory=None, delivery=None):
         self.message_factory = message_factory or MessageFactory()
+        self.delivery        = delivery        or delivery_for()
 
     def proposal_invite(self, invite):
         message = self.message_factory.from_template('proposal/invite')
         message.given(invite=invite, proposal=invite.proposal, owner=invite.proposal.owner)
         message.to(invite.name, invite.recipient)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_payment(self, purchase):
         customer = purchase.customer
@@ -67,7 +60,7 @@ class MailerService(object):
         message.given(customer=customer, purchase=purchase, product=product)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_donation_promocode_available(self, customer, promocode):
 
@@ -75,7 +68,7 @@ class MailerService(object):
         message.given(customer=customer, promocode=promocode)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_corporate_promocode_available(self, corporate, promocodes):
         customer = corporate.owner
@@ -85,7 +78,7 @@ class MailerService(object):
         message.given(corporate=corporate, hash_codes=hash_codes)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
     def notify_corporate_payment(self, purchase, promocodes):
@@ -99,7 +92,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, hash_codes=hash_codes)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_corporate_promocode(self, purchase, promocodes):
         customer = purchase.customer
@@ -112,7 +105,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, hash_codes=hash_codes)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
 
@@ -124,7 +117,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, purchase=purchase, promocode=promocode)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_gov_purchase_in_analysis(self, purchase):
         customer = purchase.customer
@@ -134,7 +127,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, purchase=purchase)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_gov_purchase(self, purchase):
         customer = purchase.customer
@@ -144,7 +137,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, purchase=purchase)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
     def notify_gov_purchase_analysed(self, purchase, promocodes):
@@ -158,7 +151,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, hash_codes=hash_codes)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_gov_purchase_received(self, purchase):
         customer = purchase.customer
@@ -168,7 +161,7 @@ class MailerService(object):
         message.given(customer=customer, corporate=corporate, purchase=purchase)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_student_purchase_received(self, purchase):
         customer = purchase.customer
@@ -178,7 +171,7 @@ class MailerService(object):
         message.given(customer=customer, product=product, purchase=purchase)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
     def notify_student_document_analyzed(self, purchase):
@@ -189,7 +182,7 @@ class MailerService(object):
         message.given(customer=customer, product=product, purchase=purchase)
         message.to(customer.name, customer.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_donation(self, purchase, claim_check_file_path):
         customer = purchase.customer
@@ -199,7 +192,7 @@ class MailerService(object):
         message.given(customer=customer, purchase=purchase, product=product)
         message.to(customer.name, customer.email)
         message.append_attachment('recibo.pdf', claim_check_file_path, 'application/pdf')
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_promocode(self, customer, promocode, claim_check_file_path):
         from segue.models import SurveyAnswer
@@ -213,7 +206,7 @@ class MailerService(object):
         message.given(customer=customer, promocode=promocode, survey=survey)
         message.to(customer.name, customer.email)
         message.append_attachment('recibo.pdf', claim_check_file_path, 'application/pdf')
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_claimcheck(self, purchase, claim_check_file_path):
             customer = purchase.customer
@@ -223,7 +216,7 @@ class MailerService(object):
             message.to(customer.name, customer.email)
             message.append_attachment('recibo.pdf', claim_check_file_path, 'application/pdf')
 
-            return mailer.send(message.build())
+            return self.delivery.send(message.build())
 
 
     def caravan_invite(self, invite):
@@ -231,7 +224,7 @@ class MailerService(object):
         message.given(invite=invite, caravan=invite.caravan, owner=invite.caravan.owner)
         message.to(invite.name, invite.recipient)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
     def caravan_leader(self, caravan, purchase):
@@ -241,7 +234,7 @@ class MailerService(object):
         message.given(leader=leader, caravan=caravan, purchase=purchase)
         message.to(leader.name, leader.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
 
     def reset_password(self, account, reset):
@@ -249,14 +242,14 @@ class MailerService(object):
         message.given(account=account,reset=reset)
         message.to(account.name, account.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def invite_judge(self, token):
         message = self.message_factory.from_template('judge/invite')
         message.given(token=token)
         message.to('', token.email)
 
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def call_proposal(self, notification):
         message = self.message_factory.from_template('schedule/call_proposal')
@@ -268,7 +261,7 @@ class MailerService(object):
             deadline_day   = notification.deadline.strftime("%d/%m/%Y")
         )
         message.to(notification.account.name, notification.account.email)
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def notify_slot(self, notification):
         message = self.message_factory.from_template('schedule/notify_slot')
@@ -283,30 +276,42 @@ class MailerService(object):
             presentation_hours = notification.slot.begins.strftime("%H:%M")
         )
         message.to(notification.account.name, notification.account.email)
-        return mailer.send(message.build())
+        return self.delivery.send(message.build())
 
     def non_selection(self, notice):
+        return self.delivery.send(self.non_selection_message(notice))
+
+    def non_selection_message(self, notice):
         message = self.message_factory.from_template('proposal/non_selection')
         message.given(
             notice = notice,
             account = notice.account
         )
         message.to(notice.account.name, notice.account.email)
-        return mailer.send(message.build())
+        return message.build()
 
     def reception_mail(self, person):
+        return self.delivery.send(self.reception_message(person))
+
+    def reception_message(self, person):
         if not person.email: raise EmailIsNotValid()
         message = self.message_factory.from_template('reception/{}-{}'.format(person.status, person.reception_desk))
         message.given(
             person = person,
         )
         message.to(person.name, person.email)
-        return mailer.send(message.build())
+        return message.build()
 
     def certificates_available(self, account, certificates):
         if not certificates: return
+        return self.delivery.send(self.certificates_message(account))
+
+    def certificates_message(self, account):
         message = self.message_factory.from_template('certificates/available')
         message.given(account=account)
         message.to(account.name, account.email)
-        return mailer.send(message.build())
+        return message.build()
 
+    def bulk(self, jobs, on_progress=None, rate=None, burst=None):
+        dispatch = BulkDispatch(self.delivery, bucket=TokenBucket(rate=rate, burst=burst))
+        return dispatch.run(jobs, on_progress=on_progress)
@@ -0,0 +1,58 @@
+import time
+
+from segue.core import config, logger
+
+class TokenBucket(object):
+    DEFAULT_RATE = 20
+
+    def __init__(self, rate=None, burst=None, clock=time.time, sleep=time.sleep):
+        self.rate     = float(rate or config.MAIL_RATE_LIMIT or self.DEFAULT_RATE)
+        self.capacity = float(burst or config.MAIL_RATE_BURST or self.rate)
+        self.tokens   = self.capacity
+        self.clock    = clock
+        self.sleep    = sleep
+        self.updated  = clock()
+
+    def take(self, tokens=1):
+        now = self.clock()
+        self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0
+
+        wait = (tokens - self.tokens) / self.rate
+        self.sleep(wait)
+        self.tokens  = 0
+        self.updated = now + wait
+        return wait
+
+class BulkDispatch(object):
+    def __init__(self, delivery, bucket=None):
+        self.delivery = delivery
+        self.bucket   = bucket or TokenBucket()
+
+    # jobs yields (marker, message) pairs ordered by marker; a None message marks a skipped item
+    def run(self, jobs, on_progress=None):
+        result = dict(sent=0, skipped=0, failed=[], marker=None, throttled=0.0)
+        started = time.time()
+
+        with self.delivery.session() as session:
+            for marker, message in jobs:
+                if message is None:
+                    result['skipped'] += 1
+                else:
+                    result['throttled'] += self.bucket.take()
+                    try:
+                        session.send(message)
+                        result['sent'] += 1
+                    except Exception, e:
+                        logger.error('bulk mail to %s failed: %s', marker, e)
+                        result['failed'].append((marker, str(e)))
+
+                result['marker'] = marker
+                if on_progress: on_progress(marker, message, result)
+
+        result['elapsed'] = time.time() - started
+        return result
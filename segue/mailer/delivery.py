@@ -0,0 +1,156 @@
+import json
+import time
+import base64
+import smtplib
+
+from contextlib import contextmanager
+
+from rq import Queue
+from flask_mail import Message, Attachment
+
+from segue.core import mailer, config, logger, redis_connection
+
+def serialize(message):
+    return dict(
+        subject     = message.subject,
+        body        = message.body,
+        html        = message.html,
+        sender      = message.sender,
+        recipients  = list(message.recipients),
+        bcc         = list(message.bcc),
+        attachments = [ dict(filename=a.filename, content_type=a.content_type, data=base64.b64encode(a.data)) for a in message.attachments ]
+    )
+
+def deserialize(payload):
+    attachments = [ Attachment(a['filename'], a['content_type'], base64.b64decode(a['data'])) for a in payload['attachments'] ]
+    return Message(payload['subject'],
+        body        = payload['body'],
+        html        = payload['html'],
+        sender      = payload['sender'],
+        recipients  = [ tuple(r) if isinstance(r, list) else r for r in payload['recipients'] ],
+        bcc         = payload['bcc'],
+        attachments = attachments
+    )
+
+def deliver(payload, attempt=0):
+    try:
+        mailer.send(deserialize(payload))
+    except Exception, e:
+        logger.error('could not deliver mail "%s" (attempt %d): %s', payload['subject'], attempt, e)
+        MailQueue().retry(payload, attempt, error=str(e))
+
+class MailQueue(object):
+    NAME           = 'mail'
+    RETRY_KEY      = 'mail:retry'
+    DEAD_KEY       = 'mail:dead'
+    MAX_ATTEMPTS   = 5
+    BACKOFF_SECONDS = 30
+
+    def __init__(self, redis_conn=None, max_attempts=None, backoff=None):
+        self.redis = redis_conn or redis_connection()
+        self.max_attempts = max_attempts or config.MAIL_MAX_ATTEMPTS or self.MAX_ATTEMPTS
+        self.backoff      = backoff      or config.MAIL_RETRY_BACKOFF or self.BACKOFF_SECONDS
+
+    @property
+    def queue(self):
+        return Queue(self.NAME, connection=self.redis)
+
+    def enqueue(self, payload, attempt=0):
+        return self.queue.enqueue('segue.mailer.delivery.deliver', payload, attempt)
+
+    def retry(self, payload, attempt, error=None):
+        entry = json.dumps(dict(payload=payload, attempt=attempt + 1, error=error, failed_at=time.time()))
+        if attempt + 1 >= self.max_attempts:
+            self.redis.rpush(self.DEAD_KEY, entry)
+            return False
+        due = time.time() + self.backoff * (2 ** attempt)
+        self.redis.zadd(self.RETRY_KEY, entry, due)
+        return True
+
+    def promote_due_retries(self, now=None):
+        now = now or time.time()
+        promoted = 0
+        for entry in self.redis.zrangebyscore(self.RETRY_KEY, 0, now):
+            if not self.redis.zrem(self.RETRY_KEY, entry): continue
+            retry = json.loads(entry)
+            self.enqueue(retry['payload'], retry['attempt'])
+            promoted += 1
+        return promoted
+
+    def dead_letters(self):
+        return [ json.loads(entry) for entry in self.redis.lrange(self.DEAD_KEY, 0, -1) ]
+
+    def requeue_dead_letters(self):
+        requeued = 0
+        while True:
+            entry = self.redis.lpop(self.DEAD_KEY)
+            if not entry: break
+            self.enqueue(json.loads(entry)['payload'])
+            requeued += 1
+        return requeued
+
+class SmtpSession(object):
+    def __init__(self):
+        self.connection = None
+
+    def open(self):
+        self.connection = mailer.connect()
+        self.connection.__enter__()
+
+    def close(self):
+        if not self.connection: return
+        try:
+            self.connection.__exit__(None, None, None)
+        except smtplib.SMTPException:
+            pass
+        self.connection = None
+
+    def send(self, message):
+        if not self.connection: self.open()
+        try:
+            return self.connection.send(message)
+        except smtplib.SMTPServerDisconnected:
+            # long bulk runs outlive the server idle timeout; reconnect once and carry on
+            self.connection = None
+            self.open()
+            return self.connection.send(message)
+
+class SmtpDelivery(object):
+    def send(self, message):
+        return mailer.send(message)
+
+    @contextmanager
+    def session(self):
+        session = SmtpSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+class QueueDelivery(object):
+    def __init__(self, queue=None):
+        self.queue = queue or MailQueue()
+
+    def send(self, message):
+        return self.queue.enqueue(serialize(message))
+
+    @contextmanager
+    def session(self):
+        yield self
+
+class FakeDelivery(object):
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, message):
+        self.outbox.append(message)
+        return message
+
+    @contextmanager
+    def session(self):
+        yield self
+
+DELIVERIES = dict(smtp=SmtpDelivery, queue=QueueDelivery, fake=FakeDelivery)
+
+def delivery_for(name=None):
+    return DELIVERIES[name or config.MAIL_DELIVERY or 'smtp']()
@@ -0,0 +1,70 @@
+import os.path
+import string
+import codecs
+import threading
+
+import yaml
+
+from segue.core import config
+
+BASE = os.path.join(os.path.dirname(__file__), 'templates')
+
+class CompiledTemplate(object):
+    def __init__(self, name, source, mtime):
+        self.name    = name
+        self.mtime   = mtime
+        self.subject = unicode(source['subject'])
+        self.body    = unicode(source['body'])
+        # parsing up front makes a malformed template fail on load, not halfway through a bulk send
+        self.fields  = self._fields_of(self.subject) | self._fields_of(self.body)
+
+    def _fields_of(self, text):
+        result = set()
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field: result.add(field.split('.')[0].split('[')[0])
+        return result
+
+    def render(self, variables):
+        return self.subject.format(**variables), self.body.format(**variables)
+
+class TemplateRegistry(object):
+    def __init__(self, base=BASE, debug=None):
+        self.base   = base
+        self.debug  = debug
+        self.loads  = 0
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, name):
+        return os.path.join(self.base, name + '.yml')
+
+    def get(self, name):
+        template = self._compiled.get(name)
+        if template and not self.is_stale(template): return template
+
+        with self._lock:
+            template = self._compiled.get(name)
+            if not template or self.is_stale(template):
+                template = self._compiled[name] = self.load(name)
+        return template
+
+    def is_stale(self, template):
+        debug = config.DEBUG if self.debug is None else self.debug
+        if not debug: return False
+        return os.path.getmtime(self.path_for(template.name)) != template.mtime
+
+    def load(self, name):
+        path = self.path_for(name)
+        if not os.path.isfile(path): raise KeyError(name)
+
+        mtime = os.path.getmtime(path)
+        with codecs.open(path, 'r', 'utf-8') as source:
+            template = CompiledTemplate(name, yaml.load(source), mtime)
+        self.loads += 1
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+
+templates = TemplateRegistry()
@@ -23,6 +23,9 @@ import reception
 import link_tv
 import cashiers
 import storage
+import bench
+import mail
+import certificate
 
 def _make_context():
     import segue.models
@@ -46,11 +49,14 @@ manager.command(judge.create_tournament)
 manager.command(judge.tag_proposals)
 manager.command(judge.put_tag_if_absent_of)
 manager.command(judge.generate_round)
+manager.command(judge.rebuild_standings)
+manager.command(judge.create_load_judges)
 manager.command(judge.freeze_judging)
 manager.command(notificate.notify_proposals)
 manager.command(notificate.notify_slots)
 manager.command(notificate.non_selection)
 manager.command(notificate.certificates)
+manager.command(certificate.issue_certificates)
 manager.command(report.adempiere_format)
 manager.command(slotize.slotize)
 manager.command(import_caravan.import_caravan)
@@ -62,8 +68,7 @@ manager.command(purchaser.validate_current_purchase)
 manager.command(lister.list_speakers)
 manager.command(lister.list_talks)
 manager.command(lister.list_proposals)
-manager.command(jobs.bad_jobs)
-manager.command(jobs.good_jobs)
+manager.command(jobs.sync_jobs)
 manager.command(printer.print_range)
 manager.command(printer.print_person)
 manager.command(printer.mark_failed)
@@ -71,3 +76,14 @@ manager.command(reception.reception_mail)
 manager.command(link_tv.link_tv)
 manager.command(cashiers.cashiers)
 manager.command(storage.folderize)
+manager.command(storage.render_cache_stats)
+manager.command(storage.cache_stats)
+manager.command(storage.cache_invalidate)
+manager.command(bench.bench_people_search)
+manager.command(bench.bench_service_construction)
+manager.command(bench.bench_request_overhead)
+manager.command(bench.bench_certificate_eligibility)
+manager.command(bench.bench_swiss_pairing)
+manager.command(bench.bench_serializers)
+manager.command(mail.mail_worker)
+manager.command(mail.mail_dead_letters)
@@ -0,0 +1,268 @@
+# coding: utf-8
+
+import random
+import time
+
+from sqlalchemy import func
+
+from segue.core import db
+from segue.search import normalize
+from segue.models import Account, Purchase, Product
+
+from support import *
+
+SEED_CHUNK = 5000
+
+FIRST_NAMES = [ u'João', u'José', u'Conceição', u'Maria', u'Ana', u'Luís', u'Antônio', u'Fábio',
+                u'Márcia', u'Inês', u'Sebastião', u'Cecília', u'Érico', u'Lúcia', u'André', u'Paulo' ]
+LAST_NAMES  = [ u'Magalhães', u'Gonçalves', u'Araújo', u'Simões', u'Assunção', u'Brandão', u'Falcão',
+                u'Guimarães', u'Peçanha', u'Lima', u'Silva', u'Souza', u'Müller', u'Pereira' ]
+
+def _percentile(samples, ratio):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+def _report(label, samples, target_ms=None):
+    p50, p99 = _percentile(samples, 0.50) * 1000, _percentile(samples, 0.99) * 1000
+    color = F.GREEN if target_ms is None or p99 <= target_ms else F.RED
+    print color + u"{:<40} n={:<6} p50={:>8.2f}ms  p99={:>8.2f}ms  max={:>8.2f}ms".format(label, len(samples), p50, p99, max(samples) * 1000)
+
+def _seed_people(how_many, product):
+    first_id = (db.session.query(func.max(Account.id)).scalar() or 0) + 1
+    for start in range(0, how_many, SEED_CHUNK):
+        accounts, purchases = [], []
+        for index in range(start, min(how_many, start + SEED_CHUNK)):
+            name     = u' '.join([ random.choice(FIRST_NAMES), random.choice(LAST_NAMES), random.choice(LAST_NAMES) ])
+            email    = 'bench.{}@example.com'.format(index)
+            document = 'bench-{}'.format(index)
+            accounts.append(dict(id=first_id + index, name=name, email=email, document=document, role='user',
+                                 search_text=normalize(name, email, document)))
+            purchases.append(dict(customer_id=first_id + index, product_id=product.id, status='pending',
+                                  kind='single', amount=product.price, qty=1, due_date=product.due_date))
+        db.session.execute(Account.__table__.insert(), accounts)
+        db.session.execute(Purchase.__table__.insert(), purchases)
+
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('ANALYZE account')
+
+def _needles(how_many):
+    result = []
+    for _ in range(how_many):
+        first, last = random.choice(FIRST_NAMES), random.choice(LAST_NAMES)
+        result.append(random.choice([
+            first[:4],
+            normalize(first),
+            u'{} {}'.format(first, last),
+            normalize(last)[:5],
+            'bench.{}@'.format(random.randint(0, 999))
+        ]))
+    return result
+
+def bench_people_search(accounts=100000, searches=500, target_ms=20, seed=42):
+    init_command()
+    from segue.frontdesk.services import PeopleService
+    random.seed(int(seed))
+
+    product = Product.query.first()
+    if not product:
+        print F.RED + u"at least one product must exist to seed purchases"
+        return
+
+    # everything runs inside a single transaction that is rolled back at the end
+    try:
+        started = time.time()
+        _seed_people(int(accounts), product)
+        print F.RESET + u"seeded {} people in {:.1f}s".format(accounts, time.time() - started)
+
+        service = PeopleService()
+        latencies = []
+        for needle in _needles(int(searches)):
+            started = time.time()
+            service.lookup(needle)
+            latencies.append(time.time() - started)
+
+        _report(u"PeopleService.lookup", latencies, target_ms=float(target_ms))
+    finally:
+        db.session.rollback()
+
+def bench_service_construction(iterations=2000):
+    init_command()
+    from segue.mailer.registry import templates
+    from segue.purchase.services import PurchaseService
+    from segue.frontdesk.services import PeopleService
+
+    for factory in [ PurchaseService, PeopleService ]:
+        loads_before = templates.loads
+        latencies = []
+        for _ in range(int(iterations)):
+            started = time.time()
+            factory().mailer.message_factory.from_template('purchase/confirmation')
+            latencies.append(time.time() - started)
+
+        _report(u"{}()".format(factory.__name__), latencies)
+        print F.RESET + u"{:<40} template files parsed: {}".format('', templates.loads - loads_before)
+
+def bench_request_overhead(requests=200, needle='maria'):
+    init_command()
+    from flask import current_app
+    from segue.core import container
+    from segue.account.jwt import Signer
+    from segue.purchase.services import PurchaseService
+    from segue.frontdesk.services import PeopleService
+
+    admin = Account.query.filter(Account.role == 'admin').first()
+    if not admin:
+        print F.RED + u"an admin account is needed to authenticate the requests"
+        return
+
+    for factory in [ PeopleService, PurchaseService ]:
+        fresh, shared = [], []
+        for _ in range(int(requests)):
+            started = time.time()
+            factory()
+            fresh.append(time.time() - started)
+
+            started = time.time()
+            container.shared(factory)
+            shared.append(time.time() - started)
+        _report(u"{}() per use".format(factory.__name__), fresh)
+        _report(u"container.shared({})".format(factory.__name__), shared)
+
+    client  = current_app.test_client()
+    headers = { 'Authorization': 'Bearer ' + Signer().sign(admin)['token'] }
+
+    # a cold container rebuilds the graph behind every request, like the services built per use did
+    for url in [ '/fd/people?q=' + needle, '/purchases' ]:
+        for label, cold in [ ('per-request graph', True), ('shared graph', False) ]:
+            latencies = []
+            for _ in range(int(requests)):
+                if cold: container.reset()
+                started = time.time()
+                client.get(url, headers=headers)
+                latencies.append(time.time() - started)
+                db.session.rollback()
+            _report(u"GET {} ({})".format(url.split('?')[0], label), latencies)
+
+def bench_certificate_eligibility(attendees=50000, speakers=2000, issued_ratio=0.1, sample=500, seed=42):
+    init_command()
+    from segue.proposal.models import Proposal
+    from segue.schedule.models import Slot
+    from segue.certificate.models import Certificate
+    from segue.certificate.services import CertificateService
+    random.seed(int(seed))
+
+    service = CertificateService()
+    product = Product.query.filter(Product.category.in_(service.VALID_CATEGORIES)).first()
+    if not product:
+        print F.RED + u"a product with an attendant category must exist to seed purchases"
+        return
+
+    # everything runs inside a single transaction that is rolled back at the end
+    try:
+        started = time.time()
+        first_id = (db.session.query(func.max(Account.id)).scalar() or 0) + 1
+        _seed_people(int(attendees), product)
+        last_id = first_id + int(attendees) - 1
+        db.session.execute(Purchase.__table__.update().where(Purchase.customer_id >= first_id).values(status='paid'))
+
+        first_talk = (db.session.query(func.max(Proposal.id)).scalar() or 0) + 1
+        owners = random.sample(xrange(first_id, last_id + 1), int(speakers))
+        db.session.execute(Proposal.__table__.insert(), [ dict(id=first_talk + index, owner_id=owner, title=u'bench talk {}'.format(index), status='confirmed')
+                                                          for index, owner in enumerate(owners) ])
+        db.session.execute(Slot.__table__.insert(), [ dict(talk_id=first_talk + index, status='confirmed', blocked=False) for index in range(len(owners)) ])
+
+        tickets = db.session.query(Purchase.customer_id, Purchase.id).filter(Purchase.customer_id >= first_id).all()
+        issued  = random.sample(tickets, int(len(tickets) * float(issued_ratio)))
+        db.session.execute(Certificate.__table__.insert(), [ dict(kind='attendant', account_id=account_id, ticket_id=ticket_id, language='pt', hash_code='B{:09d}'.format(index))
+                                                             for index, (account_id, ticket_id) in enumerate(issued) ])
+        print F.RESET + u"seeded {} attendees, {} speakers and {} certificates in {:.1f}s".format(attendees, speakers, len(issued), time.time() - started)
+
+        latencies = []
+        for account in Account.query.filter(Account.id.in_(random.sample(xrange(first_id, last_id + 1), int(sample)))):
+            started = time.time()
+            service.issuable_certificates_for(account)
+            latencies.append(time.time() - started)
+        _report(u"issuable_certificates_for(account)", latencies)
+
+        started = time.time()
+        candidates = service.eligibility.issuable(first_id, last_id)
+        elapsed = time.time() - started
+        print F.RESET + u"{:<40} {} candidates for {} accounts in {:.2f}s ({:.0f} accounts/s)".format(
+            u"eligibility.issuable(range)", len(candidates), attendees, elapsed, int(attendees) / elapsed)
+    finally:
+        db.session.rollback()
+
+def bench_swiss_pairing(players=5000, rounds=10, seed=42):
+    init_command()
+    from segue.proposal.models import Proposal
+    from segue.judge.swiss import ClassicalRoundGenerator, StandingsCalculator, Player
+    random.seed(int(seed))
+
+    # proposals and matches stay transient, so this measures pairing alone
+    field      = [ Player(Proposal(id=index + 1), 0) for index in range(int(players)) ]
+    generator  = ClassicalRoundGenerator()
+    calculator = StandingsCalculator()
+    past, latencies = [], []
+
+    for round_number in range(1, int(rounds) + 1):
+        standings = calculator.rank(list(field))
+        started = time.time()
+        matches = generator.generate(standings, past, round_number)
+        latencies.append(time.time() - started)
+
+        by_id = { player.id: player for player in field }
+        for match in matches:
+            match.result = match.result or random.choice([ 'player1', 'player2', 'tie' ])
+            for proposal_id, result_kind in match.outcomes:
+                by_id[proposal_id].add_result(result_kind)
+        past.extend(matches)
+
+        pairings  = [ frozenset([ match.player1_id, match.player2_id ]) for match in past if match.player2_id ]
+        rematches = len(pairings) - len(set(pairings))
+        byes = sum(1 for match in matches if not match.player2_id)
+        print F.RESET + u"round {:>2}: {:>5} matches, {} byes, {} rematches so far, {:.1f}ms".format(
+            round_number, len(matches), byes, rematches, latencies[-1] * 1000)
+
+    _report(u"ClassicalRoundGenerator.generate", latencies)
+
+def bench_serializers(objects=10000, rounds=3):
+    init_command()
+    from sqlalchemy.orm import joinedload
+    from segue.json import PropertyJsonSerializer
+    from segue.purchase.serializers import ShortPurchaseJsonSerializer
+
+    product = Product.query.first()
+    if not product:
+        print F.RED + u"at least one product must exist to seed purchases"
+        return
+
+    # everything runs inside a single transaction that is rolled back at the end
+    try:
+        first_id = (db.session.query(func.max(Account.id)).scalar() or 0) + 1
+        _seed_people(int(objects), product)
+        purchases = Purchase.query.filter(Purchase.customer_id >= first_id).options(joinedload('customer')).all()
+        accounts  = [ purchase.customer for purchase in purchases ]
+        print F.RESET + u"loaded {} purchases and {} accounts".format(len(purchases), len(accounts))
+
+        # objects and their lazy relationships are loaded by a warm-up pass, so only serialization is timed
+        def emit_all():
+            return [ purchase.serialize(using=ShortPurchaseJsonSerializer) for purchase in purchases ] + \
+                   [ account.serialize() for account in accounts ]
+        emit_all()
+
+        results = {}
+        for compiled in (False, True):
+            PropertyJsonSerializer.compiled = compiled
+            label = u"compiled" if compiled else u"interpreted"
+            samples = []
+            for _ in range(int(rounds)):
+                started = time.time()
+                results[label] = emit_all()
+                samples.append(time.time() - started)
+            _report(u"serialize {} objects ({})".format(len(purchases) + len(accounts), label), samples)
+
+        identical = results[u"interpreted"] == results[u"compiled"]
+        print (F.GREEN if identical else F.RED) + u"outputs identical: {}".format(identical)
+    finally:
+        PropertyJsonSerializer.compiled = True
+        db.session.rollback()
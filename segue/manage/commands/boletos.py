@@ -4,67 +4,42 @@ import codecs
 import sys
 
 
-from segue.purchase.services import PaymentService
-from segue.purchase.boleto import BoletoPaymentService
-from segue.purchase.boleto.parsers  import BoletoFileParser
+from segue.purchase.services import ProcessBoletosService
 
 from support import *;
 
-def process_boletos(filename):
+def process_boletos(filename, batch_size=None, start_at=0):
     init_command()
-    content = open(filename, 'r').read()
 
-    boleto_service = BoletoPaymentService()
-    payment_service = PaymentService()
-    parser = BoletoFileParser()
+    service = ProcessBoletosService(batch_size=batch_size and int(batch_size))
+    retain = ('late', 'bad', 'unknown')
 
-    good_payments = []
-    late_payments = []
-    bad_payments = []
-    unknown_payments = []
+    with open(filename, 'r') as source:
+        try:
+            result = service.process_stream(source, offset=int(start_at), retain=retain)
+        except:
+            print F.RED + u"**** FALHA! retome com --start_at={}".format(service.checkpoint or start_at)
+            raise
 
-    for entry in parser.parse(content):
-        print F.RESET  + LINE
-        print F.YELLOW + entry['line']
+    counts           = result['counts']
+    late_payments    = result['late']
+    bad_payments     = result['bad']
+    unknown_payments = result['unknown']
 
-        payment = boleto_service.get_by_our_number(entry.get('our_number'))
-
-        if not payment:
-            print F.RED + "**** COULD NOT FIND PAYMENT FOR LINE: {line}".format(**entry)
-            unknown_payments.append(entry)
-            continue
-
-        print F.RESET + "**** FOUND PAYMENT, applying transition"
-
-        if entry['payment_date'] == payment.legal_due_date:
-            print F.RED + "**** NEXT BUSINESS DAY PAYMENT TOLERATED ****"
-        elif entry['payment_date'] > payment.legal_due_date:
-            print F.RED + "**** LATE PAYMENT!!! ****"
-            late_payments.append(dict(entry=entry, payment=payment))
-            continue
-
-        print F.RESET
-        purchase, transition = payment_service.notify(payment.purchase.id, payment.id, entry, 'script')
-
-        print F.YELLOW + "id={0.id} {0.old_status}->{0.new_status}\tR$ {0.paid_amount} ".format(transition)
-
-        if transition.errors:
-            print F.RED + "**** BAD TRANSITION! errors were: {0.errors}".format(transition)
-            bad_payments.append(dict(entry=entry, payment=payment, errors=transition.errors))
-            continue;
-        else:
-            print F.GREEN + "**** GOOD TRANSITION!"
-            good_payments.append(dict(entry=entry, payment=payment))
-            continue
-
-    total_money = sum([ p['payment'].amount for p in good_payments])
+    for index, batch in enumerate(result['batches']):
+        print F.RESET + u"LOTE {:>4}  {:>6} linhas  {:>8.3f}s  checkpoint={}".format(index, batch['size'], batch['elapsed'], batch['checkpoint'])
 
     print F.GREEN + u"==============================================================="
-    print F.GREEN + u"VALIDOS             {}".format(len(good_payments))
-    print F.GREEN + u"ATRASADOS           {}".format(len(late_payments))
-    print F.GREEN + u"ERRADOS             {}".format(len(bad_payments))
-    print F.GREEN + u"NAO-RECONHECIDOS    {}".format(len(unknown_payments))
-    print F.GREEN + u"RECEITA TOTAL    R$ {:.2f}".format(float(total_money))
+    print F.GREEN + u"VALIDOS             {}".format(counts['good'])
+    print F.GREEN + u"ATRASADOS           {}".format(counts['late'])
+    print F.GREEN + u"ERRADOS             {}".format(counts['bad'])
+    print F.GREEN + u"NAO-RECONHECIDOS    {}".format(counts['unknown'])
+    print F.GREEN + u"LINHAS ILEGIVEIS    {}".format(len(result['bad_lines']))
+    print F.GREEN + u"RECEITA TOTAL    R$ {:.2f}".format(float(result['revenue']))
+
+    print F.YELLOW + u"***** LINHAS ILEGIVEIS *****"
+    for bad_line in result['bad_lines']:
+        print F.RED + u"BYTE {offset}: {line}".format(**bad_line)
 
     print F.YELLOW + u"***** PAGAMENTOS NAO-RECONHECIDOS *****"
     for entry in unknown_payments:
@@ -0,0 +1,46 @@
+import sys
+
+from segue.certificate.bulk import BulkCertificateIssuer, IssuingCheckpoint
+from segue.document.services import DocumentService
+from segue.document.renderers import RendererPool
+
+from support import *
+
+def issue_certificates(start=0, end=sys.maxint, chunk_size=None, workers=None, resume=False):
+    init_command()
+
+    checkpoint = IssuingCheckpoint()
+    start = int(start)
+    if resume and checkpoint.load() is not None:
+        start = checkpoint.load() + 1
+        print "{}resuming after checkpoint {}{}".format(F.YELLOW, start - 1, F.RESET)
+
+    renderer = RendererPool(size=workers and int(workers))
+    issuer   = BulkCertificateIssuer(documents=DocumentService(renderer=renderer), checkpoint=checkpoint, chunk_size=chunk_size)
+
+    progress = dict(next=start)
+
+    def on_chunk(chunk, result):
+        progress['next'] = chunk['end'] + 1
+        print "{}{:>7}-{:<7}{} candidates: {:>5}  issued: {}{:>5}{}  skipped: {:>4}  failed: {}{:>4}{}  {:>7.3f}s  {:>7.1f} certs/s".format(
+            F.GREEN, chunk['start'], chunk['end'], F.RESET, chunk['candidates'], F.GREEN, chunk['issued'], F.RESET,
+            chunk['skipped'], F.RED, len(chunk['failed']), F.RESET, chunk['elapsed'], chunk['rate'])
+
+    try:
+        result = issuer.run(start, int(end), on_chunk=on_chunk)
+    except (Exception, KeyboardInterrupt):
+        print F.RED + "**** interrupted! resume with --resume or --start={}".format(progress['next']) + F.RESET
+        raise
+    finally:
+        renderer.shutdown()
+
+    print "============== CERTIFICATES ==================="
+    print "      candidates: {}{}{}".format(F.GREEN, result['candidates'], F.RESET)
+    print "          issued: {}{}{}".format(F.GREEN, result['issued'],     F.RESET)
+    print "  skipped (name): {}{}{}".format(F.GREEN, result['skipped'],    F.RESET)
+    print "          failed: {}{}{}".format(F.RED,   len(result['failed']), F.RESET)
+    print "         elapsed: {}{:.1f}s{} ({:.1f} certs/s)".format(F.GREEN, result['elapsed'], F.RESET, result['issued'] / result['elapsed'] if result['elapsed'] else 0)
+    print "      checkpoint: {}{}{}".format(F.GREEN, result['checkpoint'], F.RESET)
+    print "         renders: {}".format(renderer.metrics())
+    for candidate, error in result['failed']:
+        print "{}{}{} {} failed: {}".format(F.RED, candidate.account_id, F.RESET, candidate.kind, error.__class__.__name__)
@@ -1,7 +1,7 @@
 # encoding: utf-8
 
 from segue.mailer import MailerService
-from segue.judge.services import JudgeService, TournamentService, RankingService
+from segue.judge.services import JudgeService, TournamentService, RankingService, StandingsService
 from segue.judge.errors import JudgeAlreadyExists
 from segue.proposal.services import ProposalService
 from support import *;
@@ -34,6 +34,14 @@ def generate_round(tid=0):
     service.generate_round(tid)
     print "OK"
 
+def rebuild_standings(tid=0):
+    init_command()
+
+    tournament = TournamentService().get_one(tid)
+    print "rebuilding standings for tournament {}{}{}...".format(F.GREEN, tid, F.RESET),
+    affected = StandingsService().rebuild(tournament)
+    print "{}{}{} players".format(F.GREEN, affected, F.RESET)
+
 def freeze_judging(tid=0, aid=0):
     init_command()
     service = RankingService()
@@ -112,3 +120,15 @@ def put_tag_if_absent_of(new_tag, tag_names):
     )
 
 
+
+def create_load_judges(count=300, votes=1000, tid=0, output='judges.txt'):
+    init_command()
+
+    service = JudgeService()
+    with open(output, 'w') as target:
+        for idx in range(int(count)):
+            token = service.create_token("load-judge-{}-{}@example.com".format(tid, idx), int(votes), tid)
+            target.write(token.hash + "\n")
+
+    print "{}{}{} judges created for tournament {}{}{}, hashes written to {}{}{}".format(
+            F.GREEN, count, F.RESET, F.GREEN, tid, F.RESET, F.GREEN, output, F.RESET)
@@ -79,4 +79,5 @@ def link_tv(rooms_to_scan=None, early_max=5, late_max=25):
     print "timestamps with multiple slots: {}".format(len(ambiguous))
     print "commiting..."
     db.session.commit()
+    slots.snapshot.invalidate()
     print "OK"
@@ -0,0 +1,31 @@
+import time
+
+from rq import Worker
+
+from segue.mailer.delivery import MailQueue
+from support import *
+
+def mail_worker(burst=False, interval=5):
+    init_command()
+    queue = MailQueue()
+    worker = Worker([ queue.queue ], connection=queue.redis)
+
+    print "{}mail worker listening on queue {}{}{}".format(F.RESET, F.GREEN, queue.NAME, F.RESET)
+    while True:
+        promoted = queue.promote_due_retries()
+        if promoted: print "{}{}{} mails promoted back from retry".format(F.YELLOW, promoted, F.RESET)
+
+        worker.work(burst=True)
+        if burst: break
+        time.sleep(float(interval))
+
+def mail_dead_letters(requeue=False):
+    init_command()
+    queue = MailQueue()
+
+    for letter in queue.dead_letters():
+        print "{}{}{} -> {} after {} attempts: {}".format(F.RED, letter['payload']['subject'], F.RESET,
+            letter['payload']['recipients'], letter['attempt'], letter['error'])
+
+    if requeue:
+        print "{}{}{} dead letters requeued".format(F.GREEN, queue.requeue_dead_letters(), F.RESET)
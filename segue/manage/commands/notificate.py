@@ -3,80 +3,66 @@ import sys
 from collections import defaultdict
 from datetime import datetime
 
+from segue.core import db
 from segue.errors import SegueError
 from segue.account.services import AccountService
 from segue.proposal.services import ProposalService, NonSelectionService
 from segue.schedule.services import NotificationService, SlotService
-from segue.certificate.services import CertificateService
+from segue.certificate.eligibility import CertificateEligibility
 from segue.mailer import MailerService
+from segue.mailer.delivery import SmtpDelivery
 from support import *;
 
-def certificates(start=0, end=sys.maxint):
+def certificates(start=0, end=sys.maxint, rate=None, burst=None):
     init_command()
 
-    accounts     = AccountService().by_range(int(start), int(end)).all()
-    certificates = CertificateService()
-    mailer       = MailerService()
-
-    skipped = 0
-    sent    = 0
-
-    for account in accounts:
-        print "{}{}{} - account owned by {}{}{}...".format(
-                F.RED, account.id, F.RESET,
-                F.RED, u(account.email), F.RESET
-        ),
-
-        available_certs = certificates.issuable_certificates_for(account, exclude_issued=True)
-
-        if not available_certs:
-            print "has {}0{} pending certs, {}skipping{}".format(F.RED, F.RESET, F.RED, F.RESET)
-            skipped += 1
-            continue
-
-        if not account.email:
-            print "{}this account has no email{}, skipping".format(F.RED, F.RESET)
-            continue
-
-        print "has certs = {}{}{}, {}notifying{}".format(F.RED, available_certs, F.RESET, F.GREEN, F.RESET)
-        mailer.certificates_available(account, available_certs)
-        sent += 1
-
-    print "============== RESULTS ==============="
+    accounts = AccountService().by_range(int(start), int(end))
+    pending  = set(x.account_id for x in CertificateEligibility().issuable(int(start), int(end)))
+    mailer   = MailerService(delivery=SmtpDelivery())
+
+    def jobs():
+        for account in accounts:
+            if account.id not in pending:
+                print "{}{}{} - has {}0{} pending certs, {}skipping{}".format(F.RED, account.id, F.RESET, F.RED, F.RESET, F.RED, F.RESET)
+                yield account.id, None
+            elif not account.email:
+                print "{}{}{} - {}this account has no email{}, skipping".format(F.RED, account.id, F.RESET, F.RED, F.RESET)
+                yield account.id, None
+            else:
+                yield account.id, mailer.certificates_message(account)
+
+    dispatch_mail(mailer, jobs(), rate=rate, burst=burst)
     print "start: {}{}{}, end: {}{}{}".format(F.GREEN, start, F.RESET, F.GREEN, end, F.RESET)
-    print "accounts scanned: {}{}{}".format(F.GREEN, len(accounts), F.RESET)
-    print "         skipped: {}{}{}".format(F.GREEN, skipped,       F.RESET)
-    print "      sent email: {}{}{}".format(F.GREEN, sent,          F.RESET)
 
-def non_selection(start=0, end=sys.maxint):
+def non_selection(start=0, end=sys.maxint, rate=None, burst=None):
     init_command()
 
-    accounts = AccountService().by_range(int(start), int(end)).all()
-    service = NonSelectionService()
+    accounts = AccountService().by_range(int(start), int(end))
+    service  = NonSelectionService()
+    mailer   = MailerService(delivery=SmtpDelivery())
 
     results = { True: 0, False: 0 }
 
-    for account in accounts:
-        print "{}{}{} - account owned by {}{}{}...".format(
-                F.RED, account.id, F.RESET,
-                F.RED, account.email, F.RESET
-        ),
-
-        qualifies, earliest_proposal = service.qualify(account)
-        results[qualifies] += 1
+    def jobs():
+        for account in accounts:
+            qualifies, earliest_proposal = service.qualify(account)
+            results[qualifies] += 1
 
-        message = F.GREEN+'qualifies...' if qualifies else F.RED+'does not qualify!'
-        print message+F.RESET,
+            if not qualifies or service.existing_for(account):
+                print "{}{}{} - {}does not qualify or was already notified{}".format(F.RED, account.id, F.RESET, F.RED, F.RESET)
+                yield account.id, None
+            else:
+                yield account.id, mailer.non_selection_message(service.create(account, commit=False))
 
-        if qualifies:
-            print "{}sending{}...".format(F.GREEN, F.RESET),
-            service.create_and_send(account)
+    # the notice is only kept once its mail went out, so reruns and --start resumes retry failed sends
+    def sent(marker, message):
+        db.session.commit()
 
-        print F.GREEN+"OK"+F.RESET
+    def failed(marker, message):
+        db.session.rollback()
 
-    print "============== RESULTS ==============="
+    dispatch_mail(mailer, jobs(), rate=rate, burst=burst, on_sent=sent, on_failed=failed)
     print "start: {}{}{}, end: {}{}{}".format(F.GREEN, start, F.RESET, F.GREEN, end, F.RESET)
-    print "accounts scanned: {}{}{}".format(F.GREEN, len(accounts),  F.RESET)
     print "       qualified: {}{}{}".format(F.GREEN, results[True],  F.RESET)
     print "   not qualified: {}{}{}".format(F.GREEN, results[False], F.RESET)
 
@@ -1,4 +1,5 @@
 import sys
+import time
 import collections
 
 from support import *
@@ -12,6 +13,7 @@ USAGE = """
                                       --printer=PRINTER
                                       --rehearse
                                       [--failures_only|--never_printed_only]
+                                      [--batch_size=500]
 
 """
 
@@ -24,7 +26,7 @@ def mark_failed(ids=''):
         result = service.mark_failed_for_person(person_id)
         print result
 
-def print_range(categories="", start=None, end=None, printer=None, failures_only=False, never_printed_only=False, rehearse=False):
+def print_range(categories="", start=None, end=None, printer=None, failures_only=False, never_printed_only=False, rehearse=False, batch_size=500):
     if not start:      print USAGE; return;
     if not end:        print USAGE; return;
     if not categories: print USAGE; return;
@@ -37,6 +39,13 @@ def print_range(categories="", start=None, end=None, printer=None, failures_only
     badges = BadgeService()
 
     printed = 0
+    pending = []
+
+    def flush():
+        started = time.time()
+        badges.print_badges(printer, pending)
+        print "{}queued {}{}{} badges in {:.2f}s, last id {}{}{}".format(F.GREEN, F.RED, len(pending), F.GREEN, time.time() - started, F.RED, pending[-1].id, F.RESET)
+        del pending[:]
 
     for person in people.by_range(int(start), int(end)):
         print "{}scanning id {}{}{}, name {}{}{}, category {}{}{}".format(F.RESET,
@@ -58,8 +67,9 @@ def print_range(categories="", start=None, end=None, printer=None, failures_only
             continue
         print "... {}has valid ticket{}".format(F.GREEN, F.RESET)
 
-        was_printed_before  = badges.was_ever_printed(person.id)
-        has_failed_recently = badges.has_failed_recently(person.id)
+        # people.by_range preloads the latest badge, so no query per person here
+        was_printed_before  = person.last_badge is not None
+        has_failed_recently = was_printed_before and person.last_badge.result == 'failed'
 
         if never_printed_only and was_printed_before:
             print "... {}was printed before{}, skipping".format(F.RED, F.RESET)
@@ -74,7 +84,10 @@ def print_range(categories="", start=None, end=None, printer=None, failures_only
 
         print "... {}matches printing criteria{}, printing".format(F.GREEN, F.RESET)
         printed += 1
-        badges.make_badge(printer, person)
+        pending.append(person)
+        if len(pending) >= int(batch_size): flush()
+
+    if pending: flush()
 
     if rehearse:
         print "WOULD BE PRINTED", printed
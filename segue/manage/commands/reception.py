@@ -2,16 +2,17 @@ import sys
 import collections
 
 from support import *
-import time
 
+from segue.mailer import MailerService
+from segue.mailer.delivery import SmtpDelivery
 from segue.frontdesk.services import BadgeService, PeopleService
 
 USAGE = """
-    python manage.py reception_mail --categories=comma_separated_categories --status=paid|pending --start=id, --end=id
+    python manage.py reception_mail --categories=comma_separated_categories --status=paid|pending --start=id, --end=id [--rate=msgs_per_second --burst=msgs]
 
 """
 
-def reception_mail(status, categories="", start=None, end=None):
+def reception_mail(status, categories="", start=None, end=None, rate=None, burst=None):
     if not start:      print USAGE; return;
     if not end:        print USAGE; return;
     if not categories: print USAGE; return;
@@ -21,33 +22,43 @@ def reception_mail(status, categories="", start=None, end=None):
 
     wanted_categories = categories.split(",")
     people = PeopleService()
+    mailer = MailerService(delivery=SmtpDelivery())
     errors = []
 
-    for person in people.by_range(int(start), int(end)):
-        print "scanning {}{}{}, person {}{}{} - {}{}{} - {}{}{}".format(F.RESET,
-            F.RED, person.id,       F.RESET,
-            F.RED, u(person.name),  F.RESET,
-            F.RED, person.status,   F.RESET,
-            F.RED, person.category, F.RESET
-        )
-        print "... email is {}{}{}".format(F.RED, person.email.__repr__(), F.RESET)
+    def jobs():
+        for person in people.by_range(int(start), int(end)):
+            print "scanning {}{}{}, person {}{}{} - {}{}{} - {}{}{}".format(F.RESET,
+                F.RED, person.id,       F.RESET,
+                F.RED, u(person.name),  F.RESET,
+                F.RED, person.status,   F.RESET,
+                F.RED, person.category, F.RESET
+            )
 
-        if person.status != status:
-            print "... {}ticket does not have the correct status{}, skipping".format(F.RED, F.RESET)
-            continue
+            if person.status != status:
+                print "... {}ticket does not have the correct status{}, skipping".format(F.RED, F.RESET)
+                yield person.id, None
 
-        elif person.category in wanted_categories or categories == "*":
-            print "... {}category is correct{}, sending".format(F.GREEN, F.RESET)
-            try:
-                people.send_reception_mail(person.id)
-                time.sleep(5)
-            except Exception, e:
-                errors.append([ person.id, sys.exc_info() ])
+            elif person.category in wanted_categories or categories == "*":
+                if not person.email:
+                    print "... {}person has no email{}, skipping".format(F.RED, F.RESET)
+                    yield person.id, None
+                    continue
 
-        else:
-            print "... {}wrong category{}, skipping".format(F.RED, F.RESET)
+                print "... {}category is correct{}, sending".format(F.GREEN, F.RESET)
+                # a message that cannot be composed is skipped, so one bad record does not stop the batch
+                try:
+                    message = mailer.reception_message(people.ensure_hash_code(person))
+                except Exception, e:
+                    print "... {}could not compose the message{}: {}".format(F.RED, F.RESET, e)
+                    errors.append((person.id, e))
+                    message = None
+                yield person.id, message
 
-    for id, error in errors:
-        print "ERROR for person {}: {}".format(person.id, error)
+            else:
+                print "... {}wrong category{}, skipping".format(F.RED, F.RESET)
+                yield person.id, None
 
+    dispatch_mail(mailer, jobs(), rate=rate, burst=burst)
 
+    for person_id, error in errors:
+        print "{}{}{} not composed: {}".format(F.RED, person_id, F.RESET, error)
@@ -1,8 +1,9 @@
 import os
 
-from segue.core import config
+from segue.core import config, cache
 
 from segue.document.services import DocumentService
+from segue.document.cache import RenderCache
 
 from support import *
 
@@ -49,3 +50,34 @@ def folderize(commit=False):
 
     if commit:
         print "run {}find {}{} to check if things look right".format(F.GREEN, root, F.RESET)
+
+def render_cache_stats():
+    init_command()
+
+    render_cache = RenderCache()
+    stats = render_cache.stats()
+    color = F.GREEN if stats['hit_rate'] >= 0.5 else F.YELLOW
+
+    print "render cache at {}{}{}".format(F.GREEN, render_cache.root, F.RESET)
+    print "    hits: {}{}{}".format(F.GREEN, stats['hits'],   F.RESET)
+    print "  misses: {}{}{}".format(F.RED,   stats['misses'], F.RESET)
+    print "hit rate: {}{:.1%}{}".format(color, stats['hit_rate'], F.RESET)
+    print " entries: {}{}{}".format(F.GREEN, stats['entries'], F.RESET)
+    print "    size: {}{:.1f}MB{} of {:.1f}MB".format(F.GREEN, stats['size'] / 1024.0 ** 2, F.RESET, stats['max_bytes'] / 1024.0 ** 2)
+
+
+def cache_stats():
+    init_command()
+
+    stats = cache.stats()
+    print "application cache: {}{}{}".format(F.GREEN, config.CACHE_TYPE, F.RESET)
+    for endpoint, entry in sorted(stats.items()):
+        color = F.GREEN if entry['hit_rate'] >= 0.5 else F.YELLOW
+        print "{:>40}  hits: {}{:>8}{}  misses: {}{:>8}{}  hit rate: {}{:.1%}{}".format(endpoint,
+                F.GREEN, entry['hits'], F.RESET, F.RED, entry['misses'], F.RESET, color, entry['hit_rate'], F.RESET)
+
+def cache_invalidate(tags):
+    init_command()
+
+    cache.invalidate(*tags.split(","))
+    print "invalidated tags {}{}{}".format(F.GREEN, tags, F.RESET)
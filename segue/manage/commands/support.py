@@ -14,3 +14,33 @@ def init_command():
 
 def u(value):
     return (value or '').encode("utf-8")
+
+# on_sent/on_failed(marker, message) run right after each send, before the next job is built
+def dispatch_mail(mailer, jobs, rate=None, burst=None, on_sent=None, on_failed=None):
+    progress = dict(marker=None)
+
+    def on_progress(marker, message, result):
+        progress['marker'] = marker
+        if message is None: return
+        if result['failed'] and result['failed'][-1][0] == marker:
+            if on_failed: on_failed(marker, message)
+        else:
+            print "{}{}{} - sent to {}{}{}".format(F.GREEN, marker, F.RESET, F.RED, u(message.recipients[0][1]), F.RESET)
+            if on_sent: on_sent(marker, message)
+
+    try:
+        result = mailer.bulk(jobs, on_progress=on_progress, rate=rate and float(rate), burst=burst and int(burst))
+    except (Exception, KeyboardInterrupt):
+        if progress['marker'] is not None:
+            print F.RED + "**** interrupted! resume with --start={}".format(progress['marker'] + 1) + F.RESET
+        raise
+
+    print "============== MAIL ==================="
+    print "      sent email: {}{}{}".format(F.GREEN, result['sent'],          F.RESET)
+    print "         skipped: {}{}{}".format(F.GREEN, result['skipped'],       F.RESET)
+    print "          failed: {}{}{}".format(F.RED,   len(result['failed']),   F.RESET)
+    print "         elapsed: {}{:.1f}s{} ({:.1f}s throttled)".format(F.GREEN, result['elapsed'], F.RESET, result['throttled'])
+    print "     last marker: {}{}{}".format(F.GREEN, result['marker'],        F.RESET)
+    for marker, error in result['failed']:
+        print "{}{}{} failed: {}".format(F.RED, marker, F.RESET, error)
+    return result
@@ -6,10 +6,11 @@ from segue.json import JsonFor
 from segue.decorators import jsoned, jwt_only
 
 from services import ProductService
+from segue.core import container
 
 class ProductController(object):
     def __init__(self, service=None):
-        self.service      = service or ProductService()
+        self.service      = service or container.shared(ProductService)
         self.current_user = current_user
 
     @jsoned
@@ -3,7 +3,7 @@ from flask import request, url_for
 from flask.ext.jwt import current_user
 
 from datetime import datetime
-from segue.core import db
+from segue.core import db, container
 
 from segue.caravan.errors import InvalidCaravan
 from segue.purchase.services import PurchaseService
@@ -19,8 +19,8 @@ DEFAULT_ORDERING = Product.price
 class ProductService(object):
     def __init__(self, db_impl=None, purchases=None, caravans=None, non_selection=None):
         self.db            = db_impl or db
-        self.purchases     = purchases or PurchaseService()
-        self.caravans      = caravans or CaravanService()
+        self.purchases     = purchases or container.shared(PurchaseService)
+        self.caravans      = caravans or container.shared(CaravanService)
         self.non_selection = non_selection or NonSelectionService()
 
     def _in_time(self):
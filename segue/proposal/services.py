@@ -2,7 +2,7 @@ from datetime import datetime
 import random
 from sqlalchemy import and_, or_
 
-from ..core import db, config
+from ..core import db, config, container
 from ..errors import NotAuthorized
 from ..hasher import Hasher
 from ..filters import FilterStrategies
@@ -30,19 +30,26 @@ class CallForPapersDeadline(object):
 class NonSelectionService(object):
     def __init__(self, hasher=None, mailer=None):
         self.hasher = hasher or Hasher()
-        self.mailer = mailer or MailerService()
+        self.mailer = mailer or container.shared(MailerService)
 
     def create_and_send(self, account):
-        existing = NonSelectionNotice.query.filter(NonSelectionNotice.account==account).first()
+        existing = self.existing_for(account)
         if existing: return existing
 
+        notice = self.create(account)
+        self.mailer.non_selection(notice)
+        return notice
+
+    def create(self, account, commit=True):
         notice = NonSelectionNotice(account=account)
         notice.hash = self.hasher.generate()
         db.session.add(notice)
-        db.session.commit()
-        self.mailer.non_selection(notice)
+        if commit: db.session.commit()
         return notice
 
+    def existing_for(self, account):
+        return NonSelectionNotice.query.filter(NonSelectionNotice.account==account).first()
+
     def qualify(self, account):
         try:
             return NonSelectionNotice.qualify(account)
@@ -64,7 +71,7 @@ class ProposalService(object):
         self.db = db_impl or db
         self.filter_strategies = ProposalFilterStrategies()
         self.deadline = deadline or CallForPapersDeadline()
-        self.accounts = accounts or AccountService()
+        self.accounts = accounts or container.shared(AccountService)
         self.notifications = notifications
 
     def cfp_state(self):
@@ -181,8 +188,8 @@ class InviteService(object):
     def __init__(self, proposals=None, hasher=None, accounts = None, mailer=None, deadline=None):
         self.proposals = proposals or ProposalService()
         self.hasher    = hasher    or Hasher()
-        self.mailer    = mailer    or MailerService()
-        self.accounts  = accounts  or AccountService()
+        self.mailer    = mailer    or container.shared(MailerService)
+        self.accounts  = accounts  or container.shared(AccountService)
         self.deadline  = deadline  or CallForPapersDeadline()
 
     def list(self, proposal_id, by=None):
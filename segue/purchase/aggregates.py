@@ -0,0 +1,54 @@
+from collections import namedtuple
+
+from sqlalchemy import case, func
+
+from segue.core import db
+
+from models import Purchase, Payment
+from promocode.models import PromoCode
+
+PaymentSummary = namedtuple('PaymentSummary', [ 'paid_amount', 'valid_payments' ])
+
+class PaymentAggregates(object):
+    NO_PAYMENTS = PaymentSummary(0, 0)
+
+    # the same rules as Payment.paid_amount and PromoCodePayment.paid_amount: a promocode pays its discount
+    # over the purchase total, any other payment its amount once it is paid or confirmed
+    def paid_amount_column(self):
+        return case([
+            (Payment.type == 'promocode', func.coalesce(PromoCode.discount * Purchase.amount * Purchase.qty, 0)),
+            (Payment.status.in_(Payment.VALID_PAYMENT_STATUSES), Payment.amount)
+        ], else_=0)
+
+    # paid amount and number of valid payments of each purchase, summed by the database in one
+    # query; purchases without payments are left out
+    def summaries(self, purchase_ids):
+        if not purchase_ids: return {}
+        valid = func.sum(case([ (Payment.status.in_(Payment.VALID_PAYMENT_STATUSES), 1) ], else_=0))
+        query = db.session.query(Payment.purchase_id, func.sum(self.paid_amount_column()), valid) \
+                          .join(Purchase, Purchase.id == Payment.purchase_id) \
+                          .outerjoin(PromoCode, PromoCode.id == self._promocode_id()) \
+                          .filter(Payment.purchase_id.in_(purchase_ids)) \
+                          .group_by(Payment.purchase_id)
+        return { purchase_id: PaymentSummary(amount or 0, int(count or 0)) for purchase_id, amount, count in query }
+
+    def paid_amounts(self, purchase_ids):
+        return { purchase_id: summary.paid_amount for purchase_id, summary in self.summaries(purchase_ids).items() }
+
+    # the same sum as a column correlated to Purchase, for listings that already query purchases
+    def paid_amount_subquery(self):
+        return db.session.query(func.coalesce(func.sum(self.paid_amount_column()), 0)) \
+                         .select_from(Payment) \
+                         .outerjoin(PromoCode, PromoCode.id == self._promocode_id()) \
+                         .filter(Payment.purchase_id == Purchase.id) \
+                         .correlate(Purchase).as_scalar()
+
+    def summary(self, purchase):
+        return self.summaries([ purchase.id ]).get(purchase.id, self.NO_PAYMENTS)
+
+    def paid_amount(self, purchase):
+        return self.summary(purchase).paid_amount
+
+    # PromoCodePayment.promocode_id through the table, so the query is not narrowed to promocode payments
+    def _promocode_id(self):
+        return Payment.__table__.c.pc_promocode_id
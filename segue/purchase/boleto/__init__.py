@@ -1,4 +1,5 @@
 import os.path
+from sqlalchemy.orm import joinedload
 from segue.errors import NotAuthorized
 from segue.core import config, db
 from factories import BoletoFactory, BoletoPaymentFactory, BoletoTransitionFactory
@@ -17,6 +18,14 @@ class BoletoPaymentService(object):
     def get_by_our_number(self, our_number):
         return BoletoPayment.query.filter(BoletoPayment.our_number == our_number).first()
 
+    def get_by_our_numbers(self, our_numbers):
+        if not our_numbers: return {}
+        payments = BoletoPayment.query \
+            .options(joinedload('purchase')) \
+            .filter(BoletoPayment.our_number.in_(set(our_numbers))) \
+            .all()
+        return { payment.our_number: payment for payment in payments }
+
     def create(self, purchase, data=None):
         payment = self.factory.create(purchase, self.sequence.nextval(), data)
         db.session.add(payment)
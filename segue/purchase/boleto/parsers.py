@@ -1,13 +1,36 @@
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from StringIO import StringIO
 
 DATE_FORMAT = "%d%m%Y"
 
 class BoletoFileParser(object):
+    def __init__(self):
+        self.bad_lines = []
+
     def parse(self, content):
-        lines = content.split("\n")
-        useful_lines = filter(self._is_valid_line, lines)
-        return map(self._parse_line, useful_lines)
+        return list(self.stream(StringIO(content)))
+
+    # source may be a file or a mmap; unparseable lines of this file are kept aside
+    # with their byte offsets instead of aborting the whole return file
+    def stream(self, source, offset=0):
+        self.bad_lines = []
+        source.seek(offset)
+        for raw_line in iter(source.readline, ''):
+            line_offset, offset = offset, offset + len(raw_line)
+            line = raw_line.rstrip("\n")
+
+            if not self._is_valid_line(line): continue
+
+            try:
+                entry = self._parse_line(line)
+            except (ValueError, IndexError, InvalidOperation):
+                self.bad_lines.append(dict(offset=line_offset, line=line))
+                continue
+
+            entry['offset']      = line_offset
+            entry['next_offset'] = offset
+            yield entry
 
     def _is_valid_line(self, line):
         return len(line) > 0 and line.count(';') > 0
@@ -5,7 +5,7 @@ from flask.ext.jwt import current_user
 from flask import request
 
 from segue.json import JsonFor
-from segue.core import config
+from segue.core import config, container
 from segue.decorators import jsoned, jwt_only, admin_only
 from segue.schema import Field
 
@@ -24,8 +24,8 @@ import schema
 
 class PurchaseController(object):
     def __init__(self, service=None, payments=None, hash=None, documents=None):
-        self.service = service or PurchaseService()
-        self.payments = payments or PaymentService()
+        self.service = service or container.shared(PurchaseService)
+        self.payments = payments or container.shared(PaymentService)
         self.hash = hash or Hasher(10)
         self.documents = documents or DocumentService()
         self.current_user = current_user
@@ -36,8 +36,8 @@ class PurchaseController(object):
     def process_boletos(self):
         file = request.files['file']
         if file:
-            processor = ProcessBoletosService()
-            result = processor.process(file.read())
+            processor = container.scoped(ProcessBoletosService)
+            result = processor.process_stream(file.stream)
             return dict(payments=result), 200
         return 200
 
@@ -126,7 +126,7 @@ class PurchaseController(object):
 
 class PaymentController(object):
     def __init__(self, service=None):
-        self.service = service or PaymentService()
+        self.service = service or container.shared(PaymentService)
         self.current_user = current_user
 
     @jsoned
@@ -166,7 +166,7 @@ class PaymentController(object):
 
 class PromocodeController(object):
     def __init__(self, service=None):
-        self.service = service or PromoCodeService()
+        self.service = service or container.shared(PromoCodeService)
 
     @jsoned
     @jwt_only
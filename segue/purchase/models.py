@@ -2,6 +2,9 @@
 
 from datetime import datetime
 
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql import functions as func
 from ..json import JsonSerializable, SQLAlchemyJsonSerializer
 from ..core import db
@@ -53,7 +56,7 @@ class Purchase(JsonSerializable, db.Model):
 
     id             = db.Column(db.Integer, primary_key=True)
     product_id     = db.Column(db.Integer, db.ForeignKey('product.id'))
-    customer_id    = db.Column(db.Integer, db.ForeignKey('account.id'))
+    customer_id    = db.Column(db.Integer, db.ForeignKey('account.id'), index=True)
     buyer_id       = db.Column(db.Integer, db.ForeignKey('buyer.id'))
     qty            = db.Column(db.Integer, default=1)
     #TODO: Create a enum for status. Status from database an old database ( pending, paid, reimbursed, stale)
@@ -67,6 +70,8 @@ class Purchase(JsonSerializable, db.Model):
 
     payments       = db.relationship('Payment', backref='purchase', lazy='dynamic')
 
+    _payment_summary = None
+
     __tablename__ = 'purchase'
     __mapper_args__ = { 'polymorphic_on': kind, 'polymorphic_identity': 'single' }
 
@@ -115,7 +120,6 @@ class Purchase(JsonSerializable, db.Model):
         expired = True
         if self.due_date:
             expired = self.due_date <= datetime.now().date()
-            print(self.due_date, datetime.now().date(), expired)
         return not self.status in ['stale', 'reimbursed', 'cancelled','paid'] and not expired
 
     @property
@@ -130,12 +134,27 @@ class Purchase(JsonSerializable, db.Model):
     def could_be_stale(self):
         return not self.reimbursed and not self.stale and not self.satisfied and datetime.now().date() > self.due_date
 
+    # summed by the database once, then kept until the purchase is expired or its payments change
+    @property
+    def payment_summary(self):
+        from aggregates import PaymentAggregates, PaymentSummary
+        if self.id is None:
+            payments = list(self.payments)
+            valid = [ p for p in payments if p.status in Payment.VALID_PAYMENT_STATUSES ]
+            return PaymentSummary(sum([ p.paid_amount for p in payments ]), len(valid))
+        if self._payment_summary is None: self._payment_summary = PaymentAggregates().summary(self)
+        return self._payment_summary
+
+    def forget_payment_summary(self):
+        self._payment_summary = None
+
     @property
     def paid_amount(self):
-        for p in self.payments:
-            print type(p)
+        return self.payment_summary.paid_amount
 
-        return sum([ p.paid_amount for p in self.payments])
+    @property
+    def has_valid_payments(self):
+        return self.payment_summary.valid_payments > 0
 
     @property
     def total_amount(self):
@@ -247,6 +266,14 @@ class Payment(JsonSerializable, db.Model):
     def recalculate_status(self):
         self.status = self.most_recent_transition.new_status
 
+    # only a purchase already at hand is told, so changing a payment never loads its purchase
+    def forget_purchase_summary(self):
+        purchase = self.__dict__.get('purchase')
+        session  = object_session(self)
+        if purchase is None and session is not None and self.__dict__.get('purchase_id') is not None:
+            purchase = session.identity_map.get(identity_key(Purchase, self.__dict__['purchase_id']))
+        if purchase is not None: purchase.forget_payment_summary()
+
 class Transition(JsonSerializable, db.Model):
     _serializers   = [ TransitionJsonSerializer ]
     id             = db.Column(db.Integer, primary_key=True)
@@ -286,3 +313,29 @@ class ClaimCheck(object):
     @property
     def template_file(self):
         return 'purchase/templates/donationclaimcheck.svg'
+
+# the memoized payment summary is forgotten whenever the purchase is expired or refreshed (so after
+# every commit) or anything it is summed from changes
+@event.listens_for(Purchase, 'expire', propagate=True)
+def _purchase_expired(purchase, attrs):
+    # states are weakly referenced, the purchase may already be gone
+    if purchase is not None: purchase.forget_payment_summary()
+
+@event.listens_for(Purchase, 'refresh', propagate=True)
+def _purchase_refreshed(purchase, context, attrs):
+    if purchase is not None: purchase.forget_payment_summary()
+
+@event.listens_for(Purchase.amount, 'set', propagate=True)
+@event.listens_for(Purchase.qty, 'set', propagate=True)
+def _purchase_changed(purchase, value, previous, initiator):
+    purchase.forget_payment_summary()
+
+@event.listens_for(Purchase.payments, 'append', propagate=True)
+@event.listens_for(Purchase.payments, 'remove', propagate=True)
+def _payments_changed(purchase, payment, initiator):
+    purchase.forget_payment_summary()
+
+@event.listens_for(Payment.status, 'set', propagate=True)
+@event.listens_for(Payment.amount, 'set', propagate=True)
+def _payment_changed(payment, value, previous, initiator):
+    payment.forget_purchase_summary()
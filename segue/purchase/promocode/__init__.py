@@ -6,7 +6,7 @@ import copy
 from requests.exceptions import RequestException
 
 from segue.purchase.errors import InvalidPaymentNotification, NoSuchPayment, MustProvideDescription
-from segue.core import db, logger
+from segue.core import db, logger, container
 from segue.hasher import Hasher
 
 from segue.purchase.schema import PromoCodeSchema
@@ -23,8 +23,14 @@ class PromoCodeService(object):
         self.filter_strategies = filters or PromoCodeFilterStrategies()
 
     def lookup(self, criteria=None, page=1, per_page=25):
-        filter_list = self.filter_strategies.given_criteria(**criteria)
-        return PromoCode.query.filter(*filter_list).paginate(page=page, per_page=per_page)
+        return self.lookup_query(criteria).paginate(page=page, per_page=per_page)
+
+    def lookup_query(self, criteria=None):
+        filter_list = self.filter_strategies.given_criteria(**(criteria or {}))
+        return PromoCode.query.filter(*filter_list).order_by(PromoCode.id)
+
+    def lookup_page(self, criteria=None, cursor=None, per_page=25, total=None):
+        return self.filter_strategies.keyset(self.lookup_query(criteria), PromoCode.id, cursor, per_page, total)
 
     def query(self, **kw):
         base        = self.filter_strategies.joins_for(PromoCode.query, **kw)
@@ -89,7 +95,7 @@ class PromoCodePaymentService(object):
     def __init__(self, cash_service=None, promocodes=None, factory=None):
         self.factory  = factory  or PromoCodePaymentFactory()
         self.cash_service = cash_service or CashPaymentService()
-        self.promocodes = promocodes or PromoCodeService()
+        self.promocodes = promocodes or container.shared(PromoCodeService)
 
     def create(self, purchase, data=dict(), commit=True, force_product=False):
         hash_code = data.get('hash_code',None)
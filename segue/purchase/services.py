@@ -6,9 +6,11 @@ import os
 import xmltodict
 import dateutil.parser
 import collections
+import itertools
+import time
 
 
-from segue.core import db, logger, config
+from segue.core import db, logger, config, container
 from segue.errors import NotAuthorized
 from segue.product.errors import NoSuchProduct, ProductExpired
 from segue.validation import StudentDocumentValidator
@@ -44,11 +46,11 @@ class OnlinePaymentDeadline(object):
 class PurchaseService(object):
     def __init__(self, db_impl=None, mailer=None, payments=None, filters=None, deadline=None, promocode=None):
         self.db = db_impl or db
-        self.payments = payments or PaymentService()
+        self.payments = payments or container.shared(PaymentService)
         self.filters = filters or PurchaseFilterStrategies()
         self.deadline = deadline or OnlinePaymentDeadline()
-        self.promocode_service = promocode or PromoCodeService()
-        self.mailer = mailer or MailerService()
+        self.promocode_service = promocode or container.shared(PromoCodeService)
+        self.mailer = mailer or container.shared(MailerService)
 
     def by_range(self, start, end):
         return Purchase.query.filter(Purchase.id.between(start, end)).order_by(Purchase.id)
@@ -76,6 +78,10 @@ class PurchaseService(object):
         filter_list = self.filters.given(**kw)
         return Purchase.query.filter(*filter_list).all()
 
+    def query_page(self, by=None, cursor=None, per_page=25, total=None, **kw):
+        filter_list = self.filters.given(**kw)
+        return self.filters.keyset(Purchase.query.filter(*filter_list), Purchase.id, cursor, per_page, total)
+
     def create(self, buyer_data, product, account, commit=True, **extra):
         buyer    = BuyerFactory().create(buyer_data, schema.buyer)
         if not buyer.document: raise DocumentIsNotDefined()
@@ -209,15 +215,21 @@ class PurchaseService(object):
         return purchase
 
     def lookup(self, criteria=None, by=None, limit=0):
-        base = Purchase.query.join('customer').join('product')
-        filters = self.filters.given_criteria(**criteria)
-        queryset = base.filter(and_(*filters))
+        queryset = self.lookup_query(criteria)
 
         if limit:
             queryset = queryset.limit(limit)
 
         return queryset.all()
 
+    def lookup_query(self, criteria=None):
+        base = Purchase.query.join('customer').join('product')
+        filters = self.filters.given_criteria(**(criteria or {}))
+        return base.filter(and_(*filters)).order_by(Purchase.id)
+
+    def lookup_page(self, criteria=None, cursor=None, per_page=25, total=None):
+        return self.filters.keyset(self.lookup_query(criteria), Purchase.id, cursor, per_page, total)
+
 class PaymentService(object):
     DEFAULT_PROCESSORS = dict(
         pagseguro = PagSeguroPaymentService,
@@ -230,10 +242,10 @@ class PaymentService(object):
     def __init__(self, mailer=None, caravans=None, filters=None, promocodes=None, **processors_overrides):
         from segue.caravan.services import CaravanService
         self.processors_overrides = processors_overrides
-        self.mailer               = mailer or MailerService()
-        self.caravans             = caravans or CaravanService()
+        self.mailer               = mailer or container.shared(MailerService)
+        self.caravans             = caravans or container.shared(CaravanService)
         self.filters              = filters or PaymentFilterStrategies()
-        self.promocodes           = promocodes or PromoCodeService()
+        self.promocodes           = promocodes or container.shared(PromoCodeService)
 
     def query(self, by=None, **kw):
         filter_list = self.filters.given(**kw)
@@ -299,18 +311,21 @@ class PaymentService(object):
             db.session.add(purchase)
             db.session.commit()
 
-            if purchase.satisfied:
-                if transition.old_status != 'paid' and transition.new_status == 'paid':
-                    self.on_finish_payment(purchase)
-            elif purchase.category == 'student':
-                if purchase.status == 'student_document_in_analysis':
-                   self.mailer.notify_student_purchase_received(purchase)
+            self.on_notified(purchase, transition)
 
             return purchase, transition
         except Exception, e:
             logger.error('Exception was thrown while processing payment notification! %s', e)
             raise e
 
+    def on_notified(self, purchase, transition):
+        if purchase.satisfied:
+            if transition.old_status != 'paid' and transition.new_status == 'paid':
+                self.on_finish_payment(purchase)
+        elif purchase.category == 'student':
+            if purchase.status == 'student_document_in_analysis':
+               self.mailer.notify_student_purchase_received(purchase)
+
     def on_finished_student_document_analysis(self, purchase):
         if purchase.category != 'student':
             # TODO: THROW A EXCEPTION
@@ -443,41 +458,98 @@ class PaymentService(object):
 
 
 class ProcessBoletosService(object):
+    DEFAULT_BATCH_SIZE = 500
+    OUTCOMES = ('good', 'late', 'bad', 'unknown')
 
-    def __init__(self, boleto_service=None, boleto_parser=None, payment_service=None):
+    def __init__(self, boleto_service=None, boleto_parser=None, payment_service=None, batch_size=None):
         self.boleto_service = boleto_service or BoletoPaymentService()
-        self.payment_service = payment_service or PaymentService()
+        self.payment_service = payment_service or container.shared(PaymentService)
         self.boleto_parser = boleto_parser or BoletoFileParser()
+        self.batch_size = batch_size or config.BOLETO_BATCH_SIZE or self.DEFAULT_BATCH_SIZE
+        self.checkpoint = None
 
     def process(self, data):
-        good_payments = []
-        late_payments = []
-        bad_payments = []
-        unknown_payments = []
-
-        for entry in self.boleto_parser.parse(data):
-
-            payment = self.boleto_service.get_by_our_number(entry.get('our_number'))
+        return self.reconcile(self.boleto_parser.parse(data))
+
+    def process_stream(self, source, offset=0, retain=OUTCOMES):
+        result = self.reconcile(self.boleto_parser.stream(source, offset), retain=retain)
+        result['bad_lines'] = self.boleto_parser.bad_lines
+        return result
+
+    def reconcile(self, entries, retain=OUTCOMES):
+        result = { outcome: [] for outcome in self.OUTCOMES }
+        result['counts']  = { outcome: 0 for outcome in self.OUTCOMES }
+        result['batches'] = []
+        result['revenue'] = 0
+
+        entries = iter(entries)
+        while True:
+            batch = list(itertools.islice(entries, self.batch_size))
+            if not batch: break
+
+            started = time.time()
+            outcomes = { outcome: [] for outcome in self.OUTCOMES }
+            notified = self._reconcile_batch(batch, outcomes)
+            result['revenue'] += sum([ case['payment'].amount for case in outcomes['good'] ])
+            self._commit_batch()
+            elapsed = time.time() - started
+
+            # a batch's mails go out as soon as it is committed, so a later failure cannot
+            # leave payers behind a checkpoint that resumed runs will skip
+            for purchase, transition in notified:
+                self.payment_service.on_notified(purchase, transition)
+
+            self.checkpoint = batch[-1].get('next_offset')
+            logger.info('reconciled boleto batch #%d with %d lines in %.3fs, checkpoint=%s', len(result['batches']), len(batch), elapsed, self.checkpoint)
+            result['batches'].append(dict(size=len(batch), elapsed=elapsed, checkpoint=self.checkpoint))
+
+            for outcome, cases in outcomes.items():
+                result['counts'][outcome] += len(cases)
+                if outcome in retain: result[outcome].extend(cases)
+
+        return result
+
+    def _reconcile_batch(self, batch, result):
+        payments = self.boleto_service.get_by_our_numbers([ entry.get('our_number') for entry in batch ])
+        notified = []
+
+        for entry in batch:
+            payment = payments.get(entry.get('our_number'))
             if not payment:
-                unknown_payments.append(entry)
+                result['unknown'].append(entry)
                 continue
 
-            print payment.purchase
+            purchase = payment.purchase
             if entry['payment_date'] > payment.legal_due_date:
-                late_payments.append(dict(entry=entry, payment=payment))
+                result['late'].append(dict(entry=entry, payment=payment))
+                continue
+            if purchase.stale:
+                result['bad'].append(dict(entry=entry, payment=payment, errors='stale-purchase'))
+                continue
+
+            transition = self.boleto_service.notify(purchase, payment, entry, 'script')
+            payment.status = transition.new_status
+            purchase.recalculate_status()
+
+            db.session.add(payment)
+            db.session.add(transition)
+            db.session.add(purchase)
+            notified.append((purchase, transition))
+
+            if transition.errors:
+                result['bad'].append(dict(entry=entry, payment=payment, errors=transition.errors))
             else:
-                purchase, transition = self.payment_service.notify(payment.purchase.id, payment.id, entry, 'script')
+                result['good'].append(dict(entry=entry, payment=payment, purchase=purchase))
 
-                if transition.errors:
-                    bad_payments.append(dict(entry=entry, payment=payment, errors=transition.errors))
-                else:
-                    good_payments.append(dict(entry=entry, payment=payment, purchase=purchase))
+        return notified
 
-        #TODO: MAKE A RESPONSE
-        return {'good': good_payments,
-                'late': late_payments,
-                'bad': bad_payments,
-                'unknown': unknown_payments}
+    def _commit_batch(self):
+        try:
+            db.session.commit()
+        except Exception, e:
+            logger.error('Exception was thrown while committing a boleto batch! %s', e)
+            db.session.rollback()
+            raise e
 
 
 class ClaimCheckDocumentService(object):
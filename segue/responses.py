@@ -1,5 +1,8 @@
-from flask import url_for
+import flask
+from flask import url_for, request
 from segue.json import SimpleJson
+from segue.core import config
+from segue.filters import KeysetPage
 
 
 from flask_sqlalchemy import Model
@@ -7,28 +10,99 @@ from flask_sqlalchemy import Pagination
 
 class Response(object):
 
-    def __init__(self, data, schema):
+    def __init__(self, data, schema, context=None):
         self.data = data
         self.schema = schema
+        self.context = context or {}
 
     def create(self):
         if isinstance(self.data, Model) or isinstance(self.data, dict):
-            result = self.schema().dump(self.data).data
+            result = self.schema(context=self.context).dump(self.data).data
             return {'resource': result}
         elif isinstance(self.data, list):
-            result = self.schema(many=True).dump(self.data).data
+            result = self.schema(many=True, context=self.context).dump(self.data).data
             return {'count': len(result), 'items': result}
         elif isinstance(self.data, Pagination):
-            result = self.schema(many=True).dump(self.data.items).data
+            result = self.schema(many=True, context=self.context).dump(self.data.items).data
             return {
                 'items': result, 
                 'total': self.data.total, 
                 'page':  self.data.page, 
                 'per_page': self.data.per_page
             }
+        elif isinstance(self.data, KeysetPage):
+            result = self.schema(many=True, context=self.context).dump(self.data.items).data
+            return self.keyset_envelope(self.data, result)
         else:
             raise ValueError("Invalid data type")
 
+    @staticmethod
+    def keyset_envelope(page, items):
+        result = {
+            'count': len(items),
+            'items': items,
+            'per_page': page.per_page,
+            'cursor': page.next_cursor,
+            'next': Response.next_link(page.next_cursor)
+        }
+        if page.total is not None: result['total'] = page.total
+        return result
+
+    # the current url with the cursor replaced, keeping the filters of the request
+    @staticmethod
+    def next_link(cursor):
+        if not cursor or not flask.has_request_context() or not request.endpoint: return None
+        args = request.args.to_dict()
+        args.update(request.view_args or {})
+        args['cursor'] = cursor
+        return url_for(request.endpoint, **args)
+
+# rows are dumped one at a time from a yield_per query and written out in chunks, so memory stays
+# bounded by the chunk size; 'json' writes the usual {items, count} envelope, 'ndjson' one row per line
+class StreamingResponse(object):
+    MIMETYPES = dict(json='application/json', ndjson='application/x-ndjson')
+    DEFAULT_CHUNK_SIZE = 500
+
+    # context_for, when given, is called with each chunk of rows and returns the schema context used to
+    # dump them, so data the schema needs besides the rows is loaded once per chunk
+    def __init__(self, query, schema, format='json', chunk_size=None, context_for=None):
+        self.query       = query
+        self.schema      = schema
+        self.format      = format
+        self.chunk_size  = int(chunk_size or config.STREAMING_CHUNK_SIZE or self.DEFAULT_CHUNK_SIZE)
+        self.context_for = context_for
+
+    @classmethod
+    def requested_format(cls):
+        if request.args.get('stream') in cls.MIMETYPES: return request.args['stream']
+        if request.accept_mimetypes.best == cls.MIMETYPES['ndjson']: return 'ndjson'
+        return None
+
+    def create(self):
+        return flask.Response(flask.stream_with_context(self.generate()), mimetype=self.MIMETYPES[self.format])
+
+    def generate(self):
+        separator = '\n' if self.format == 'ndjson' else ','
+        count = 0
+
+        if self.format == 'json': yield '{"items": ['
+        for rows in self.chunks():
+            schema = self.schema(context=self.context_for(rows)) if self.context_for else self.schema()
+            yield (separator if count else '') + separator.join(flask.json.dumps(schema.dump(row).data) for row in rows)
+            count += len(rows)
+
+        if self.format == 'json': yield '], "count": {}}}'.format(count)
+        elif count: yield '\n'
+
+    def chunks(self):
+        chunk = []
+        for row in self.query.yield_per(self.chunk_size):
+            chunk.append(row)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk: yield chunk
+
 class BaseResponse(SimpleJson):
     @classmethod
     def create(cls, list_or_entity, *args, **kw):
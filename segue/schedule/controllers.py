@@ -2,39 +2,39 @@ import flask
 
 from flask import request
 
-from segue.core import config, cache
+from segue.core import config
 from segue.decorators import jsoned, accepts_html
 
 from responses import RoomResponse, SlotResponse, NotificationResponse
 from services import RoomService, SlotService, NotificationService
+from snapshot import ScheduleSnapshot
+
+def snapshot_response(document):
+    body, etag = document
+    response = flask.Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 class RoomController(object):
-    def __init__(self, service=None):
-        self.service = service or RoomService()
+    def __init__(self, service=None, snapshot=None):
+        self.service  = service  or RoomService()
+        self.snapshot = snapshot or ScheduleSnapshot()
 
     @jsoned
     def get_one(self, room_id):
         result = self.service.get_one(room_id) or flask.abort(404)
         return RoomResponse.create(result), 200
 
-    @cache.cached(timeout=60 * 10)
-    @jsoned
     def list_all(self):
-        result = self.service.query()
-        return RoomResponse.create(result), 200
+        return snapshot_response(self.snapshot.rooms())
 
 class SlotController(object):
-    def __init__(self, service=None):
-        self.service = service or SlotService()
+    def __init__(self, service=None, snapshot=None):
+        self.service  = service  or SlotService()
+        self.snapshot = snapshot or ScheduleSnapshot()
 
-    @cache.cached(timeout=60 * 3)
-    @jsoned
     def of_room(self, room_id, day=None):
-        if day:
-            result = self.service.query(room=room_id, day=day)
-        else:
-            result = self.service.query(room=room_id)
-        return SlotResponse.create(result, embeds=True, links=False), 200
+        return snapshot_response(self.snapshot.slots_of(room_id, day))
 
     @jsoned
     def get_one(self, room_id, slot_id):
@@ -26,7 +26,7 @@ class Slot(db.Model):
 
     id          = db.Column(db.Integer, primary_key=True)
     room_id     = db.Column(db.Integer, db.ForeignKey('room.id'))
-    talk_id     = db.Column(db.Integer, db.ForeignKey('proposal.id'))
+    talk_id     = db.Column(db.Integer, db.ForeignKey('proposal.id'), index=True)
     blocked     = db.Column(db.Boolean, default=False)
     begins      = db.Column(db.DateTime)
     duration    = db.Column(db.Integer)
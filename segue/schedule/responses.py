@@ -11,7 +11,7 @@ class RoomResponse(BaseResponse):
            self.add_link('slots', room.slots, 'slots.of_room', room_id=room.id)
 
 class SlotResponse(BaseResponse):
-    def __init__(self, slot, embeds=False, links=True):
+    def __init__(self, slot, embeds=False, links=True, recordings=None, coauthors=None):
         self.id           = slot.id
         self.begins       = slot.begins
         self.hour         = slot.begins.hour
@@ -20,24 +20,24 @@ class SlotResponse(BaseResponse):
         self.room_name    = slot.room.name
         self.status       = slot.status
         self.last_updated = slot.last_updated
-        self.recordings = [ r.url for r in slot.recordings ]
+        self.recordings = [ r.url for r in (slot.recordings if recordings is None else recordings) ]
 
         if embeds:
-            self.talk = TalkShortResponse.create(slot.talk)
+            self.talk = TalkShortResponse.create(slot.talk, coauthors=coauthors)
 
         if links:
             self.add_link('room', slot.room, 'rooms.get_one', room_id=slot.room_id)
             self.add_link('talk', slot.talk, 'talks.get_one', talk_id=slot.talk_id)
 
 class TalkShortResponse(BaseResponse):
-    def __init__(self, talk):
+    def __init__(self, talk, coauthors=None):
         self.id    = talk.id
         self.title = talk.title
         self.owner = talk.owner.name
         self.owner_email = talk.owner.email
         self.track = talk.track.name_pt
         self.last_updated = talk.last_updated
-        self.coauthors = list(set([ x.name for x in talk.coauthors ]))
+        self.coauthors = list(set([ x.name for x in (talk.coauthors if coauthors is None else coauthors) ]))
 
 class NotificationResponse(BaseResponse):
     def __init__(self, notification):
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 
-from segue.core import db
+from segue.core import db, container
 from segue.mailer import MailerService
 from segue.hasher import Hasher
 
@@ -11,6 +11,7 @@ from errors import NoSuchNotification, NotificationExpired, NotificationAlreadyA
                    CannotBeStretched, CannotBeUnstretched, NoSuchSlot, SlotIsEmpty, SlotNotDirty
 from models import Room, Slot, Notification, CallNotification, SlotNotification
 from filters import SlotFilterStrategies
+from snapshot import ScheduleSnapshot
 
 class RoomService(object):
     def get_one(self, room_id):
@@ -24,8 +25,9 @@ class RoomService(object):
         return Room.query.filter(Room.name.ilike(name)).first()
 
 class SlotService(object):
-    def __init__(self, proposals=None):
+    def __init__(self, proposals=None, snapshot=None):
         self.proposals = proposals or ProposalService()
+        self.snapshot  = snapshot  or ScheduleSnapshot()
         self.filters = SlotFilterStrategies()
 
     def by_approximate_timestamp(self, room_id, when, early_max=5, late_max=25):
@@ -52,6 +54,7 @@ class SlotService(object):
         db.session.add(new_slot)
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
     def stretch_slot(self, slot_id):
@@ -66,6 +69,7 @@ class SlotService(object):
         slot.duration += Slot.STEP_SIZE
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
     def query(self, **kw):
@@ -100,6 +104,7 @@ class SlotService(object):
         if annotation: slot.annotation = annotation
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
     def set_status(self, slot_id, new_status):
@@ -108,6 +113,7 @@ class SlotService(object):
 
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
 
         return slot
 
@@ -117,6 +123,7 @@ class SlotService(object):
         slot.status = 'empty'
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
     def set_blocked(self, slot_id, new_value):
@@ -124,6 +131,7 @@ class SlotService(object):
         slot.blocked = new_value
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
     def annotate(self, slot_id, content):
@@ -131,11 +139,12 @@ class SlotService(object):
         slot.annotation = content
         db.session.add(slot)
         db.session.commit()
+        self.snapshot.invalidate()
         return slot
 
 class NotificationService(object):
     def __init__(self, mailer=None, hasher=None, proposals=None, slots=None):
-        self.mailer = mailer or MailerService()
+        self.mailer = mailer or container.shared(MailerService)
         self.hasher = hasher or Hasher()
         self.proposals = proposals or ProposalService()
         self.slots = slots or SlotService()
@@ -211,4 +220,5 @@ class NotificationService(object):
         db.session.add(target)
         db.session.add(notification)
         db.session.commit()
+        if notification.kind == 'slot': self.slots.snapshot.invalidate()
         return notification
@@ -0,0 +1,134 @@
+import time
+import hashlib
+import threading
+from datetime import datetime
+from collections import defaultdict
+
+import flask
+from redis import RedisError, WatchError
+from sqlalchemy.orm import subqueryload
+
+from segue.core import config, logger, redis_connection
+from segue.proposal.models import ProposalInvite
+
+from models import Room, Recording
+from responses import RoomResponse, SlotResponse
+
+class ScheduleSnapshot(object):
+    KEY            = 'schedule:snapshot'
+    GENERATION_KEY = 'schedule:snapshot:generation'
+    EMPTY          = 'empty'
+    DEFAULT_TTL    = 60 * 10
+    FALLBACK_TTL   = 30
+
+    # last documents built while redis was down, shared by every snapshot of this process
+    _fallback      = None
+    _fallback_lock = threading.Lock()
+
+    def __init__(self, redis_conn=None, ttl=None):
+        self.redis = redis_conn or redis_connection()
+        self.ttl   = int(ttl or config.SCHEDULE_SNAPSHOT_TTL or self.DEFAULT_TTL)
+
+    def rooms(self):
+        return self.document('rooms')
+
+    def slots_of(self, room_id, day=None):
+        day = self._normalize_day(day)
+        if day: return self.document('room:{}:{}'.format(room_id, day))
+        return self.document('room:{}'.format(room_id))
+
+    # (body, etag) of a pre-encoded document; rooms or days without slots get the empty listing
+    def document(self, name):
+        try:
+            body, etag, empty, empty_etag = self.redis.hmget(self.KEY, name, 'etag:' + name, self.EMPTY, 'etag:' + self.EMPTY)
+            if empty is not None:
+                return (body, etag) if body is not None else (empty, empty_etag)
+            documents = self.refresh()
+        except RedisError, e:
+            logger.warning("schedule snapshot unavailable, serving it from memory: %s", e)
+            documents = self.fallback()
+        return documents.get(name) or documents[self.EMPTY]
+
+    # while redis is down, the grid is built at most once per FALLBACK_TTL in each process
+    def fallback(self, now=None):
+        now = now or time.time()
+        with self._fallback_lock:
+            cached = ScheduleSnapshot._fallback
+            if cached is None or now - cached[0] >= self.FALLBACK_TTL:
+                cached = ScheduleSnapshot._fallback = (now, self.build())
+            return cached[1]
+
+    # builds and stores the snapshot, unless a slot changed in the meantime; in that case the
+    # fresh documents are still served, but the next read builds them again
+    def refresh(self):
+        with self.redis.pipeline() as pipeline:
+            pipeline.watch(self.GENERATION_KEY)
+            documents = self.build()
+
+            flat = {}
+            for name, (body, etag) in documents.items():
+                flat[name] = body
+                flat['etag:' + name] = etag
+
+            pipeline.multi()
+            pipeline.delete(self.KEY)
+            pipeline.hmset(self.KEY, flat)
+            pipeline.expire(self.KEY, self.ttl)
+            try:
+                pipeline.execute()
+            except WatchError:
+                logger.info("schedule changed while the snapshot was built, not storing it")
+        return documents
+
+    def invalidate(self):
+        ScheduleSnapshot._fallback = None
+        try:
+            with self.redis.pipeline() as pipeline:
+                pipeline.incr(self.GENERATION_KEY)
+                pipeline.delete(self.KEY)
+                pipeline.execute()
+        except RedisError, e:
+            logger.warning("could not invalidate the schedule snapshot: %s", e)
+
+    # the whole grid in four queries: rooms, their slots with talks, owners and tracks, recordings and coauthors
+    def build(self):
+        rooms = Room.query.options(subqueryload('slots').joinedload('talk').joinedload('owner'),
+                                   subqueryload('slots').joinedload('talk').joinedload('track')) \
+                          .order_by(Room.position).all()
+        slots = [ slot for room in rooms for slot in room.slots ]
+
+        recordings = defaultdict(list)
+        for recording in Recording.query.filter(Recording.slot_id.in_([ slot.id for slot in slots ] or [ None ])):
+            recordings[recording.slot_id].append(recording)
+
+        coauthors = defaultdict(list)
+        talk_ids = [ slot.talk_id for slot in slots if slot.talk_id ]
+        for invite in ProposalInvite.query.filter(ProposalInvite.proposal_id.in_(talk_ids or [ None ]), ProposalInvite.status == 'accepted'):
+            coauthors[invite.proposal_id].append(invite)
+
+        documents = { self.EMPTY: self._encode([]), 'rooms': self._encode(RoomResponse.create(rooms)) }
+        for room in rooms:
+            by_day = defaultdict(list)
+            listing = []
+            for slot in sorted(room.slots, key=lambda x: x.begins):
+                response = SlotResponse(slot, embeds=True, links=False,
+                                        recordings=recordings[slot.id], coauthors=coauthors[slot.talk_id])
+                listing.append(response)
+                by_day[slot.begins.date().isoformat()].append(response)
+
+            documents['room:{}'.format(room.id)] = self._encode(listing)
+            for day, day_listing in by_day.items():
+                documents['room:{}:{}'.format(room.id, day)] = self._encode(day_listing)
+        return documents
+
+    def _encode(self, items):
+        body = flask.json.dumps(dict(count=len(items), items=items))
+        return body, hashlib.sha1(body).hexdigest()
+
+    # same rules as SlotFilterStrategies.by_day: a day that does not parse does not filter
+    def _normalize_day(self, day):
+        if not day: return None
+        try:
+            return datetime.strptime(day, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            return None
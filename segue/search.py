@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from unidecode import unidecode
+from sqlalchemy import or_, case, func
+
+from segue.core import db
+
+def normalize(*values):
+    words = []
+    for value in values:
+        if not value: continue
+        if not isinstance(value, unicode): value = value.decode('utf-8')
+        words.extend(unidecode(value).lower().split())
+    return ' '.join(words)
+
+class TextSearch(object):
+    def __init__(self, column):
+        self.column = column
+
+    @property
+    def fuzzy(self):
+        # trigram similarity (pg_trgm) is only available on postgres
+        return db.engine.dialect.name == 'postgresql'
+
+    def matches(self, needle):
+        term = normalize(needle)
+        criterium = self.column.like('%' + term.replace(' ', '%') + '%')
+        if self.fuzzy:
+            criterium = or_(criterium, self.column.op('%%')(term))
+        return criterium
+
+    def ranking(self, needle):
+        term = normalize(needle)
+        ranking = [ case([ (self.column.like(term + '%'), 0), (self.column.like('% ' + term + '%'), 1) ], else_=2) ]
+        if self.fuzzy:
+            ranking.append(func.similarity(self.column, term).desc())
+        return ranking
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+
+from flask import json
+
+from segue.core import db
+from segue.responses import StreamingResponse
+from segue.account.services import AccountService
+from segue.account.identifiers import IdentifierResolver
+from segue.admin.controllers.schemas import AccountDetail
+
+from ..support.factories import *
+from ..support import SegueApiTestCase
+
+class IdentifierResolverTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(IdentifierResolverTestCases, self).setUp()
+        self.resolver = IdentifierResolver()
+
+    def _purchase(self, account, status, days=10):
+        return self.create(ValidPurchaseFactory, customer=account, status=status, due_date=date.today() + timedelta(days=days))
+
+    def _accounts(self):
+        satisfied = self.create(ValidAccountFactory)
+        self._purchase(satisfied, 'confirmed')
+        self._purchase(satisfied, 'paid', days=-10)
+        self._purchase(satisfied, 'pending')
+
+        payable = self.create(ValidAccountFactory)
+        self._purchase(payable, 'pending')
+        self._purchase(payable, 'pending', days=-1)
+        self._purchase(payable, 'cancelled')
+
+        expired = self.create(ValidAccountFactory)
+        self._purchase(expired, 'stale')
+        self._purchase(expired, 'pending', days=0)
+
+        nothing = self.create(ValidAccountFactory)
+        return [ satisfied, payable, expired, nothing ]
+
+    def test_resolves_the_same_identifiers_as_the_accounts(self):
+        accounts = self._accounts()
+
+        result = self.resolver.resolve(accounts)
+
+        for account in accounts:
+            self.assertEquals(result[account.id].purchase, account.identifier_purchase)
+            self.assertEquals(result[account.id].has_valid_purchases, account.has_valid_purchases)
+
+    def test_listing_costs_a_constant_number_of_queries(self):
+        self._accounts()
+        db.session.expunge_all()
+
+        with self.app.test_request_context('/'), self.count_queries() as statements:
+            accounts = AccountService().lookup_page(criteria={}).items
+            identifiers = self.resolver.resolve(accounts)
+            result = AccountDetail(many=True, context=dict(identifiers=identifiers)).dump(accounts).data
+
+        self.assertEquals([ x.get('identifier', {}).get('status') for x in result ], [ 'paid', 'pending', 'pending', None ])
+        self.assertEquals([ x['has_valid_purchases'] for x in result ], [ True, False, False, False ])
+        self.assertEquals(len(statements), 3)
+
+    def test_streamed_listing_resolves_identifiers_per_chunk(self):
+        accounts = self._accounts()
+        expected = self.resolver.resolve(accounts)
+        db.session.expunge_all()
+
+        context_for = lambda rows: dict(identifiers=self.resolver.resolve(rows))
+        with self.app.test_request_context('/'), self.count_queries() as statements:
+            response = StreamingResponse(AccountService().lookup_query({}), AccountDetail, 'ndjson', chunk_size=2, context_for=context_for).create()
+            result = [ json.loads(line) for line in ''.join(response.response).splitlines() ]
+
+        self.assertEquals([ x['id'] for x in result ], [ x.id for x in accounts ])
+        self.assertEquals([ x['has_valid_purchases'] for x in result ], [ expected[x.id].has_valid_purchases for x in accounts ])
+        self.assertEquals([ x.get('identifier', {}).get('status') for x in result ], [ 'paid', 'pending', 'pending', None ])
+        self.assertEquals(len([ x for x in statements if x.startswith('SELECT purchase.') ]), 2)
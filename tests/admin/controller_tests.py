@@ -180,3 +180,15 @@ class AdminControllerFunctionalTestCases(SegueApiTestCase):
 
             self.assertEquals(response.status_code, 200)
             self.assertEquals(item['track']['id'], ctx.track2.id)
+
+    def test_listings_page_by_offset_unless_a_cursor_is_given(self):
+        self.setUpData()
+
+        with self.admin_user():
+            offset = json.loads(self.jget('/admin/caravans').data)
+            keyset = json.loads(self.jget('/admin/caravans', query_string={'cursor': ''}).data)
+
+        self.assertEquals((offset['page'], offset['total']), (1, 1))
+        self.assertEquals(len(offset['items']), 1)
+        self.assertEquals(keyset['count'], 1)
+        self.assertNotIn('page', keyset)
@@ -0,0 +1,207 @@
+import fnmatch
+from redis import ConnectionError
+
+from support import SegueApiTestCase
+
+from segue.core import cache
+from segue.cache import LocalCache, TieredCache, HitCounter
+
+# the commands the tiered cache uses, kept in memory; once down every command fails like redis would
+class FakeRedis(object):
+    def __init__(self):
+        self.values = {}
+        self.sets   = {}
+        self.ttls   = {}
+        self.down   = False
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self._check()
+        self.values[key] = value
+
+    def setex(self, key, value, timeout):
+        self.set(key, value)
+
+    def exists(self, key):
+        self._check()
+        return key in self.values or key in self.sets
+
+    def delete(self, *keys):
+        self._check()
+        found = [ key for key in keys if self.values.pop(key, None) is not None or self.sets.pop(key, None) is not None ]
+        return len(found)
+
+    def sadd(self, key, *members):
+        self._check()
+        self.sets.setdefault(key, set()).update(members)
+
+    def expire(self, key, timeout):
+        self._check()
+        self.ttls[key] = timeout
+
+    def persist(self, key):
+        self._check()
+        self.ttls.pop(key, None)
+
+    # like redis.Redis, None for a key that is missing or never expires
+    def ttl(self, key):
+        self._check()
+        return self.ttls.get(key)
+
+    def sunion(self, *keys):
+        self._check()
+        return set().union(*[ self.sets.get(key, set()) for key in keys ])
+
+    def scan_iter(self, pattern):
+        self._check()
+        return [ key for key in self.values.keys() + self.sets.keys() if fnmatch.fnmatch(key, pattern) ]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _check(self):
+        if self.down: raise ConnectionError('redis is down')
+
+class FakePipeline(object):
+    def __init__(self, redis):
+        self.redis, self.calls = redis, []
+
+    def __enter__(self): return self
+    def __exit__(self, *args): pass
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [ getattr(self.redis, name)(*args) for name, args in self.calls ]
+
+class LocalCacheTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(LocalCacheTestCases, self).setUp()
+        self.counter = HitCounter()
+        self.cache   = LocalCache(max_entries=2, counter=self.counter)
+
+    def test_evicts_the_least_recently_used_entry(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEquals(self.cache.get('a'), 1)
+        self.assertEquals(self.cache.get('b'), None)
+        self.assertEquals(self.cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        self.cache.set('a', 1, timeout=-1)
+        self.assertEquals(self.cache.get('a'), None)
+        self.assertFalse(self.cache.has('a'))
+
+    def test_invalidates_entries_by_tag(self):
+        self.cache.set('a', 1, tags=['tournament:1'])
+        self.cache.set('b', 2, tags=['tournament:2'])
+
+        self.cache.invalidate_tag('tournament:1')
+
+        self.assertEquals(self.cache.get('a'), None)
+        self.assertEquals(self.cache.get('b'), 2)
+
+    def test_tags_are_forgotten_with_their_entries(self):
+        self.cache.set('a', 1, tags=['tournament:1', 'room:1'])
+        self.cache.set('b', 2, tags=['tournament:1'])
+        self.cache.set('c', 3, tags=['tournament:2'])
+        self.cache.delete('b')
+        self.cache.set('d', 4, timeout=-1, tags=['room:2'])
+        self.cache.get('d')
+
+        self.assertEquals(dict(self.cache._tags), { 'tournament:2': set(['c']) })
+
+        self.cache.invalidate_tag('tournament:2')
+        self.assertEquals(dict(self.cache._tags), {})
+
+    def test_counts_hits_and_misses_per_endpoint(self):
+        self.cache.set('a', 1)
+        with self.app.test_request_context('/rooms'):
+            self.cache.get('a')
+            self.cache.get('a')
+            self.cache.get('b')
+        self.cache.get('b')
+
+        stats = self.counter.stats()
+        self.assertEquals(stats['offline'], dict(hits=0, misses=1, hit_rate=0.0))
+        self.assertEquals(stats['rooms.list_all']['hits'], 2)
+        self.assertEquals(stats['rooms.list_all']['misses'], 1)
+
+class TieredCacheTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(TieredCacheTestCases, self).setUp()
+        self.redis  = FakeRedis()
+        self.cache  = self._worker()
+        self.other  = self._worker()
+
+    def _worker(self):
+        return TieredCache(self.redis, LocalCache(max_entries=10, default_timeout=5))
+
+    def test_values_round_trip_through_redis(self):
+        self.cache.set('progress', { 'done': [1, 2] }, tags=['tournament:1'])
+
+        self.assertIn('cache:progress', self.redis.values)
+        self.assertEquals(self.other.get('progress'), { 'done': [1, 2] })
+        self.assertTrue(self.other.local.has('progress'))
+        self.assertEquals(self.other.get('missing'), None)
+
+    def test_tag_invalidation_reaches_both_tiers(self):
+        self.cache.set('progress', 42, tags=['tournament:1'])
+        self.cache.set('ranking', 7, tags=['tournament:2'])
+        self.other.get('progress')
+
+        self.other.invalidate_tag('tournament:1')
+
+        self.assertFalse(self.other.local.has('progress'))
+        self.assertNotIn('cache:progress', self.redis.values)
+        self.assertNotIn('cache:tag:tournament:1', self.redis.sets)
+        self.cache.local.clear()
+        self.assertEquals(self.cache.get('progress'), None)
+        self.assertEquals(self.cache.get('ranking'), 7)
+
+    def test_tag_sets_outlive_their_longest_entry(self):
+        self.cache.set('ranking', 1, timeout=300, tags=['tournament:1'])
+        self.cache.set('progress', 2, timeout=10, tags=['tournament:1'])
+        self.assertEquals(self.redis.ttls['cache:tag:tournament:1'], 300)
+
+        self.cache.set('final', 3, timeout=600, tags=['tournament:1'])
+        self.assertEquals(self.redis.ttls['cache:tag:tournament:1'], 600)
+
+        self.cache.set('champion', 4, timeout=0, tags=['tournament:1'])
+        self.cache.set('score', 5, timeout=10, tags=['tournament:1'])
+        self.assertNotIn('cache:tag:tournament:1', self.redis.ttls)
+
+        self.cache.invalidate_tag('tournament:1')
+        self.assertEquals(self.redis.values, {})
+
+    def test_falls_back_to_the_local_tier_when_redis_is_down(self):
+        self.cache.set('progress', 42, tags=['tournament:1'])
+        self.redis.down = True
+
+        self.assertEquals(self.cache.get('progress'), 42)
+        self.assertEquals(self.other.get('progress'), None)
+        self.assertFalse(self.cache.set('ranking', 7))
+        self.assertEquals(self.cache.get('ranking'), 7)
+        self.assertFalse(self.other.has('ranking'))
+        self.assertFalse(self.cache.delete('ranking'))
+
+        self.cache.invalidate_tag('tournament:1')
+        self.assertEquals(self.cache.get('progress'), None)
+        self.assertFalse(self.cache.clear())
+
+class ApplicationCacheTestCases(SegueApiTestCase):
+    def test_is_configurable_and_supports_tags(self):
+        self.assertIsInstance(cache.cache, LocalCache)
+
+        cache.set('progress', 42, tags=['tournament:1'])
+        self.assertEquals(cache.get('progress'), 42)
+
+        cache.invalidate('tournament:1')
+        self.assertEquals(cache.get('progress'), None)
@@ -0,0 +1,114 @@
+import os
+
+from testfixtures import TempDirectory
+
+from segue.core import db
+from segue.certificate.models import Certificate
+from segue.certificate.bulk import BulkCertificateIssuer, IssuingCheckpoint
+from segue.certificate.eligibility import CertificateEligibility
+
+from ..support.factories import *
+from ..support import SegueApiTestCase
+
+class FakeDocuments(object):
+    def __init__(self, broken=()):
+        self.broken   = broken
+        self.rendered = []
+
+    def svgs_to_pdf(self, documents):
+        result = []
+        for template, kind, hash_code, variables in documents:
+            file_name = "{}-{}.pdf".format(kind, hash_code)
+            if variables['NOME'] in self.broken:
+                result.append((None, file_name, Exception('broken')))
+            else:
+                self.rendered.append((template, variables))
+                result.append(('/tmp/' + file_name, file_name, None))
+        return result
+
+class BulkCertificateIssuerTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(BulkCertificateIssuerTestCases, self).setUp()
+        self.tmp_dir    = TempDirectory()
+        self.documents  = FakeDocuments(broken=('Quebrado',))
+        self.checkpoint = IssuingCheckpoint(path=os.path.join(self.tmp_dir.path, 'checkpoint'))
+        self.service    = BulkCertificateIssuer(documents=self.documents, checkpoint=self.checkpoint, chunk_size=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        super(BulkCertificateIssuerTestCases, self).tearDown()
+
+    def _attendant(self, **kw):
+        account = self.create(ValidAccountFactory, **kw)
+        self.create(ValidPurchaseFactory, customer=account, status='paid')
+        return account
+
+    def test_eligibility_matches_the_account_rules(self):
+        speaker  = self._attendant(certificate_name='Palestrante')
+        talk     = self.create(ValidProposalFactory, status='confirmed', owner=speaker)
+        idle     = self.create(ValidProposalFactory, status='confirmed', owner=speaker)
+        slot     = self.create(ValidSlotFactory, talk=talk, status='confirmed')
+        pending  = self.create(ValidPurchaseFactory, customer=self.create(ValidAccountFactory))
+
+        result = CertificateEligibility().issuable(speaker.id, pending.customer.id)
+
+        self.assertEquals([ (x.account_id, x.kind, x.talk_id) for x in result ], [ (speaker.id, 'speaker', talk.id), (speaker.id, 'attendant', None) ])
+
+    def test_coauthors_are_the_accounts_that_accepted_the_invite(self):
+        owner    = self._attendant()
+        coauthor = self._attendant(email='coautor@example.com')
+        stranger = self._attendant(email='convidado@example.com')
+        talk     = self.create(ValidProposalFactory, status='confirmed', owner=owner)
+        self.create(ValidSlotFactory, talk=talk, status='confirmed')
+        self.create(ValidInviteFactory, proposal=talk, recipient='outro@example.com', account=coauthor, status='accepted')
+        self.create(ValidInviteFactory, proposal=talk, recipient=stranger.email, status='accepted')
+
+        result = CertificateEligibility().speaker_candidates(owner.id, stranger.id)
+
+        self.assertEquals(sorted((x.account_id, x.talk_id) for x in result), [ (owner.id, talk.id), (coauthor.id, talk.id) ])
+        self.assertEquals(sorted(x.id for x in coauthor.presented_talks), [ talk.id ])
+
+    def test_issues_certificates_in_chunks_and_records_the_checkpoint(self):
+        accounts = [ self._attendant(certificate_name=name) for name in ('Ana', 'Bruno', 'Quebrado', 'Carla') ]
+        nameless = self._attendant()
+
+        result = self.service.run(accounts[0].id, nameless.id)
+
+        self.assertEquals(result['chunks'], 3)
+        self.assertEquals(result['candidates'], 5)
+        self.assertEquals(result['issued'], 3)
+        self.assertEquals(result['skipped'], 1)
+        self.assertEquals([ candidate.account_id for candidate, error in result['failed'] ], [ accounts[2].id ])
+        self.assertEquals(self.checkpoint.load(), nameless.id)
+
+        issued = Certificate.query.order_by(Certificate.account_id).all()
+        self.assertEquals([ x.name for x in issued ], [ 'Ana', 'Bruno', 'Carla' ])
+        self.assertEquals(set(x.kind for x in issued), set([ 'attendant' ]))
+        self.assertEquals(len(self.documents.rendered), 3)
+
+    def test_speaker_certificates_carry_the_talk_title(self):
+        speaker = self._attendant(certificate_name='Palestrante')
+        broken  = self._attendant(certificate_name='Quebrado')
+        talk    = self.create(ValidProposalFactory, status='confirmed', owner=speaker, title='Segue em Python')
+        other   = self.create(ValidProposalFactory, status='confirmed', owner=broken)
+        self.create(ValidSlotFactory, talk=talk, status='confirmed')
+        self.create(ValidSlotFactory, talk=other, status='confirmed')
+
+        result = self.service.run(speaker.id, broken.id)
+
+        self.assertEquals(result['issued'], 2)
+        self.assertIn(('certificate/templates/speaker-pt.svg', dict(NOME='Palestrante', URL=self._url_of(speaker, 'speaker'), PALESTRA='Segue em Python')), self.documents.rendered)
+        issued = Certificate.query.filter(Certificate.kind == 'speaker').all()
+        self.assertEquals([ (x.account_id, x.talk_id) for x in issued ], [ (speaker.id, talk.id) ])
+
+    def _url_of(self, account, kind):
+        return Certificate.query.filter(Certificate.account_id == account.id, Certificate.kind == kind).one().url
+
+    def test_rerunning_does_not_reissue_certificates(self):
+        account = self._attendant(certificate_name='Ana')
+
+        self.service.run(account.id, account.id)
+        result = self.service.run(account.id, account.id)
+
+        self.assertEquals(result['candidates'], 0)
+        self.assertEquals(Certificate.query.count(), 1)
@@ -175,3 +175,29 @@ class CertificateServiceTestCases(SegueApiTestCase):
         self.assertEquals(result, [])
 
 
+
+    def test_issuable_certificates_for_a_range_match_each_account(self):
+        ctx = self.setUpSpeakerScenario()
+        attendant = self.create(ValidAccountFactory)
+        self.create(ValidPurchaseFactory, customer=attendant, status='paid')
+
+        first, last = ctx.account.id, attendant.id
+
+        with self.count_queries() as statements:
+            result = self.service.issuable_certificates_between(first, last)
+
+        self.assertLessEqual(len(statements), 5)
+        self.assertEquals(result.keys(), [ first, last ])
+        for account in [ ctx.account, attendant ]:
+            expected = self.service.issuable_certificates_for(account)
+            self.assertEquals([ (x.kind, x.ticket, getattr(x, 'talk', None)) for x in result[account.id] ],
+                              [ (x.kind, x.ticket, getattr(x, 'talk', None)) for x in expected ])
+
+    def test_issuing_twice_is_refused(self):
+        account = self.create(ValidAccountFactory, certificate_name='Asdrobalgilo')
+        purchase = self.create(ValidPurchaseFactory, customer=account, status='paid')
+
+        self.service.issue_certificate(account, purchase.id, 'attendant', language='pt')
+
+        with self.assertRaises(CertificateAlreadyIssued):
+            self.service.issue_certificate(account, purchase.id, 'attendant', language='pt')
@@ -0,0 +1,35 @@
+import mockito
+
+from segue.core import container
+from segue.mailer import MailerService
+from segue.account.services import AccountService
+from segue.purchase.services import PurchaseService, ProcessBoletosService
+
+from support import SegueApiTestCase
+
+class ContainerTestCases(SegueApiTestCase):
+    def test_shared_services_are_built_once_and_reused_as_dependencies(self):
+        accounts = container.shared(AccountService)
+
+        self.assertIs(container.shared(AccountService), accounts)
+        self.assertIs(container.shared(PurchaseService).mailer, accounts.mailer)
+        self.assertIs(container.shared(MailerService), accounts.mailer)
+
+    def test_overrides_bypass_the_container(self):
+        mailer = mockito.Mock()
+        service = AccountService(mailer=mailer)
+
+        self.assertIs(service.mailer, mailer)
+        self.assertIsNot(container.shared(AccountService), service)
+
+    def test_scoped_services_live_for_a_single_app_context(self):
+        first = container.scoped(ProcessBoletosService)
+        self.assertIs(container.scoped(ProcessBoletosService), first)
+
+        with self.app.app_context():
+            self.assertIsNot(container.scoped(ProcessBoletosService), first)
+
+    def test_reset_drops_the_shared_graph(self):
+        accounts = container.shared(AccountService)
+        container.reset()
+        self.assertIsNot(container.shared(AccountService), accounts)
@@ -1,11 +1,16 @@
 import os
+import time
+import json
+import errno
 import mockito
 
 from unittest import skipIf
 from testfixtures import TempDirectory
 
 from segue.document.services import DocumentService
-from segue.document.errors import DocumentNotFound
+from segue.document.renderers import RendererPool
+from segue.document.cache import RenderCache
+from segue.document.errors import DocumentNotFound, DocumentGenerationFailed, DocumentGenerationTimedOut
 
 from ..support import SegueApiTestCase
 
@@ -53,10 +58,133 @@ class DocumentServiceWriterTestCases(SegueApiTestCase):
     def test_svg_to_pdf(self):
         result = self.service.svg_to_pdf('templates/dummy.svg', 'certificate', "ABCD", { 'XONGA': 'bir<osca' })
 
-        self.tmp_dir.check_dir('','certificate-ABCD.svg', 'output')
+        self.tmp_dir.check_dir('', 'output')
         self.tmp_dir.check_dir('output/certificate/AB', 'certificate-ABCD.pdf')
 
-        contents_of_temp = self.tmp_dir.read("certificate-ABCD.svg")
-        self.assertIn("bir&lt;osca da silva", contents_of_temp)
-
         self.assertEquals(result, 'certificate-ABCD.pdf')
+
+class FakeRenderer(object):
+    def render(self, svg_path, pdf_path, timeout):
+        if 'BROKEN' in svg_path: raise DocumentGenerationTimedOut()
+        if 'STUCK' in svg_path: time.sleep(timeout * 3)
+        if 'DEAD' in svg_path: raise SystemExit()
+        with open(pdf_path, 'w') as output:
+            output.write(open(svg_path).read())
+
+    def stop(self):
+        pass
+
+class DocumentServiceBatchTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(DocumentServiceBatchTestCases, self).setUp()
+        self.tmp_dir   = TempDirectory()
+        self.out_dir   = self.tmp_dir.makedir("output")
+        self.templates = os.path.join(os.path.dirname(__file__), 'fixtures')
+        self.pool      = RendererPool(backend=FakeRenderer, size=3)
+
+        self.service = DocumentService(override_root=self.out_dir, template_root=self.templates, tmp_dir=self.tmp_dir.path, renderer=self.pool)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        self.tmp_dir.cleanup()
+
+    def test_batch_renders_every_document_and_reports_failures_in_order(self):
+        documents = [ ('templates/dummy.svg', 'certificate', code, { 'XONGA': code }) for code in ['AB01', 'BROKEN', 'CD02'] ]
+
+        result = self.service.svgs_to_pdf(documents)
+
+        self.assertEquals([ file_name for path, file_name, error in result ], [ 'certificate-AB01.pdf', 'certificate-BROKEN.pdf', 'certificate-CD02.pdf' ])
+        self.assertIsNone(result[0][2])
+        self.assertIsInstance(result[1][2], DocumentGenerationTimedOut)
+        self.assertIn('CD02', open(result[2][0]).read())
+
+        metrics = self.pool.metrics()
+        self.assertEquals((metrics['rendered'], metrics['failed'], metrics['timeouts']), (2, 1, 1))
+        self.assertEquals(metrics['workers'], 3)
+
+    def test_rendered_svgs_are_escaped_and_removed_afterwards(self):
+        path, _ = self.service.svg_to_pdf('templates/dummy.svg', 'certificate', 'AB01', { 'XONGA': 'bir<osca' })
+        self.service.svgs_to_pdf([ ('templates/dummy.svg', 'certificate', code, {}) for code in ['CD02', 'BROKEN'] ])
+
+        self.assertIn("bir&lt;osca da silva", open(path).read())
+        self.assertEquals([ name for name in os.listdir(self.tmp_dir.path) if name.endswith('.svg') ], [])
+
+    def test_waiting_gives_up_on_a_stuck_render(self):
+        pool = RendererPool(backend=FakeRenderer, size=1, timeout=0.1)
+
+        with self.assertRaises(DocumentGenerationTimedOut):
+            pool.render(self.tmp_dir.write('STUCK.svg', 'x'), os.path.join(self.tmp_dir.path, 'STUCK.pdf'))
+
+    def test_dead_workers_are_replaced(self):
+        pool = RendererPool(backend=FakeRenderer, size=1, timeout=0.1)
+
+        with self.assertRaises(DocumentGenerationTimedOut):
+            pool.render(self.tmp_dir.write('DEAD.svg', 'x'), os.path.join(self.tmp_dir.path, 'DEAD.pdf'))
+        result = pool.render(self.tmp_dir.write('alive.svg', 'x'), os.path.join(self.tmp_dir.path, 'alive.pdf'))
+
+        self.assertEquals(open(result).read(), 'x')
+        pool.shutdown()
+
+    def test_forked_pool_starts_its_own_workers(self):
+        inherited = self.pool.jobs
+        self.pool.pid = -1
+
+        result = self.pool.render(self.tmp_dir.write('child.svg', 'x'), os.path.join(self.tmp_dir.path, 'child.pdf'))
+
+        self.assertEquals(open(result).read(), 'x')
+        self.assertIsNot(self.pool.jobs, inherited)
+        self.assertEquals(self.pool.pid, os.getpid())
+
+    def test_single_render_raises_on_failure(self):
+        with self.assertRaises(DocumentGenerationFailed):
+            self.service.svg_to_pdf('templates/dummy.svg', 'certificate', 'BROKEN', {})
+
+    def test_identical_documents_are_served_from_the_render_cache(self):
+        first,  _ = self.service.svg_to_pdf('templates/dummy.svg', 'certificate', 'AB01', { 'XONGA': 'fulano' })
+        second, _ = self.service.svg_to_pdf('templates/dummy.svg', 'certificate', 'CD02', { 'XONGA': u'fulano' })
+        self.service.svg_to_pdf('templates/dummy.svg', 'certificate', 'EF03', { 'XONGA': 'ciclano' })
+
+        self.assertEquals(self.pool.metrics()['rendered'], 2)
+        self.assertTrue(os.path.samefile(first, second))
+
+        stats = self.service.cache.stats()
+        self.assertEquals((stats['hits'], stats['misses'], stats['entries']), (1, 2, 2))
+
+    def test_render_cache_evicts_least_recently_used_entries(self):
+        cache = RenderCache(root=os.path.join(self.tmp_dir.path, 'cache'), max_bytes=15)
+        for index, key in enumerate([ 'aa01', 'bb02', 'cc03' ]):
+            path = self.tmp_dir.write('doc-{}.pdf'.format(index), '0123456789'[:5 + index])
+            cache.store(key, path)
+            os.utime(cache.path_for(key), (index, index))
+
+        self.assertFalse(os.path.exists(cache.path_for('aa01')))
+        self.assertTrue(os.path.exists(cache.path_for('cc03')))
+        self.assertEquals((cache.stats()['size'], cache.stats()['entries']), (13, 2))
+
+    def test_render_cache_entries_evicted_while_fetched_are_misses(self):
+        cache = RenderCache(root=os.path.join(self.tmp_dir.path, 'cache'))
+        cache.store('aa01', self.tmp_dir.write('doc.pdf', '01234'))
+        def evicted(source, destination):
+            os.unlink(source)
+            raise OSError(errno.ENOENT, 'gone')
+        cache._link = evicted
+
+        self.assertFalse(cache.fetch('aa01', os.path.join(self.tmp_dir.path, 'out.pdf')))
+        self.assertEquals((cache.stats()['hits'], cache.stats()['misses']), (0, 1))
+
+    def test_render_cache_keeps_running_totals(self):
+        root  = os.path.join(self.tmp_dir.path, 'cache')
+        cache = RenderCache(root=root, max_bytes=100)
+        cache.store('aa01', self.tmp_dir.write('doc-a.pdf', '01234'))
+        cache.store('aa01', self.tmp_dir.write('doc-b.pdf', '01234'))
+        cache.store('bb02', self.tmp_dir.write('doc-c.pdf', '012'))
+        for index in range(3): cache.fetch('aa01', os.path.join(self.tmp_dir.path, 'out-{}.pdf'.format(index)))
+        cache.fetch('cc03', os.path.join(self.tmp_dir.path, 'out.pdf'))
+
+        stats = cache.stats()
+        self.assertEquals((stats['hits'], stats['misses'], stats['entries'], stats['size']), (3, 1, 2, 8))
+        self.assertEquals(json.load(open(os.path.join(root, 'aa', 'aa01.json')))['size'], 5)
+
+        os.unlink(os.path.join(root, 'totals.json'))
+        self.assertEquals(RenderCache(root=root).stats()['size'], 8)
+
@@ -1,6 +1,12 @@
+# -*- coding: utf-8 -*-
+import segue.core
+import mockito
+from datetime import datetime, timedelta
 from segue.errors import SegueValidationError
 
-from segue.frontdesk.services import PeopleService
+from segue.frontdesk.services import PeopleService, BadgeService
+from segue.frontdesk.models import Badge
+from segue.frontdesk.responses import PersonResponse
 
 from ..support import SegueApiTestCase
 from ..support.factories import *
@@ -26,3 +32,96 @@ class PeopleServiceTestCases(SegueApiTestCase):
             result = self.service.patch(purchase.id, name='', by_user=purchase.customer)
             self.assertEqual(result.name, 'fulano novo')
 
+    def _create_people(self, how_many):
+        purchases = []
+        for _ in range(how_many):
+            purchase = self.create(ValidPurchaseByPersonFactory)
+            self.create(ValidPromoCodeFactory, creator=purchase.customer)
+            self.create(ValidPurchaseFactory, customer=purchase.customer)
+            segue.core.db.session.add(Badge(person=purchase, name='old', created=datetime.now()))
+            segue.core.db.session.add(Badge(person=purchase, name='new', created=datetime.now() + timedelta(minutes=1)))
+            segue.core.db.session.commit()
+            purchases.append(purchase)
+        return purchases
+
+    def _responses_of(self, first, last):
+        segue.core.db.session.expunge_all()
+        with self.app.test_request_context('/'), self.count_queries() as statements:
+            result = PersonResponse.create(self.service.by_range(first, last), links=True, embeds=True)
+        return result, statements
+
+    def test_building_people_costs_a_bounded_number_of_queries(self):
+        purchases = self._create_people(6)
+        self.create(ValidPaymentFactory, purchase=purchases[0], status='paid')
+        first, last = purchases[0].id, purchases[-1].id
+
+        single, single_statements = self._responses_of(first, first)
+        result, statements = self._responses_of(first, last)
+
+        self.assertEquals(len(result), 11)
+        self.assertEquals(len(result[0].payments), 1)
+        self.assertEquals(len(statements), len(single_statements))
+        self.assertLessEqual(len(statements), 6)
+
+    def test_preloaded_people_match_lazily_built_ones(self):
+        purchase = self._create_people(1)[0]
+
+        person = self.service.lookup(purchase.customer.name)[0]
+
+        self.assertEquals(person.has_promocode, True)
+        self.assertEquals(person.related_count, 1)
+        self.assertEquals(person.last_badge.name, 'new')
+        self.assertEquals(person.donation_promocodes, [])
+
+    def test_lookup_ignores_accents_and_ranks_prefix_matches_first(self):
+        maria = self.create(ValidAccountFactory, name=u'Maria da Conceição')
+        other = self.create(ValidAccountFactory, name=u'Conceição Ribeiro')
+        p1 = self.create(ValidPurchaseFactory, customer=maria)
+        p2 = self.create(ValidPurchaseFactory, customer=other)
+
+        result = self.service.lookup('conceicao')
+
+        self.assertEquals([ person.id for person in result ], [ p2.id, p1.id ])
+
+    def test_lookup_follows_account_changes(self):
+        purchase = self.create(ValidPurchaseFactory)
+
+        self.service.patch(purchase.id, name=u'Sebastião Peçanha', by_user=purchase.customer)
+
+        self.assertEquals(purchase.customer.search_text.split(' ')[0:2], ['sebastiao', 'pecanha'])
+        self.assertEquals(len(self.service.lookup(u'peçanha')), 1)
+
+class BadgeServiceTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(BadgeServiceTestCases, self).setUp()
+        self.printer = mockito.Mock()
+        self.service = BadgeService(printers={ 'p1': self.printer })
+        self.people  = PeopleService()
+
+    def test_print_badges_enqueues_once_and_stores_every_badge(self):
+        purchases = [ self.create(ValidPurchaseFactory, status='paid') for _ in range(3) ]
+        people = self.people.by_range(purchases[0].id, purchases[-1].id)
+        jobs = [ mockito.Mock() for _ in purchases ]
+        for index, job in enumerate(jobs): job.id = 'job-{}'.format(index)
+        mockito.when(self.printer).print_badges(mockito.any()).thenReturn(jobs)
+
+        badges = self.service.print_badges('p1', people)
+
+        mockito.verify(self.printer, times=1).print_badges(mockito.any())
+        self.assertEquals(sorted(badge.job_id for badge in Badge.query.all()), [ 'job-0', 'job-1', 'job-2' ])
+        self.assertEquals([ badge.person.id for badge in badges ], [ purchase.id for purchase in purchases ])
+
+
+    def test_report_results_updates_every_matching_badge_in_one_go(self):
+        purchase = self.create(ValidPurchaseFactory, status='paid')
+        for index in range(5):
+            segue.core.db.session.add(Badge(person=purchase, job_id='job-{}'.format(index), result='success' if index == 0 else None))
+        segue.core.db.session.commit()
+
+        updated = self.service.report_results([ 'job-0', 'job-1', 'job-2', 'unknown' ], 'success', chunk_size=2)
+
+        self.assertEquals(updated, 2)
+        results = dict((badge.job_id, badge.result) for badge in Badge.query.all())
+        self.assertEquals(results, { 'job-0': 'success', 'job-1': 'success', 'job-2': 'success', 'job-3': None, 'job-4': None })
+        self.assertTrue(self.service.report_failure('job-3'))
+        self.assertFalse(self.service.report_failure('job-3'))
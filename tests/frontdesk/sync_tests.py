@@ -0,0 +1,153 @@
+import unittest
+import mockito
+from collections import defaultdict
+from redis import StrictRedis
+
+from segue.frontdesk.sync import BadgeStatusSync
+
+# rq only accepts redis clients, so the commands used by the sync are overridden in memory
+class FakeRedis(StrictRedis):
+    def __init__(self):
+        self.values = {}
+        self.lists  = defaultdict(list)
+        self.zsets  = defaultdict(dict)
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = str(value)
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        entries = sorted((score, member) for member, score in self.zsets[key].items() if score >= float(low))
+        return [ (member, score) for score, member in entries ]
+
+    def blpop(self, key, timeout):
+        if not self.lists[key]: return None
+        return (key, self.lists[key].pop(0))
+
+    def lrange(self, key, start, end):
+        return self.lists[key][start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists[key][start:]
+
+    def llen(self, key):
+        return len(self.lists[key])
+
+    def rpush(self, key, *values):
+        self.lists[key].extend(values)
+
+    def delete(self, *keys):
+        for key in keys: self.values.pop(key, None)
+
+    def hmset(self, key, values):
+        self.hashes[key] = values
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+class FakePipeline(object):
+    def __init__(self, redis):
+        self.redis, self.calls = redis, []
+
+    def __enter__(self): return self
+    def __exit__(self, *args): pass
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [ getattr(self.redis, name)(*args) for name, args in self.calls ]
+
+class BadgeStatusSyncTestCases(unittest.TestCase):
+    def setUp(self):
+        self.redis  = FakeRedis()
+        self.badges = mockito.Mock()
+        mockito.when(self.badges).report_results(mockito.any(), mockito.any()).thenReturn(0)
+        self.sync   = BadgeStatusSync(redis_conn=self.redis, badges=self.badges, printers=['p1'], result_ttl=10)
+
+    def _finish(self, job_id, when):
+        self.redis.zsets['rq:finished:p1'][job_id] = float(when)
+
+    def _reported(self, result):
+        return [ job_ids for job_ids, status in self.reports if status == result ]
+
+    def _record_reports(self):
+        self.reports = []
+        def report(job_ids, result):
+            self.reports.append((list(job_ids), result))
+            return len(job_ids)
+        self.badges.report_results = report
+
+    def test_watermark_advances_past_reported_jobs(self):
+        self._record_reports()
+        self._finish('a', 100)
+        self._finish('b', 200)
+
+        self.assertEquals(self.sync.sync(timeout=0), dict(failed=0, success=2))
+        self._finish('c', 300)
+        self.assertEquals(self.sync.sync(timeout=0), dict(failed=0, success=1))
+
+        self.assertEquals(self._reported('success'), [ ['a','b'], ['c'] ])
+        self.assertEquals(self.redis.get('badges:sync:watermark:p1'), '300.0')
+
+    def test_jobs_finishing_on_the_top_score_are_not_lost_nor_repeated(self):
+        self._record_reports()
+        self._finish('a', 100)
+        self.sync.sync(timeout=0)
+        self._finish('b', 100)
+        self.sync.sync(timeout=0)
+        self.sync.sync(timeout=0)
+
+        self.assertEquals(self._reported('success'), [ ['a'], ['b'] ])
+
+    def test_watermark_is_kept_when_the_results_are_not_committed(self):
+        self._finish('a', 100)
+        mockito.when(self.badges).report_results(['a'], 'success').thenRaise(IOError())
+
+        with self.assertRaises(IOError):
+            self.sync.sync(timeout=0)
+
+        self.assertEquals(self.redis.get('badges:sync:watermark:p1'), None)
+        self._record_reports()
+        self.sync.sync(timeout=0)
+        self.assertEquals(self._reported('success'), [ ['a'] ])
+
+    def test_failures_are_pushed_back_when_they_cannot_be_reported(self):
+        self.redis.rpush('rq:queue:failed', 'x', 'y', 'z')
+        mockito.when(self.badges).report_results(['x','y','z'], 'failed').thenRaise(IOError())
+
+        with self.assertRaises(IOError):
+            self.sync.sync(timeout=0)
+
+        self.assertEquals(self.redis.lists['rq:queue:failed'], ['x','y','z'])
+
+    def test_failures_are_reported_and_their_jobs_removed(self):
+        self._record_reports()
+        self.redis.rpush('rq:queue:failed', 'x', 'y')
+        self.redis.set('rq:job:x', 'job')
+
+        self.assertEquals(self.sync.sync(timeout=0), dict(failed=2, success=0))
+        self.assertEquals(self._reported('failed'), [ ['x','y'] ])
+        self.assertEquals(self.redis.lists['rq:queue:failed'], [])
+        self.assertEquals(self.redis.get('rq:job:x'), None)
+
+    def test_metrics_report_throughput_lag_and_backlogs(self):
+        self.sync._record(10, now=1000)
+        self.sync._record(30, now=1010)
+        self.sync.lag = 4.0
+        self.redis.rpush('rq:queue:failed', 'x')
+        self.redis.rpush('rq:queue:p1', 'y', 'z')
+
+        result = self.sync.metrics()
+
+        self.assertEquals(result, dict(throughput=4.0, lag=4.0, failed=1, backlog={ 'p1': 2 }))
+        self.assertEquals(self.redis.hashes['badges:sync:metrics'], dict(throughput=4.0, lag=4.0, failed=1, backlog=2))
+
+    def test_metrics_forget_syncs_outside_the_window(self):
+        self.sync._record(10, now=1000)
+        self.sync._record(5, now=1000 + BadgeStatusSync.WINDOW + 1)
+
+        self.assertEquals(list(self.sync.history), [ (1000 + BadgeStatusSync.WINDOW + 1, 5) ])
@@ -0,0 +1,48 @@
+import json
+
+from support import SegueApiTestCase
+from support.factories import *
+
+from segue.json import PropertyJsonSerializer
+from segue.account.models import SafeAccountJsonSerializer
+from segue.purchase.serializers import ShortPurchaseJsonSerializer
+from segue.proposal.serializers import ShortChildProposalJsonSerializer
+
+class CompiledSerializerTestCases(SegueApiTestCase):
+    def tearDown(self):
+        PropertyJsonSerializer.compiled = True
+        super(CompiledSerializerTestCases, self).tearDown()
+
+    def _both(self, emit):
+        PropertyJsonSerializer.compiled = False
+        interpreted = json.loads(self.app.json_encoder().encode(emit()))
+        PropertyJsonSerializer.compiled = True
+        compiled = json.loads(self.app.json_encoder().encode(emit()))
+        return interpreted, compiled
+
+    def test_compiled_output_is_identical(self):
+        purchase = self.create(ValidPurchaseFactory)
+        self.create(ValidBoletoPaymentFactory, purchase=purchase)
+        self.create(ValidPaymentFactory, purchase=purchase, status='paid')
+        proposal = self.create(ValidProposalWithOwnerWithTrackFactory)
+        self.create(ValidInviteFactory, proposal=proposal, status='accepted')
+
+        cases = [
+            lambda: purchase.serialize(),
+            lambda: purchase.serialize(using=ShortPurchaseJsonSerializer),
+            lambda: purchase.customer.serialize(),
+            lambda: purchase.customer.serialize(using=SafeAccountJsonSerializer),
+            lambda: proposal.serialize(),
+            lambda: proposal.serialize(using=ShortChildProposalJsonSerializer),
+            lambda: proposal.serialize(owner='AccountJsonSerializer'),
+        ]
+        for emit in cases:
+            interpreted, compiled = self._both(emit)
+            self.assertEquals(compiled, interpreted)
+
+    def test_plans_are_reused_across_objects_of_the_same_class(self):
+        first, second = self.create(ValidAccountFactory), self.create(ValidAccountFactory)
+        serializer = first._serializers[0]()
+
+        self.assertIs(serializer.plan_for(first, {}), serializer.plan_for(second, {}))
+        self.assertIsNot(serializer.plan_for(first, {}), serializer.plan_for(first, dict(name='SafeAccountJsonSerializer')))
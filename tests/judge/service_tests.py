@@ -5,7 +5,8 @@ from ..support import SegueApiTestCase, Context
 from ..support.factories import *
 
 from segue.judge.errors import *
-from segue.judge.services import JudgeService, TournamentService
+from segue.judge.services import JudgeService, TournamentService, StandingsService
+from segue.judge.swiss import StandingsCalculator
 
 
 class JudgeTestCases(SegueApiTestCase):
@@ -111,6 +112,18 @@ class JudgeServiceTestCases(JudgeTestCases):
         with self.assertRaises(RoundIsOver):
             self.service.get_next_match_for('ABC')
 
+    def test_claim_is_refused_for_matches_taken_by_other_judges(self):
+        ctx = self.setUpProposals()
+        ctx = self.setUpExistingRoundWithPendingMatches(ctx)
+
+        taken = self.service.get_next_match_for('DEF')
+        self.assertEquals(self.service._claim(ctx.j1, taken.id), 0)
+
+        mine = self.service.get_next_match_for('ABC')
+        self.assertNotEqual(mine.id, taken.id)
+        self.assertEquals(mine.judge, ctx.j1)
+        self.assertEquals(Match.query.get(taken.id).judge, ctx.j2)
+
     def test_votes_are_spent(self):
         ctx = self.setUpProposals()
         ctx = self.setUpExistingRoundWithPendingMatches(ctx)
@@ -124,6 +137,32 @@ class JudgeServiceTestCases(JudgeTestCases):
         with self.assertRaises(JudgeHasNoVotesLeft):
             self.service.get_next_match_for('MNO')
 
+    def test_progress_aggregates_rounds_and_votes_until_a_match_is_judged(self):
+        ctx = self.setUpProposals()
+        ctx.t0.current_round = 2
+        self._create_match(tournament=ctx.t0, round=1, judge=ctx.j1, result='player1')
+        self._create_match(tournament=ctx.t0, round=1)
+        self._create_match(tournament=ctx.t0, round=2, judge=ctx.j2, last_updated=self._ago(minutes=20))
+        fresh = self._create_match(tournament=ctx.t0, round=2, judge=ctx.j1, last_updated=self._ago(minutes=1))
+        tournament_id = ctx.t0.id
+
+        with self.count_queries() as statements:
+            progress = self.service.tournaments.get_progress(tournament_id)
+        self.assertLessEqual(len(statements), 3)
+
+        self.assertEquals(progress['rounds'], [
+            dict(judged=1, in_progress=0, pending=1, stale=0),
+            dict(judged=0, in_progress=2, pending=0, stale=1)
+        ])
+        self.assertEquals([ (x['id'], x['spent'], x['remaining']) for x in progress['judges'][:2] ], [ (ctx.j1.id, 1, 4), (ctx.j2.id, 0, 5) ])
+        self.assertEquals(ctx.t0.status_of_round(2), progress['rounds'][1])
+
+        self.service.judge_match(fresh.id, 'ABC', 'tie')
+
+        progress = self.service.tournaments.get_progress(tournament_id)
+        self.assertEquals(progress['rounds'][1], dict(judged=1, in_progress=1, pending=0, stale=1))
+        self.assertEquals(progress['judges'][0]['spent'], 2)
+
 class TournamentServiceTestCases(JudgeTestCases):
     def setUp(self):
         super(TournamentServiceTestCases, self).setUp()
@@ -162,7 +201,7 @@ class TournamentServiceTestCases(JudgeTestCases):
 
         fake_matches = self._build_matches([ctx.p1, ctx.p2], [ctx.p3, ctx.p4], [ctx.p5, ctx.p6])
 
-        mockito.when(self.mock_standings).calculate(mockito.any(), mockito.any()).thenReturn(ordered_players)
+        mockito.when(self.mock_standings).current(mockito.any()).thenReturn(ordered_players)
         mockito.when(self.mock_trivial).generate(ordered_players, mockito.any(), 1).thenReturn(fake_matches)
 
         new_matches = self.service.generate_round(ctx.t0.id)
@@ -186,7 +225,7 @@ class TournamentServiceTestCases(JudgeTestCases):
 
         fake_matches = self._build_matches([ctx.p1, ctx.p3], [ctx.p2, ctx.p5], [ctx.p4, ctx.p6])
 
-        mockito.when(self.mock_standings).calculate(mockito.any(), mockito.any()).thenReturn(ordered_players)
+        mockito.when(self.mock_standings).current(mockito.any()).thenReturn(ordered_players)
         mockito.when(self.mock_classical).generate(ordered_players, mockito.any(), 2).thenReturn(fake_matches)
 
         new_matches = self.service.generate_round(ctx.t1.id)
@@ -202,4 +241,38 @@ class TournamentServiceTestCases(JudgeTestCases):
         retrieved = self.service.get_one(ctx.t1.id)
         self.assertEquals(retrieved.current_round, 2)
 
+class StandingsServiceTestCases(JudgeTestCases):
+    def setUp(self):
+        super(StandingsServiceTestCases, self).setUp()
+        self.service = StandingsService()
+        self.judges  = JudgeService(standings=self.service)
+
+    def _summary(self, players):
+        return [ (p.id, p.position, p.victories, p.ties, p.defeats) for p in players ]
+
+    def test_judging_updates_standings_incrementally(self):
+        ctx = self.setUpProposals()
+        ctx = self.setUpExistingRoundWithPendingMatches(ctx)
+        self.service.rebuild(ctx.t0)
+
+        m2 = self.judges.get_next_match_for('ABC')
+        self.judges.judge_match(m2.id, 'ABC', 'tie')
+        m3 = self.judges.get_next_match_for('DEF')
+        self.judges.judge_match(m3.id, 'DEF', 'player2')
+
+        result = self.service.current(ctx.t0)
+        expected = StandingsCalculator().calculate(ctx.t0.proposals, ctx.t0.matches)
+
+        self.assertEquals(self._summary(result), self._summary(expected))
+        self.assertEquals([ p.id for p in result ], [ 1, 6, 3, 4, 2, 5 ])
+
+    def test_rebuild_recovers_standings_from_matches(self):
+        ctx = self.setUpProposals()
+        ctx = self.setUpExistingMatches(ctx)
+
+        self.assertEquals(set(p.points for p in self.service.current(ctx.t0)), set([ 0 ]))
+
+        self.service.rebuild(ctx.t0)
 
+        expected = StandingsCalculator().calculate(ctx.t0.proposals, ctx.t0.matches)
+        self.assertEquals(self._summary(self.service.current(ctx.t0)), self._summary(expected))
@@ -85,6 +85,39 @@ class ClassicalRoundGeneratorTestCases(JudgeTestCases):
         self.assertEquals(result[3].player2, None)
         self.assertEquals(result[3].result, 'player1')
 
+    def test_backtracks_instead_of_stranding_players(self):
+        ctx = self.setUpProposals()
+        m1 = self._create_match(player1=ctx.p3, player2=ctx.p4, tournament=ctx.t0, result='tie')
+
+        ordered_players = [ Player(p,0) for p in [ctx.p1,ctx.p2,ctx.p3,ctx.p4] ]
+
+        result = self.generator.generate(ordered_players, [ m1 ], 2)
+
+        self.assertEquals([ (x.player1, x.player2) for x in result ], [ (ctx.p1, ctx.p3), (ctx.p2, ctx.p4) ])
+
+    def test_bye_goes_to_the_lowest_player_without_one(self):
+        ctx = self.setUpProposals()
+        p7 = self.create_from_factory(ValidProposalFactory, id=7, title='bye bye')
+        m1 = self._create_match(player1=p7, player2=None, tournament=ctx.t0, result='player1')
+
+        ordered_players = [ Player(p,0) for p in [ctx.p1,ctx.p2,ctx.p3,ctx.p4,ctx.p5,ctx.p6,p7] ]
+
+        result = self.generator.generate(ordered_players, [ m1 ], 2)
+
+        self.assertEquals(len(result), 4)
+        self.assertEquals(result[3].player1, ctx.p6)
+        self.assertEquals(result[3].result, 'player1')
+        self.assertIn(p7, [ x.player1 for x in result ] + [ x.player2 for x in result ])
+
+    def test_pairs_inside_score_groups_first(self):
+        ctx = self.setUpProposals()
+
+        ordered_players = [ Player(ctx.p1,6), Player(ctx.p2,3), Player(ctx.p3,3), Player(ctx.p4,0) ]
+
+        result = self.generator.generate(ordered_players, [], 2)
+
+        self.assertEquals([ (x.player1, x.player2) for x in result ], [ (ctx.p1, ctx.p2), (ctx.p3, ctx.p4) ])
+
 class StandingsCalculatorTestCases(JudgeTestCases):
     def setUp(self):
         super(StandingsCalculatorTestCases, self).setUp()
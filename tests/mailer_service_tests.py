@@ -1,10 +1,17 @@
 from datetime import datetime
 import mockito
+import os
+import time
+import shutil
+import tempfile
 
 from functools import wraps
 
 from segue.core   import mailer
 from segue.mailer import MailerService
+from segue.mailer.delivery import FakeDelivery, MailQueue, serialize, deserialize
+from segue.mailer.bulk import TokenBucket
+from segue.mailer.registry import TemplateRegistry
 
 from support.factories import *
 from support import SegueApiTestCase
@@ -142,3 +149,106 @@ class MailerServiceTestCases(SegueApiTestCase):
 
         the_url   = 'http://192.168.33.91:9001/api/notifications/{}'.format(notification.hash)
         self.assertIn(the_url,      outbox[0].body)
+
+class MailDeliveryTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(MailDeliveryTestCases, self).setUp()
+        self.delivery = FakeDelivery()
+        self.service  = MailerService(delivery=self.delivery)
+
+    @record_messages
+    def test_fake_delivery_keeps_messages_in_process(self, outbox):
+        reset = self.create_from_factory(ValidResetFactory)
+        self.service.reset_password(reset.account, reset)
+
+        self.assertEquals(len(outbox), 0)
+        self.assertEquals(len(self.delivery.outbox), 1)
+        self.assertIn(reset.account.email, self.delivery.outbox[0].recipients[0])
+
+    def test_queued_messages_survive_serialization(self):
+        reset = self.create_from_factory(ValidResetFactory)
+        self.service.reset_password(reset.account, reset)
+        message = self.delivery.outbox[0]
+
+        result = deserialize(serialize(message))
+
+        self.assertEquals(result.subject,    message.subject)
+        self.assertEquals(result.body,       message.body)
+        self.assertEquals(result.recipients, message.recipients)
+
+    def test_failed_deliveries_back_off_until_they_are_buried(self):
+        redis_conn = mockito.Mock()
+        queue = MailQueue(redis_conn=redis_conn, max_attempts=3, backoff=10)
+
+        self.assertTrue(queue.retry(dict(subject='x'), 0))
+        self.assertTrue(queue.retry(dict(subject='x'), 1))
+        self.assertFalse(queue.retry(dict(subject='x'), 2))
+
+        mockito.verify(redis_conn, times=2).zadd(MailQueue.RETRY_KEY, mockito.any(), mockito.any())
+        mockito.verify(redis_conn).rpush(MailQueue.DEAD_KEY, mockito.any())
+
+    def test_bulk_sends_rendered_messages_and_tracks_markers(self):
+        accounts = [ self.create_from_factory(ValidAccountFactory) for _ in range(3) ]
+        jobs = ( (account.id, self.service.certificates_message(account) if index != 1 else None) for index, account in enumerate(accounts) )
+        seen = []
+
+        result = self.service.bulk(jobs, on_progress=lambda marker, message, result: seen.append(marker), rate=1000)
+
+        self.assertEquals(result['sent'], 2)
+        self.assertEquals(result['skipped'], 1)
+        self.assertEquals(result['marker'], accounts[-1].id)
+        self.assertEquals(seen, [ account.id for account in accounts ])
+        self.assertEquals(len(self.delivery.outbox), 2)
+
+    def test_token_bucket_throttles_after_burst(self):
+        clock = [ 0.0 ]
+        waits = []
+        def sleep(seconds):
+            waits.append(seconds)
+            clock[0] += seconds
+
+        bucket = TokenBucket(rate=10, burst=2, clock=lambda: clock[0], sleep=sleep)
+
+        self.assertEquals(bucket.take(), 0)
+        self.assertEquals(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 0.1)
+        clock[0] += 1
+        self.assertEquals(bucket.take(), 0)
+        self.assertEquals(len(waits), 1)
+
+class TemplateRegistryTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(TemplateRegistryTestCases, self).setUp()
+        self.base = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.base, 'greeting'))
+        self.path = os.path.join(self.base, 'greeting', 'hello.yml')
+        self.write_template('hello {name}')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+        super(TemplateRegistryTestCases, self).tearDown()
+
+    def write_template(self, subject, mtime=None):
+        with open(self.path, 'w') as target:
+            target.write('subject: "{}"\nbody: "body of {{name}}"\n'.format(subject))
+        if mtime: os.utime(self.path, (mtime, mtime))
+
+    def test_templates_are_parsed_once(self):
+        registry = TemplateRegistry(base=self.base, debug=False)
+
+        first  = registry.get('greeting/hello')
+        second = registry.get('greeting/hello')
+
+        self.assertIs(first, second)
+        self.assertEquals(registry.loads, 1)
+        self.assertEquals(first.fields, set(['name']))
+        self.assertEquals(first.render(dict(name='fisl')), (u'hello fisl', u'body of fisl'))
+
+    def test_debug_mode_reloads_changed_templates(self):
+        registry = TemplateRegistry(base=self.base, debug=True)
+        registry.get('greeting/hello')
+
+        self.write_template('bye {name}', mtime=time.time() + 10)
+
+        self.assertEquals(registry.get('greeting/hello').render(dict(name='fisl'))[0], u'bye fisl')
+        self.assertEquals(registry.loads, 2)
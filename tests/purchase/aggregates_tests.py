@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from segue.core import db
+from segue.purchase.models import Payment
+from segue.purchase.aggregates import PaymentAggregates
+
+from ..support import SegueApiTestCase
+from ..support.factories import *
+
+class PaymentAggregatesTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(PaymentAggregatesTestCases, self).setUp()
+        self.aggregates = PaymentAggregates()
+
+    def _purchases(self):
+        promocode = self.create(ValidPromoCodeFactory, discount=0.5)
+
+        mixed = self.create(ValidPurchaseFactory, amount=100, qty=2)
+        self.create(ValidPaymentFactory, purchase=mixed, amount=30, status='paid')
+        self.create(ValidPaymentFactory, purchase=mixed, amount=40, status='pending')
+        self.create(ValidPromoCodePaymentFactory, purchase=mixed, promocode=promocode, status='pending')
+
+        confirmed = self.create(ValidPurchaseFactory, amount=80)
+        self.create(ValidPaymentFactory, purchase=confirmed, amount=80, status='confirmed')
+        self.create(ValidPromoCodePaymentFactory, purchase=confirmed, promocode=None)
+
+        unpaid = self.create(ValidPurchaseFactory, amount=50)
+        return [ mixed, confirmed, unpaid ]
+
+    def test_paid_amounts_match_the_payments(self):
+        purchases = self._purchases()
+
+        result = self.aggregates.paid_amounts([ purchase.id for purchase in purchases ])
+
+        for purchase in purchases:
+            expected = sum([ payment.paid_amount for payment in purchase.payments ])
+            self.assertEquals(Decimal(result.get(purchase.id, 0)), Decimal(expected))
+        self.assertEquals(result[purchases[0].id], 130)
+        self.assertNotIn(purchases[2].id, result)
+
+    def test_summaries_count_the_valid_payments(self):
+        mixed, confirmed, unpaid = self._purchases()
+
+        result = self.aggregates.summaries([ mixed.id, confirmed.id, unpaid.id ])
+
+        self.assertEquals(result[mixed.id], (130, 1))
+        self.assertEquals(result[confirmed.id], (80, 1))
+        self.assertEquals(self.aggregates.summary(unpaid), (0, 0))
+        self.assertEquals([ x.has_valid_payments for x in (mixed, confirmed, unpaid) ], [ True, True, False ])
+
+    def test_the_summary_is_a_single_query_per_purchase(self):
+        mixed = self._purchases()[0]
+        mixed.total_amount
+
+        with self.count_queries() as statements:
+            self.assertEquals(mixed.paid_amount, 130)
+            self.assertEquals(mixed.outstanding_amount, 70)
+            self.assertTrue(mixed.has_started_payment)
+            self.assertTrue(mixed.has_valid_payments)
+
+        self.assertEquals(len(statements), 1)
+
+    def test_the_summary_follows_changes_to_the_payments(self):
+        mixed = self._purchases()[0]
+        pending = mixed.payments.filter_by(status='pending', type='payment').one()
+        self.assertEquals(mixed.paid_amount, 130)
+
+        pending.status = 'paid'
+        self.assertEquals(mixed.paid_amount, 170)
+
+        self.create(ValidPaymentFactory, purchase=mixed, amount=30, status='confirmed')
+        self.assertEquals(mixed.paid_amount, 200)
+
+        Payment.query.filter(Payment.id == pending.id).update({ Payment.amount: 10 })
+        db.session.commit()
+        self.assertEquals(mixed.paid_amount, 170)
@@ -5,12 +5,14 @@ from magic import Magic
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 import mockito
+from StringIO import StringIO
 from testfixtures import TempDirectory
 
 from segue.purchase.boleto import BoletoPaymentService
 from segue.purchase.boleto.models import BoletoPayment, BoletoTransition
 from segue.purchase.boleto.factories import BoletoFactory
 from segue.purchase.boleto.parsers import BoletoFileParser
+from segue.purchase.services import ProcessBoletosService
 
 from ..support import SegueApiTestCase, hashie, settings
 from ..support.factories import *
@@ -101,6 +103,67 @@ class BoletoPaymentServiceTestCases(SegueApiTestCase):
         payload.update(**overrides)
         return payload
 
+class ProcessBoletosServiceTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(ProcessBoletosServiceTestCases, self).setUp()
+        self.payments = mockito.Mock()
+        self.service  = ProcessBoletosService(payment_service=self.payments, batch_size=2)
+
+    def _create_payment(self, our_number, amount=200):
+        product  = self.create_from_factory(ValidProductFactory, price=amount)
+        purchase = self.create_from_factory(ValidPurchaseByPersonFactory, product=product, amount=amount)
+        return self.create_from_factory(ValidBoletoPaymentFactory, our_number=our_number, amount=amount, purchase=purchase)
+
+    def _entry(self, our_number, **overrides):
+        entry = dict(our_number=our_number, payment_date=date.today(), amount=Decimal(200), line='le-line', received_at=datetime.now())
+        entry.update(**overrides)
+        return entry
+
+    def test_reconciles_entries_in_batches(self):
+        good = self._create_payment(100001)
+        bad  = self._create_payment(100002)
+        late = self._create_payment(100003)
+        entries = [
+            self._entry(100001),
+            self._entry(100002, amount=Decimal(150)),
+            self._entry(100003, payment_date=late.legal_due_date + timedelta(days=1)),
+            self._entry(999999)
+        ]
+
+        result = self.service.reconcile(entries)
+
+        self.assertEquals(result['counts'], dict(good=1, bad=1, late=1, unknown=1))
+        self.assertEquals([ b['size'] for b in result['batches'] ], [2, 2])
+        self.assertEquals(result['bad'][0]['errors'], 'insufficient-amount')
+        self.assertEquals(good.status, 'paid')
+        self.assertEquals(good.purchase.status, 'paid')
+        self.assertEquals(bad.purchase.status, 'pending')
+        self.assertEquals(BoletoTransition.query.count(), 2)
+
+    def test_notifies_each_batch_once_it_is_committed(self):
+        payment = self._create_payment(100001)
+
+        result = self.service.reconcile([ self._entry(100001) ])
+
+        transition = BoletoTransition.query.first()
+        mockito.verify(self.payments).on_notified(payment.purchase, transition)
+
+    def test_committed_batches_are_notified_even_if_a_later_batch_fails(self):
+        first  = self._create_payment(100001)
+        second = self._create_payment(100002)
+        def entries():
+            yield self._entry(100001)
+            yield self._entry(100002)
+            raise IOError('truncated return file')
+
+        service = ProcessBoletosService(payment_service=self.payments, batch_size=1)
+
+        with self.assertRaises(IOError):
+            service.reconcile(entries())
+
+        mockito.verify(self.payments).on_notified(first.purchase, mockito.any())
+        mockito.verify(self.payments).on_notified(second.purchase, mockito.any())
+
 class BoletoFactoryTestCases(SegueApiTestCase):
     def setUp(self):
         super(BoletoFactoryTestCases, self).setUp()
@@ -210,3 +273,32 @@ class BoletoFileParserTestCases(SegueApiTestCase):
         self.assertEquals(result[0]['amount'],       Decimal(60))
         self.assertEquals(result[0]['line'],         '04422;000000022345;18;027;00016002600001005616;            ;                                   ;00000000;25032015;LQB;00000000006000;0000000005856;*; 0000000000; 0000000144; 0000000000;01981')
         self.assertEquals(result[0]['received_at'],  datetime(2015,3,26,7,33,55))
+
+    def test_streams_entries_with_their_byte_offsets(self):
+        content = self._load_file('boletos.bbt')
+        first_line, second_line = content.split("\n")[0:2]
+
+        result = self.parser.stream(StringIO(content))
+
+        self.assertEquals(result.next()['offset'], 0)
+        self.assertEquals(result.next()['offset'], len(first_line) + 1)
+        self.assertEquals(len(list(result)), 8)
+
+    def test_streaming_resumes_from_an_offset_and_keeps_bad_lines_aside(self):
+        content = self._load_file('boletos.bbt')
+        first_line = content.split("\n")[0]
+        broken = "garbage;line\n" + content
+
+        result = list(self.parser.stream(StringIO(broken), offset=len("garbage;line\n") + len(first_line) + 1))
+
+        self.assertEquals(len(result), 9)
+        self.assertEquals(self.parser.bad_lines, [])
+
+        result = list(self.parser.stream(StringIO(broken)))
+
+        self.assertEquals(len(result), 10)
+        self.assertEquals(self.parser.bad_lines, [ dict(offset=0, line='garbage;line') ])
+
+        list(self.parser.stream(StringIO(content)))
+
+        self.assertEquals(self.parser.bad_lines, [])
@@ -0,0 +1,96 @@
+import json
+
+from support import SegueApiTestCase
+from support.factories import *
+
+from segue.errors import InvalidCursor
+from segue.filters import FilterStrategies
+from segue.responses import Response, StreamingResponse
+from segue.account.models import Account
+from segue.admin.controllers.schemas import AccountDetail
+
+class StreamingResponseTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(StreamingResponseTestCases, self).setUp()
+        self.accounts = [ self.create(ValidAccountFactory) for x in range(5) ]
+        self.query = Account.query.order_by(Account.id)
+
+    def _body(self, response):
+        return ''.join(response.response)
+
+    def test_json_stream_matches_the_buffered_listing(self):
+        with self.app.test_request_context('/'):
+            buffered = json.loads(json.dumps(Response(self.query.all(), AccountDetail).create()))
+            streamed = json.loads(self._body(StreamingResponse(self.query, AccountDetail, chunk_size=2).create()))
+
+        self.assertEquals(streamed, buffered)
+        self.assertEquals(streamed['count'], 5)
+
+    def test_ndjson_stream_writes_one_row_per_line(self):
+        with self.app.test_request_context('/'):
+            response = StreamingResponse(self.query, AccountDetail, 'ndjson', chunk_size=2).create()
+            lines = self._body(response).splitlines()
+
+        self.assertEquals(response.mimetype, 'application/x-ndjson')
+        self.assertEquals([ json.loads(line)['id'] for line in lines ], [ x.id for x in self.accounts ])
+
+    def test_empty_query_streams_an_empty_listing(self):
+        with self.app.test_request_context('/'):
+            body = self._body(StreamingResponse(self.query.filter(Account.id < 0), AccountDetail).create())
+
+        self.assertEquals(json.loads(body), dict(count=0, items=[]))
+
+    def test_format_is_taken_from_the_query_string_or_accept_header(self):
+        with self.app.test_request_context('/?stream=json'):
+            self.assertEquals(StreamingResponse.requested_format(), 'json')
+        with self.app.test_request_context('/', headers={ 'Accept': 'application/x-ndjson' }):
+            self.assertEquals(StreamingResponse.requested_format(), 'ndjson')
+        with self.app.test_request_context('/?stream=xml'):
+            self.assertEquals(StreamingResponse.requested_format(), None)
+
+class KeysetPaginationTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(KeysetPaginationTestCases, self).setUp()
+        self.accounts = [ self.create(ValidAccountFactory) for x in range(5) ]
+        self.filters = FilterStrategies()
+
+    def test_walks_every_row_once_following_the_cursors(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = self.filters.keyset(Account.query, Account.id, cursor, per_page=2)
+            seen.extend(x.id for x in page.items)
+            pages += 1
+            if not page.has_next: break
+            cursor = page.next_cursor
+
+        self.assertEquals(seen, [ x.id for x in self.accounts ])
+        self.assertEquals(pages, 3)
+
+    def test_total_is_only_counted_when_asked_for(self):
+        self.assertEquals(self.filters.keyset(Account.query, Account.id, per_page=2).total, None)
+        self.assertEquals(self.filters.keyset(Account.query, Account.id, per_page=2, total='exact').total, 5)
+        self.assertEquals(self.filters.keyset(Account.query, Account.id, per_page=2, total='approximate').total, 5)
+
+    def test_tampered_cursors_are_refused(self):
+        with self.assertRaises(InvalidCursor):
+            self.filters.keyset(Account.query, Account.id, 'not-a-cursor')
+
+    def test_cursors_of_another_type_than_the_key_are_refused(self):
+        for value in [ 'x', None, True, 1.5, [ 1 ], { 'id': 1 } ]:
+            with self.assertRaises(InvalidCursor):
+                self.filters.keyset(Account.query, Account.id, self.filters.encode_cursor(value))
+
+        page = self.filters.keyset(Account.query, Account.id, self.filters.encode_cursor(self.accounts[2].id))
+        self.assertEquals([ x.id for x in page.items ], [ x.id for x in self.accounts[3:] ])
+
+    def test_response_links_to_the_next_page(self):
+        page = self.filters.keyset(Account.query, Account.id, per_page=2)
+        with self.app.test_request_context('/admin/accounts?name=x'):
+            self.app.preprocess_request()
+            result = Response(page, AccountDetail).create()
+
+        self.assertEquals(result['count'], 2)
+        self.assertEquals(result['cursor'], page.next_cursor)
+        self.assertIn('cursor=' + page.next_cursor, result['next'])
+        self.assertIn('name=x', result['next'])
+        self.assertNotIn('total', result)
@@ -0,0 +1,105 @@
+import json
+import time
+from datetime import datetime
+
+import flask
+from redis import ConnectionError
+
+from segue.core import db
+from ..support import SegueApiTestCase
+from ..support.factories import *
+
+from segue.schedule.models import Recording
+from segue.schedule.responses import SlotResponse
+from segue.schedule.services import SlotService
+from segue.schedule.snapshot import ScheduleSnapshot
+
+class DownRedis(object):
+    def __getattr__(self, name):
+        def unavailable(*args, **kw):
+            raise ConnectionError('redis is down')
+        return unavailable
+
+class ScheduleSnapshotTestCases(SegueApiTestCase):
+    def setUp(self):
+        super(ScheduleSnapshotTestCases, self).setUp()
+        self.service  = SlotService()
+        self.snapshot = self.service.snapshot
+        self.snapshot.invalidate()
+
+    def setUpSchedule(self):
+        room   = self.create(ValidRoomFactory)
+        talk   = self.create(ValidProposalWithOwnerWithTrackFactory)
+        self.create(ValidInviteFactory, proposal=talk, status='accepted', name='Fulana')
+        self.create(ValidInviteFactory, proposal=talk, status='declined', name='Beltrano')
+        first  = self.create(ValidSlotFactory, room=room, talk=talk, status='confirmed', begins=datetime(2015,7,8,9,0,0))
+        second = self.create(ValidSlotFactory, room=room, begins=datetime(2015,7,9,9,0,0))
+        self.create(ValidSlotFactory, room=room, begins=datetime(2015,7,8,10,0,0))
+        self.create(ValidSlotFactory, begins=datetime(2015,7,8,9,0,0))
+        db.session.add(Recording(slot=first, url='http://example.com/first.ogv'))
+        db.session.commit()
+        return room, first, second
+
+    def test_documents_match_the_slot_responses_in_a_handful_of_queries(self):
+        room, first, second = self.setUpSchedule()
+
+        with self.app.test_request_context():
+            expected = json.loads(flask.json.dumps(SlotResponse.create(self.service.query(room=room.id), embeds=True, links=False)))
+            with self.count_queries() as statements:
+                documents = self.snapshot.build()
+
+        self.assertLessEqual(len(statements), 4)
+
+        listing = json.loads(documents['room:{}'.format(room.id)][0])
+        self.assertEquals(listing['count'], 3)
+        self.assertEquals(listing['items'], expected)
+        self.assertEquals(listing['items'][0]['talk']['coauthors'], [ 'Fulana' ])
+        self.assertEquals(listing['items'][0]['recordings'], [ 'http://example.com/first.ogv' ])
+
+        of_day = json.loads(documents['room:{}:2015-07-09'.format(room.id)][0])
+        self.assertEquals([ x['id'] for x in of_day['items'] ], [ second.id ])
+
+    def test_slots_of_room_are_served_with_etags(self):
+        room, first, second = self.setUpSchedule()
+        url = '/rooms/{}/slots/of-day/2015-07-08'.format(room.id)
+
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(json.loads(response.data)['count'], 2)
+
+        response = self.client.get(url, headers={ 'If-None-Match': etag })
+        self.assertEquals(response.status_code, 304)
+
+        self.service.set_status(first.id, 'pending')
+
+        response = self.client.get(url, headers={ 'If-None-Match': etag })
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(json.loads(response.data)['items'][0]['status'], 'pending')
+
+        response = self.client.get('/rooms/{}/slots/of-day/2015-07-10'.format(room.id))
+        self.assertEquals(json.loads(response.data), dict(count=0, items=[]))
+
+    def test_documents_are_kept_in_memory_while_redis_is_down(self):
+        room, first, second = self.setUpSchedule()
+        snapshot = ScheduleSnapshot(redis_conn=DownRedis())
+        name = 'room:{}'.format(room.id)
+
+        with self.app.test_request_context():
+            built = snapshot.document(name)
+            with self.count_queries() as statements:
+                self.assertEquals(snapshot.document(name), built)
+                self.assertEquals(snapshot.rooms(), snapshot.fallback()['rooms'])
+            self.assertEquals(len(statements), 0)
+
+            first.status = 'pending'
+            db.session.commit()
+            self.assertEquals(snapshot.document(name), built)
+
+            later = time.time() + ScheduleSnapshot.FALLBACK_TTL
+            self.assertEquals(json.loads(snapshot.fallback(now=later)[name][0])['items'][0]['status'], 'pending')
+
+            snapshot.invalidate()
+            with self.count_queries() as statements:
+                snapshot.document(name)
+            self.assertGreater(len(statements), 0)
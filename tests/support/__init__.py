@@ -1,5 +1,7 @@
 import unittest
 import mockito
+from contextlib import contextmanager
+from sqlalchemy import event
 
 import segue, segue.core
 
@@ -26,6 +28,8 @@ class SegueApiTestCase(unittest.TestCase):
         self.app_context = self.app.app_context()
         self.app_context.push()
         segue.core.db.create_all()
+        segue.core.container.reset()
+        segue.core.cache.clear()
 
     def tearDown(self):
         super(SegueApiTestCase, self).tearDown()
@@ -63,6 +67,19 @@ class SegueApiTestCase(unittest.TestCase):
             segue.core.db.session.expunge(entity)
         return ids
 
+    @contextmanager
+    def count_queries(self):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = segue.core.db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
     def build_from_factory(self, factory, *args, **kw):
         return factory.build(*args, **kw)
 
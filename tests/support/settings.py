@@ -39,6 +39,7 @@ MAIL_USERNAME = ''
 MAIL_PASSWORD = ''
 MAIL_USE_TLS = False
 MAIL_BCC = 'test@example.com'
+MAIL_DELIVERY = 'smtp'
 
 CORS_HEADERS = 'Content-Type,Authorization'
 CORS_ORIGINS = '*'